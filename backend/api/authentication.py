@@ -0,0 +1,129 @@
+"""
+JWT authentication that trusts the token's claims instead of loading the
+User row on every request.
+
+Tokens issued by /api/token/, /api/token/refresh/ and SSO login carry the
+user's id, username, email, staff flags and token version (``tv``). A
+request with such a token gets a User instance built from those claims, with
+no query; any other field is loaded lazily if something reads it.
+
+Revocation goes through UserTokenVersion: every save of a User bumps it
+(api/signals.py). The current version per user is cached in-process for
+AUTH_TOKEN_VERSION_TTL seconds; a token whose ``tv`` is behind it falls back
+to the regular database lookup, so promotions and deactivations apply
+within that TTL, and at once in the process that made the change. A deleted
+user reads as DELETED_USER_VERSION, which no token carries, so their tokens
+fall back to the database lookup too, and fail there.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connection
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .models import UserTokenVersion
+
+TOKEN_VERSION_CLAIM = 'tv'
+# Claim name -> User field. The user id travels in api_settings.USER_ID_CLAIM.
+USER_CLAIMS = {
+    'username': 'username',
+    'email': 'email',
+    'is_staff': 'is_staff',
+    'is_superuser': 'is_superuser',
+}
+
+DELETED_USER_VERSION = -1
+
+_versions = {}  # user id -> (version, expires at)
+_versions_lock = threading.Lock()
+
+
+def token_version(user_id):
+    now = time.monotonic()
+    cached = _versions.get(user_id)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+    # Through User, so "no such user" differs from "never bumped" (no row, version 0).
+    found = list(User.objects.filter(pk=user_id).values_list('token_version__version', flat=True)[:1])
+    version = (found[0] or 0) if found else DELETED_USER_VERSION
+    with _versions_lock:
+        _versions[user_id] = (version, now + settings.AUTH_TOKEN_VERSION_TTL)
+    return version
+
+
+def bump_token_version(user_id):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {UserTokenVersion._meta.db_table} (user_id, version) VALUES (%s, 1)
+            ON CONFLICT (user_id) DO UPDATE SET version = {UserTokenVersion._meta.db_table}.version + 1
+            """,
+            [user_id],
+        )
+    forget_token_version(user_id)
+
+
+def forget_token_version(user_id):
+    with _versions_lock:
+        _versions.pop(user_id, None)
+
+
+def add_user_claims(token, user):
+    for claim, field in USER_CLAIMS.items():
+        token[claim] = getattr(user, field)
+    token[TOKEN_VERSION_CLAIM] = token_version(user.pk)
+    return token
+
+
+def tokens_for_user(user):
+    """A refresh token (and, via .access_token, an access token) carrying the user claims."""
+    return add_user_claims(RefreshToken.for_user(user), user)
+
+
+def user_from_claims(token):
+    user_id = User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+    field_names = {api_settings.USER_ID_FIELD: user_id, 'is_active': True}
+    field_names.update((field, token[claim]) for claim, field in USER_CLAIMS.items())
+    # from_db leaves every other field deferred: it loads on first access,
+    # and save() only writes the fields set here.
+    concrete = [f.attname for f in User._meta.concrete_fields if f.attname in field_names]
+    return User.from_db(DEFAULT_DB_ALIAS, concrete, [field_names[name] for name in concrete])
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            # simplejwt stores the id as a string.
+            user_id = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+            version = validated_token[TOKEN_VERSION_CLAIM]
+            if all(claim in validated_token for claim in USER_CLAIMS) and version == token_version(user_id):
+                return user_from_claims(validated_token)
+        except KeyError:
+            pass
+        # Older token, or the user changed since it was issued: ask the database.
+        return super().get_user(validated_token)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Re-stamps the claims from the current User row, since they may have changed."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        user = User.objects.filter(pk=access[api_settings.USER_ID_CLAIM], is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed('User not found or inactive', code='user_not_found')
+        data['access'] = str(add_user_claims(access, user))
+        return data
@@ -0,0 +1,88 @@
+"""
+Delta sync for clients that already hold the catalog.
+
+A watermark is a timestamp. Upserts are public prompts whose updated_at is
+past it; tombstones come from PromptChange. Two things keep a change from
+slipping between polls:
+
+* updated_at is stamped by the app server when the row is saved, but only
+  becomes visible when its transaction commits. The watermark handed out is
+  therefore never later than the start of the oldest transaction that is
+  still writing, so nothing in flight can commit "behind" it.
+* Each poll re-reads SYNC_OVERLAP before the watermark to absorb clock skew
+  between app servers and the database. Upserts and tombstones are
+  idempotent, so re-delivering a few rows is harmless.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Prompt, PromptChange
+from .pagination import CATALOG_ORDERING
+
+SYNC_OVERLAP = timedelta(seconds=5)
+# Clients further behind than this (or with more changes than MAX_CHANGES)
+# are told to reset from /prompts/snapshot/ instead.
+CHANGE_LOG_RETENTION = timedelta(days=30)
+MAX_CHANGES = 1000
+
+
+def catalog_watermark():
+    now = timezone.now()
+    if connection.vendor != 'postgresql':
+        return now
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT min(xact_start) FROM pg_stat_activity "
+            "WHERE backend_xid IS NOT NULL AND pid <> pg_backend_pid()"
+        )
+        oldest_writer = cursor.fetchone()[0]
+    return min(now, oldest_writer) if oldest_writer else now
+
+
+def format_watermark(value):
+    # "Z" rather than "+00:00" so the value survives being put in a URL as-is.
+    return value.astimezone(dt_timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def parse_watermark(value):
+    parsed = parse_datetime(value or '')
+    if parsed is None:
+        raise ValueError(value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def collect_changes(since):
+    """
+    Return ``(watermark, upserts, tombstone_ids)`` for changes after ``since``,
+    or ``(watermark, None, None)`` when the client should reset instead.
+    """
+    watermark = catalog_watermark()
+    if since < timezone.now() - CHANGE_LOG_RETENTION:
+        return watermark, None, None
+
+    window_start = since - SYNC_OVERLAP
+    upserts = list(
+        Prompt.objects.filter(is_public=True, status='approved', updated_at__gt=window_start)
+        .select_related('user')
+        .order_by(*CATALOG_ORDERING)[:MAX_CHANGES + 1]
+    )
+    if len(upserts) > MAX_CHANGES:
+        return watermark, None, None
+
+    removed = set(
+        PromptChange.objects.filter(changed_at__gt=window_start)
+        .values_list('prompt_id', flat=True)
+    )
+    # A prompt that left and came back is already in upserts; current state wins.
+    removed.difference_update(p.id for p in upserts)
+    if removed:
+        removed.difference_update(
+            Prompt.objects.filter(pk__in=removed, is_public=True, status='approved')
+            .values_list('id', flat=True)
+        )
+    return watermark, upserts, sorted(removed)
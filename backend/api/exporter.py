@@ -0,0 +1,194 @@
+"""
+Streaming export of prompts, their versions and copy feedback
+(PromptViewSet.export and ``manage.py export_prompts``).
+
+Rows come off server-side cursors (``.iterator(chunk_size=...)``) and are
+encoded and optionally gzipped as they go, so memory does not grow with the
+table. Version texts are rebuilt on the fly: versions are read in
+(prompt, id) order and only the running texts of the current prompt are
+kept. Prompt columns use the importer's names, so an export re-imports as is.
+
+xlsx cannot be produced incrementally (the file is a zip with a directory at
+the end); openpyxl's write-only mode spools rows to disk instead, and the
+finished file is streamed from there.
+"""
+import csv
+import json
+import tempfile
+import zlib
+from datetime import datetime
+
+from . import versioning
+from .models import CopiedPromptFeedback, PromptVersion
+
+CHUNK_SIZE = 2000
+# Encoded output is handed on in pieces of about this many bytes.
+FLUSH_BYTES = 64 * 1024
+
+PROMPT_COLUMNS = (
+    'id', 'title', 'prompt_description', 'prompt_text', 'guidance', 'task_type', 'output_format',
+    'category', 'is_public', 'status', 'author', 'vote', 'like_count', 'dislike_count', 'copy_count',
+    'created_at', 'updated_at',
+)
+VERSION_COLUMNS = (
+    'id', 'prompt_id', 'edited_by', 'version_created_at', 'title', 'prompt_description', 'prompt_text',
+    'guidance', 'task_type', 'output_format', 'category', 'changed_fields',
+)
+FEEDBACK_COLUMNS = (
+    'id', 'prompt_id', 'prompt_title', 'user', 'status', 'rating', 'feedback_text', 'created_at',
+)
+DATASETS = ('prompts', 'versions', 'feedback')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+# --- Rows: each yields tuples in its COLUMNS order ---
+
+def prompt_rows(prompts):
+    fields = ['user__username' if column == 'author' else column for column in PROMPT_COLUMNS]
+    return prompts.values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+def version_rows(prompts):
+    versions = (
+        PromptVersion.objects.filter(prompt__in=prompts.order_by().values('pk'))
+        .values_list(
+            'id', 'prompt_id', 'edited_by__username', 'version_created_at', 'title',
+            'task_type', 'output_format', 'category', 'changed_fields', 'is_keyframe', 'payload',
+        )
+        .order_by('prompt_id', 'pk')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    texts, current = None, None
+    for (pk, prompt_id, editor, created_at, title, task_type, output_format, category,
+         changed, keyframe, payload) in versions:
+        if prompt_id != current:
+            # Every prompt's history starts with a keyframe.
+            texts, current = None, prompt_id
+        document = versioning.unpack(payload)
+        texts = document if keyframe else versioning.apply_delta(texts, document)
+        yield (
+            pk, prompt_id, editor, created_at, title, texts['prompt_description'], texts['prompt_text'],
+            texts['guidance'], task_type, output_format, category, changed,
+        )
+
+
+def feedback_rows(prompts):
+    return (
+        CopiedPromptFeedback.objects.filter(prompt__in=prompts.order_by().values('pk'))
+        .values_list(
+            'id', 'prompt_id', 'prompt__title', 'user__username', 'status', 'rating', 'feedback_text',
+            'created_at',
+        )
+        .order_by('pk')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def dataset(name, prompts):
+    """(columns, row iterator) for dataset ``name`` over the ``prompts`` queryset."""
+    if name == 'versions':
+        return VERSION_COLUMNS, version_rows(prompts)
+    if name == 'feedback':
+        return FEEDBACK_COLUMNS, feedback_rows(prompts)
+    return PROMPT_COLUMNS, prompt_rows(prompts)
+
+
+# --- Encoders: each yields bytes ---
+
+def _flat(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ','.join(value)
+    return value
+
+
+def _buffered(pieces):
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= FLUSH_BYTES:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def encode_jsonl(columns, rows):
+    def lines():
+        for row in rows:
+            record = {
+                column: value.isoformat() if isinstance(value, datetime) else value
+                for column, value in zip(columns, row)
+            }
+            yield json.dumps(record, ensure_ascii=False).encode() + b'\n'
+    return _buffered(lines())
+
+
+class _Line:
+    """File-like target for csv.writer that hands back what it was given."""
+
+    def write(self, text):
+        return text
+
+
+def encode_csv(columns, rows):
+    writer = csv.writer(_Line())
+
+    def lines():
+        # BOM so Excel opens the file as UTF-8.
+        yield '\ufeff'.encode() + writer.writerow(columns).encode()
+        for row in rows:
+            yield writer.writerow([_flat(value) for value in row]).encode()
+    return _buffered(lines())
+
+
+def write_xlsx(columns, rows, target):
+    import openpyxl
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    def cell(value):
+        value = _flat(value)
+        # Control characters are legal in a prompt but not in xlsx.
+        return ILLEGAL_CHARACTERS_RE.sub('', value) if isinstance(value, str) else value
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns)
+    for row in rows:
+        sheet.append([cell(value) for value in row])
+    workbook.save(target)
+
+
+def encode_xlsx(columns, rows):
+    with tempfile.TemporaryFile() as spool:
+        write_xlsx(columns, rows, spool)
+        spool.seek(0)
+        while True:
+            block = spool.read(FLUSH_BYTES)
+            if not block:
+                return
+            yield block
+
+
+ENCODERS = {'jsonl': encode_jsonl, 'csv': encode_csv, 'xlsx': encode_xlsx}
+
+
+def gzipped(blocks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(name, prompts, file_format, compress=False):
+    columns, rows = dataset(name, prompts)
+    blocks = ENCODERS[file_format](columns, rows)
+    return gzipped(blocks) if compress else blocks
@@ -0,0 +1,86 @@
+"""
+Per-facet prompt counts for /api/facets/.
+
+One grouped scan over the caller's visible prompts counts them per category,
+task type, output format and status at once (GROUP BY GROUPING SETS). The
+result is cached in the ``catalog`` cache per visibility scope: the public
+catalog, everything (staff), or one user's own prompts. Any prompt save or
+delete bumps FACETS_VERSION_KEY (api/signals.py), which retires every scope.
+"""
+from django.db import connection
+
+from . import listing_cache
+from .models import CATEGORY_CHOICES, OUTPUT_FORMAT_CHOICES, STATUS_CHOICES, TASK_TYPE_CHOICES, Prompt
+
+FACETS_VERSION_KEY = 'catalog:facets:version'
+UNSET_LABEL = 'Not set'
+FACETS = (
+    ('category', CATEGORY_CHOICES),
+    ('task_type', TASK_TYPE_CHOICES),
+    ('output_format', OUTPUT_FORMAT_CHOICES),
+    ('status', STATUS_CHOICES),
+)
+
+
+def visible_prompts(user, mine=False):
+    """Same scopes as PromptViewSet.get_queryset. Returns (scope name, queryset)."""
+    if user.is_staff:
+        return 'all', Prompt.objects.all()
+    if mine:
+        return f'mine:{user.pk}', Prompt.objects.filter(user=user)
+    return 'public', Prompt.objects.filter(is_public=True, status='approved')
+
+
+def count_facets(queryset):
+    names = [name for name, _ in FACETS]
+    sql, params = queryset.values(*names).query.sql_with_params()
+    grouping_sets = ', '.join(f'({name})' for name in names)
+    # GROUPING(x) is 1 in rows where x was rolled up, which tells the
+    # grand-total row apart from real NULL buckets of a nullable facet.
+    groupings = ', '.join(f'GROUPING({name})' for name in names)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {', '.join(names)}, {groupings}, count(*) FROM ({sql}) AS visible "
+            f"GROUP BY GROUPING SETS ({grouping_sets}, ())",
+            params,
+        )
+        rows = cursor.fetchall()
+
+    counts = {name: {} for name in names}
+    total = 0
+    for row in rows:
+        values, rolled_up, count = row[:len(names)], row[len(names):-1], row[-1]
+        grouped = [(name, value) for name, value, bit in zip(names, values, rolled_up) if not bit]
+        if not grouped:
+            total = count  # the () grouping set
+        else:
+            name, value = grouped[0]
+            counts[name][value] = count
+
+    result = {'total': total}
+    for name, choices in FACETS:
+        labels = dict(choices)
+        # Every predefined value, zero or not, then any free-form ones.
+        values = [value for value, _ in choices]
+        values += sorted(set(counts[name]) - set(labels) - {None})
+        if None in counts[name]:
+            values.append(None)  # nullable facets: prompts with no value set
+        result[name] = [
+            {
+                'value': value,
+                'label': labels.get(value, value) if value is not None else UNSET_LABEL,
+                'count': counts[name].get(value, 0),
+            }
+            for value in values
+        ]
+    return result
+
+
+def get_facets(user, mine=False):
+    scope, queryset = visible_prompts(user, mine)
+    version = listing_cache.current_version(FACETS_VERSION_KEY)
+    return listing_cache.get_or_build(f'catalog:facets:{version}:{scope}', lambda: count_facets(queryset))
+
+
+def bump_version():
+    listing_cache.bump_version(FACETS_VERSION_KEY)
@@ -0,0 +1,57 @@
+"""
+The "is there copy feedback waiting?" check the client makes on every load.
+
+A user has at most one pending CopiedPromptFeedback row (partial unique
+constraint copy_feedback_one_pending_per_user, which also serves the lookup).
+Most users have none, so the answer is remembered per user in the ``catalog``
+cache: NONE means nothing is pending and the check costs no query at all.
+
+Copies write MAYBE and submits delete the key, both at once and again on
+commit. Readers only ever *add* NONE, so a copy that commits while a reader
+is still querying wins over the reader's stale answer.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from . import listing_cache
+from .models import CopiedPromptFeedback
+
+NONE = 0
+MAYBE = 1
+
+
+def _key(user_id):
+    return f'feedback:pending:{user_id}'
+
+
+def pending_feedback(user):
+    """``{pending, prompt_id, prompt_title}`` for ``user``'s pending feedback, if any."""
+    cache = listing_cache.get_cache()
+    key = _key(user.pk)
+    if cache.get(key) == NONE:
+        return {'pending': False}
+    pending = (
+        CopiedPromptFeedback.objects.filter(user=user, status='pending')
+        .select_related('prompt').only('prompt_id', 'prompt__title')
+        .first()
+    )
+    if pending is None:
+        cache.add(key, NONE, timeout=settings.PENDING_FEEDBACK_CACHE_TIMEOUT)
+        return {'pending': False}
+    return {'pending': True, 'prompt_id': pending.prompt.id, 'prompt_title': pending.prompt.title}
+
+
+def feedback_requested(user_id):
+    """A copy left (or re-pointed) a pending row for ``user_id``."""
+    def mark():
+        listing_cache.get_cache().set(_key(user_id), MAYBE, timeout=settings.PENDING_FEEDBACK_CACHE_TIMEOUT)
+    mark()
+    transaction.on_commit(mark)
+
+
+def feedback_answered(user_id):
+    """The pending row of ``user_id`` was submitted or skipped."""
+    def forget():
+        listing_cache.get_cache().delete(_key(user_id))
+    forget()
+    transaction.on_commit(forget)
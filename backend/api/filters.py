@@ -0,0 +1,42 @@
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import F
+from rest_framework import filters
+
+from .models import SEARCH_CONFIG
+from .pagination import catalog_ordering
+
+
+class PromptSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` as before (ILIKE over search_fields), or, with
+    ``?search_mode=fulltext``, a ranked match against Prompt.search_vector.
+
+    Full-text mode parses the terms with websearch_to_tsquery, so quoted
+    phrases, ``or`` and ``-exclusions`` work. ``?headline=1`` adds a
+    highlighted ``search_headline`` snippet to each result. Rank order
+    applies to plain and limit/offset requests; cursor pages always keep the
+    catalog order their keyset depends on.
+    """
+    mode_param = 'search_mode'
+    headline_param = 'headline'
+
+    def filter_queryset(self, request, queryset, view):
+        if request.query_params.get(self.mode_param) != 'fulltext':
+            return super().filter_queryset(request, queryset, view)
+
+        terms = request.query_params.get(self.search_param, '').strip()
+        if not terms:
+            return queryset
+
+        query = SearchQuery(terms, search_type='websearch', config=SEARCH_CONFIG)
+        queryset = (
+            queryset.filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F('search_vector'), query))
+            .order_by('-search_rank', *catalog_ordering(request.query_params))
+        )
+        if request.query_params.get(self.headline_param) == '1':
+            queryset = queryset.annotate(search_headline=SearchHeadline(
+                'prompt_text', query, config=SEARCH_CONFIG,
+                start_sel='<mark>', stop_sel='</mark>', max_words=35, min_words=15,
+            ))
+        return queryset
@@ -0,0 +1,210 @@
+"""
+Streaming prompt import (``manage.py import_prompts``).
+
+Rows are read one at a time from .xlsx (openpyxl read-only mode), .csv or
+.jsonl, validated in batches (optionally in a process pool) and written one
+batch per transaction, so memory stays flat however long the file is.
+
+Each row is keyed by the content hash of its snapshot (versioning.content_hash)
+and inserted with ON CONFLICT (source_hash) DO NOTHING: re-running an import,
+or importing overlapping files, never duplicates prompts. Every new prompt
+gets its initial version in the same transaction. The raw INSERT fires no
+Prompt signals, so the new rows are pushed into this process's typeahead
+index on commit; the command asks every other process to rebuild its own.
+"""
+import csv
+import json
+from pathlib import Path
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import typeahead, versioning
+from .models import OUTPUT_FORMAT_CHOICES, TASK_TYPE_CHOICES, Prompt, PromptVersion
+
+
+class ImportFormatError(Exception):
+    pass
+
+
+def _choice_key(text):
+    return ' '.join(text.lower().replace('_', ' ').replace('&', ' and ').split())
+
+
+def _choice_map(choices):
+    """
+    Normalized spelling -> stored value. Accepts the value, the label, and
+    either half of a "A / B" label ("template" for "Template / Framework").
+    """
+    lookup = {}
+    for value, label in choices:
+        for part in label.split('/'):
+            lookup.setdefault(_choice_key(part), value)
+    for value, label in choices:
+        lookup[_choice_key(value)] = value
+        lookup[_choice_key(label)] = value
+    return lookup
+
+
+TASK_TYPES = _choice_map(TASK_TYPE_CHOICES)
+OUTPUT_FORMATS = _choice_map(OUTPUT_FORMAT_CHOICES)
+# PromptVersion needs task_type and output_format even though Prompt does not.
+REQUIRED_FIELDS = ('title', 'prompt_text', 'category', 'task_type', 'output_format')
+COLUMN_ALIASES = {'description': 'prompt_description'}
+MAX_LENGTHS = {
+    field.name: field.max_length
+    for field in Prompt._meta.get_fields()
+    if getattr(field, 'max_length', None) and field.name in versioning.SNAPSHOT_FIELDS
+}
+
+
+# --- Readers: each yields (row number, {column: value}) ---
+
+def _header(names):
+    header = []
+    for name in names:
+        name = str(name or '').strip().lower()
+        header.append(COLUMN_ALIASES.get(name, name))
+    return header
+
+
+def read_xlsx(path):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportFormatError('Reading .xlsx files needs openpyxl (pip install openpyxl).')
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = _header(next(rows, ()))
+        for number, values in enumerate(rows, start=2):
+            if any(value is not None for value in values):
+                yield number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        reader = csv.reader(handle)
+        header = _header(next(reader, ()))
+        for values in reader:
+            if any(values):
+                yield reader.line_num, dict(zip(header, values))
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as handle:
+        for number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                row = {'__error__': f'invalid JSON: {exc}'}
+            if not isinstance(row, dict):
+                row = {'__error__': 'expected a JSON object'}
+            yield number, {COLUMN_ALIASES.get(k, k): v for k, v in row.items()}
+
+
+READERS = {'.xlsx': read_xlsx, '.xlsm': read_xlsx, '.csv': read_csv, '.jsonl': read_jsonl}
+
+
+def read_rows(path):
+    reader = READERS.get(Path(path).suffix.lower())
+    if reader is None:
+        raise ImportFormatError(f'Unsupported file type {Path(path).suffix!r}; use .xlsx, .csv or .jsonl.')
+    return reader(path)
+
+
+# --- Validation (runs in worker processes when --workers > 0) ---
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def clean_row(row):
+    """The snapshot for ``row``, or raise ValueError with the reason."""
+    if '__error__' in row:
+        raise ValueError(row['__error__'])
+    snapshot = {}
+    for field in versioning.SNAPSHOT_FIELDS:
+        snapshot[field] = _text(row.get(field)) or None
+    for field in REQUIRED_FIELDS:
+        if not snapshot[field]:
+            raise ValueError(f'{field} is required')
+    for field, choices in (('task_type', TASK_TYPES), ('output_format', OUTPUT_FORMATS)):
+        value = choices.get(_choice_key(snapshot[field]))
+        if value is None:
+            raise ValueError(f'unknown {field} {snapshot[field]!r}')
+        snapshot[field] = value
+    for field, limit in MAX_LENGTHS.items():
+        if snapshot[field] is not None and len(snapshot[field]) > limit:
+            raise ValueError(f'{field} is longer than {limit} characters')
+    return snapshot
+
+
+def clean_batch(rows):
+    """([(snapshot, hash)], [(row number, error)]) for a list of (row number, row)."""
+    valid, errors = [], []
+    for number, row in rows:
+        try:
+            snapshot = clean_row(row)
+        except ValueError as exc:
+            errors.append((number, str(exc)))
+            continue
+        valid.append((snapshot, versioning.content_hash(snapshot)))
+    return valid, errors
+
+
+# --- Writing ---
+
+INSERT_COLUMNS = (
+    'user_id', 'title', 'prompt_description', 'prompt_text', 'guidance', 'task_type', 'output_format',
+    'category', 'is_public', 'status', 'vote', 'like_count', 'dislike_count', 'copy_count',
+    'rating_count', 'rating_average', 'trending_score', 'created_at', 'updated_at', 'source_hash',
+)
+
+
+def write_batch(rows, user, status, is_public):
+    """
+    Insert the (snapshot, hash) pairs in ``rows`` that are not in the library
+    yet, with their initial versions. Returns the number of prompts created.
+    """
+    unique = list(dict((digest, snapshot) for snapshot, digest in rows).items())
+    if not unique:
+        return 0
+    now = timezone.now()
+    params = []
+    for digest, snapshot in unique:
+        params.extend([
+            user.pk, snapshot['title'], snapshot['prompt_description'], snapshot['prompt_text'],
+            snapshot['guidance'], snapshot['task_type'], snapshot['output_format'], snapshot['category'],
+            is_public, status, 0, 0, 0, 0, 0, 0, 0, now, now, digest,
+        ])
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(INSERT_COLUMNS)) + ')'] * len(unique))
+    snapshots = dict(unique)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Prompt._meta.db_table} ({', '.join(INSERT_COLUMNS)})
+                VALUES {placeholders}
+                ON CONFLICT (source_hash) DO NOTHING
+                RETURNING id, source_hash
+                """,
+                params,
+            )
+            created = cursor.fetchall()
+        PromptVersion.objects.bulk_create(
+            versioning.build_version(pk, snapshots[digest], None, None, edited_by=user)
+            for pk, digest in created
+        )
+        if created and status == 'approved' and is_public:
+            ids = [pk for pk, _ in created]
+            transaction.on_commit(lambda: typeahead.sync_prompts(ids))
+    return len(created)
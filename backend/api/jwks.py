@@ -0,0 +1,158 @@
+"""
+Process-wide cache of identity-provider signing keys for SSO login.
+
+Keys are fetched through one pooled requests.Session with connect/read
+timeouts, parsed once, and kept for JWKS_CACHE_TTL seconds. Expired keys are
+still served while a background refresh runs, and for up to JWKS_MAX_STALE
+seconds if the endpoint is down. A token signed with a key we have not seen
+(the provider rotated keys) triggers an immediate refresh, at most once per
+JWKS_MIN_REFRESH_INTERVAL seconds so junk ``kid`` values cannot turn into a
+request flood against the provider.
+"""
+import logging
+import threading
+import time
+
+import requests
+from django.conf import settings
+from jwt.algorithms import RSAAlgorithm
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSError(Exception):
+    pass
+
+
+class SigningKeyNotFound(JWKSError):
+    pass
+
+
+class JWKSUnavailable(JWKSError):
+    pass
+
+
+_ANY = object()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def http_session():
+    """Shared keep-alive session for calls to the identity provider."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=16,
+                    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504)),
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+class JWKSCache:
+    def __init__(self, url, ttl=None, max_stale=None, min_refresh_interval=None, timeout=None, session=None):
+        self.url = url
+        self.ttl = settings.JWKS_CACHE_TTL if ttl is None else ttl
+        self.max_stale = settings.JWKS_MAX_STALE if max_stale is None else max_stale
+        self.min_refresh_interval = (
+            settings.JWKS_MIN_REFRESH_INTERVAL if min_refresh_interval is None else min_refresh_interval
+        )
+        self.timeout = settings.JWKS_TIMEOUT if timeout is None else timeout
+        self.session = session
+        self.fetch_count = 0
+        self._keys = {}           # kid -> parsed public key
+        self._fetched_at = None   # monotonic time of the last successful fetch
+        self._forced_at = None    # last refresh caused by an unknown kid
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get_key(self, kid):
+        now = time.monotonic()
+        key = self._keys.get(kid)
+        age = None if self._fetched_at is None else now - self._fetched_at
+
+        if key is not None and age < self.ttl:
+            return key
+        if key is not None and age < self.ttl + self.max_stale:
+            # Stale while revalidate: answer now, refresh off the login path.
+            self._refresh_in_background()
+            return key
+
+        # Unknown kid, or keys too old to trust: refresh inline.
+        self._refresh(rate_limited=key is None and self._fetched_at is not None, seen=self._fetched_at)
+        key = self._keys.get(kid)
+        if key is None:
+            raise SigningKeyNotFound(kid)
+        return key
+
+    def _refresh(self, rate_limited=False, seen=_ANY):
+        with self._lock:
+            if seen is not _ANY and self._fetched_at != seen:
+                return  # another caller refreshed while we waited for the lock
+            now = time.monotonic()
+            if rate_limited:
+                if self._forced_at is not None and now - self._forced_at < self.min_refresh_interval:
+                    return
+                self._forced_at = now
+            try:
+                keys = self._fetch()
+            except (requests.RequestException, ValueError, KeyError) as exc:
+                if self._fetched_at is not None and now - self._fetched_at < self.ttl + self.max_stale:
+                    logger.warning('JWKS refresh from %s failed, keeping cached keys: %s', self.url, exc)
+                    return
+                raise JWKSUnavailable(str(exc)) from exc
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+
+    def _fetch(self):
+        self.fetch_count += 1
+        session = self.session or http_session()
+        response = session.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        keys = {}
+        for jwk in response.json()['keys']:
+            if jwk.get('kty') == 'RSA' and 'kid' in jwk:
+                keys[jwk['kid']] = RSAAlgorithm.from_jwk(jwk)
+        return keys
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._refresh()
+            except JWKSError:
+                logger.warning('Background JWKS refresh from %s failed', self.url)
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name='jwks-refresh', daemon=True).start()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_jwks(url):
+    cache = _caches.get(url)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.setdefault(url, JWKSCache(url))
+    return cache
+
+
+def reset():
+    with _caches_lock:
+        _caches.clear()
@@ -0,0 +1,117 @@
+"""
+Shared response cache for public catalog listings.
+
+The public, approved catalog filtered by category / task type / output
+format looks the same to every caller, so PromptViewSet.list stores that
+part of the payload in the ``catalog`` cache alias (see CACHES in settings)
+and merges the caller's own fields in afterwards.
+
+Keys carry a global catalog version. Any save or delete of a prompt that is
+or was public bumps it (api/signals.py), which orphans every cached page at
+once; the orphans age out with CATALOG_LIST_CACHE_TIMEOUT. With the default
+local-memory backend each worker has its own version, so use the file or a
+shared backend when running more than one process.
+
+Concurrent misses for the same key are collapsed: one caller builds, the
+others wait for its result (single-flight), both within a process and,
+through ``cache.add``, across processes sharing a backend.
+"""
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+CACHE_ALIAS = 'catalog'
+VERSION_KEY = 'catalog:list:version'
+# Query parameters that shape the shared payload. Requests with anything else
+# (search, mine, status, ...) bypass the cache.
+CACHEABLE_PARAMS = (
+    'category', 'task_type', 'output_format', 'username', 'ordering', 'cursor', 'limit', 'offset',
+)
+BUILD_LOCK_TIMEOUT = 30
+BUILD_WAIT_SECONDS = 5
+BUILD_POLL_SECONDS = 0.05
+
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def current_version(version_key=VERSION_KEY):
+    cache = get_cache()
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, 1, timeout=None)
+        version = cache.get(version_key, 1)
+    return version
+
+
+def bump_version(version_key=VERSION_KEY):
+    cache = get_cache()
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.add(version_key, 2, timeout=None)
+
+
+def cache_key(params):
+    """The cache key for a listing request, or None if it is not cacheable."""
+    if any(name not in CACHEABLE_PARAMS for name in params):
+        return None
+    normalized = urlencode(sorted((name, params.get(name, '')) for name in params))
+    digest = hashlib.sha1(normalized.encode()).hexdigest()
+    return f'catalog:list:{current_version()}:{digest}'
+
+
+def _local_lock(key):
+    with _local_locks_guard:
+        lock = _local_locks.get(key)
+        if lock is None:
+            lock = _local_locks[key] = threading.Lock()
+        return lock
+
+
+def get_or_build(key, build):
+    """Return the cached value for ``key``, calling ``build()`` at most once per miss."""
+    cache = get_cache()
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock = _local_lock(key)
+    try:
+        with lock:
+            value = cache.get(key)
+            if value is not None:
+                return value
+            return _build_once(cache, key, build)
+    finally:
+        with _local_locks_guard:
+            if _local_locks.get(key) is lock and not lock.locked():
+                del _local_locks[key]
+
+
+def _build_once(cache, key, build):
+    lock_key = f'{key}:building'
+    if cache.add(lock_key, 1, timeout=BUILD_LOCK_TIMEOUT):
+        try:
+            value = build()
+            cache.set(key, value, timeout=settings.CATALOG_LIST_CACHE_TIMEOUT)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    # Another process is building this page; wait for it rather than pile on.
+    deadline = time.monotonic() + BUILD_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(BUILD_POLL_SECONDS)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return build()
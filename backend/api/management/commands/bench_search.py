@@ -0,0 +1,90 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.filters import PromptSearchFilter
+from api.models import CATEGORY_CHOICES, Prompt
+from api.pagination import CATALOG_ORDERING
+from api.views import PromptViewSet
+
+WORDS = (
+    'analyze summarize draft review budget forecast customer onboarding release '
+    'roadmap pipeline campaign audience brand incident postmortem hiring interview '
+    'policy compliance architecture migration latency dashboard report quarterly '
+    'strategy workshop outline checklist template feedback survey pricing churn '
+    'retention training curriculum lesson explain compare evaluate optimize refactor'
+).split()
+TERMS = ['budget', 'incident postmortem', '"release roadmap"', 'churn -pricing', 'zzzunmatched']
+
+
+class Command(BaseCommand):
+    help = "Benchmark ILIKE search against full-text search on a synthetic catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prompts', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=60)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Commit the synthetic prompts instead of rolling them back.',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        with transaction.atomic():
+            self.seed(rng, options['prompts'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE api_prompt')
+
+            self.stdout.write(f"{'term':<22} {'mode':<9} {'rows':>5} {'p50 ms':>9} {'p95 ms':>9}")
+            for term in TERMS:
+                for mode in ('ilike', 'fulltext'):
+                    rows, timings = self.run(term, mode, options['repeat'], options['page_size'])
+                    p50 = statistics.median(timings)
+                    p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else p50
+                    self.stdout.write(f'{term:<22} {mode:<9} {rows:>5} {p50:>9.2f} {p95:>9.2f}')
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def seed(self, rng, count):
+        categories = [c[0] for c in CATEGORY_CHOICES]
+        batch = []
+        started = time.perf_counter()
+        for i in range(count):
+            batch.append(Prompt(
+                title=' '.join(rng.choices(WORDS, k=5)).capitalize(),
+                prompt_description=' '.join(rng.choices(WORDS, k=20)),
+                prompt_text=' '.join(rng.choices(WORDS, k=120)),
+                category=rng.choice(categories),
+                status='approved',
+                copy_count=rng.randint(0, 500),
+            ))
+            if len(batch) == 5000:
+                Prompt.objects.bulk_create(batch)
+                batch = []
+        Prompt.objects.bulk_create(batch)
+        self.stdout.write(f'Seeded {count} prompts in {time.perf_counter() - started:.1f}s')
+
+    def run(self, term, mode, repeat, page_size):
+        factory = APIRequestFactory()
+        view = PromptViewSet()
+        backend = PromptSearchFilter()
+        params = {'search': term}
+        if mode == 'fulltext':
+            params['search_mode'] = 'fulltext'
+        request = Request(factory.get('/api/prompts/', params))
+
+        timings, rows = [], 0
+        for _ in range(repeat):
+            qs = Prompt.objects.filter(is_public=True, status='approved').order_by(*CATALOG_ORDERING)
+            qs = backend.filter_queryset(request, qs, view)
+            started = time.perf_counter()
+            rows = len(list(qs[:page_size]))
+            timings.append((time.perf_counter() - started) * 1000)
+        return rows, timings
@@ -0,0 +1,119 @@
+import itertools
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api import similar
+from api.models import CATEGORY_CHOICES, Prompt
+from api.views import PromptViewSet
+
+SYLLABLES = 'ka lo mi ne ru sa ti vo ze bra cle dro fin gal hup jor kem lut mor nix pel quo ris tav'.split()
+
+
+class Command(BaseCommand):
+    help = "Benchmark /prompts/<id>/similar/ on a synthetic catalog, index built into a scratch directory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prompts', type=int, default=100_000)
+        parser.add_argument('--vocabulary', type=int, default=20_000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--batch', type=int, default=64)
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        directory = Path(tempfile.mkdtemp(prefix='similar-bench-'))
+        try:
+            with transaction.atomic(), override_settings(SIMILAR_INDEX_DIR=directory):
+                ids = self.seed(rng, options['prompts'], options['vocabulary'])
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE api_prompt')
+
+                started = time.perf_counter()
+                manifest = similar.build()
+                size = sum(path.stat().st_size for path in (directory / manifest['path']).iterdir())
+                self.stdout.write(
+                    f"Built {manifest['prompts']} prompts, {manifest['terms']} terms, {manifest['nnz']} weights "
+                    f"in {time.perf_counter() - started:.1f}s, {size / 2**20:.0f} MiB on disk"
+                )
+
+                started = time.perf_counter()
+                index = similar.SimilarIndex(directory / manifest['path'], manifest)
+                self.stdout.write(f'Mapped in {(time.perf_counter() - started) * 1000:.2f}ms')
+
+                sample = rng.sample(ids, min(options['queries'], len(ids)))
+                prompts = Prompt.objects.in_bulk(sample)
+                k = options['limit']
+
+                self.report('single', [self.timed(index.similar, prompts[pk], k) for pk in sample])
+
+                rows = [index.row(pk) for pk in sample]
+                timings = []
+                for start in range(0, len(rows), options['batch']):
+                    batch = rows[start:start + options['batch']]
+                    elapsed = self.timed(index.search, index.matrix[batch], k, batch)
+                    timings.extend([elapsed / len(batch)] * len(batch))
+                self.report(f"batch {options['batch']}", timings, per='query')
+
+                view = PromptViewSet.as_view({'get': 'similar'})
+                factory = APIRequestFactory()
+                user = User.objects.create_user('bench-similar')
+                self.report('endpoint', [self.request(view, factory, user, pk, k) for pk in sample[:100]])
+                transaction.set_rollback(True)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def seed(self, rng, count, vocabulary):
+        words = sorted({''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(vocabulary * 2)})
+        rng.shuffle(words)
+        words = words[:vocabulary]
+        # Zipf-like word frequencies, as in real text.
+        weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+        categories = [c[0] for c in CATEGORY_CHOICES]
+
+        def text(n):
+            return ' '.join(rng.choices(words, cum_weights=weights, k=n))
+
+        started = time.perf_counter()
+        batch, ids = [], []
+        for i in range(count):
+            batch.append(Prompt(
+                title=text(5).capitalize(), prompt_description=text(20), prompt_text=text(120),
+                category=rng.choice(categories), status='approved',
+            ))
+            if len(batch) == 5000:
+                ids.extend(p.pk for p in Prompt.objects.bulk_create(batch))
+                batch = []
+        ids.extend(p.pk for p in Prompt.objects.bulk_create(batch))
+        self.stdout.write(f'Seeded {count} prompts in {time.perf_counter() - started:.1f}s')
+        return ids
+
+    def request(self, view, factory, user, pk, limit):
+        request = factory.get(f'/api/prompts/{pk}/similar/', {'limit': limit})
+        force_authenticate(request, user)
+        started = time.perf_counter()
+        response = view(request, pk=pk)
+        response.render()
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != 200:
+            raise CommandError(f'/api/prompts/{pk}/similar/ answered {response.status_code}')
+        return elapsed
+
+    def timed(self, func, *args, **kwargs):
+        started = time.perf_counter()
+        func(*args, **kwargs)
+        return (time.perf_counter() - started) * 1000
+
+    def report(self, label, timings, per='request'):
+        p50 = statistics.median(timings)
+        p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else p50
+        self.stdout.write(f'{label:<9} n={len(timings):<5} p50={p50:7.2f}ms p95={p95:7.2f}ms per {per}')
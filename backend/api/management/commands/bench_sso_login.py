@@ -0,0 +1,126 @@
+import json
+import statistics
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+import requests
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from jwt.algorithms import RSAAlgorithm
+from rest_framework.test import APIRequestFactory
+
+from api import jwks
+from api.views import MicrosoftLoginView
+
+CLIENT_ID = 'bench-client'
+
+
+class StubJWKSServer:
+    """
+    A local stand-in for the identity provider's JWKS endpoint. ``latency``
+    (seconds) is added to every response; ``fail`` makes it answer 503.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.fail = False
+        self.requests = 0
+        self.private_keys = {}
+        self.jwks = []
+        self.add_key()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.latency)
+                if stub.fail:
+                    body, code = b'{}', 503
+                else:
+                    body, code = json.dumps({'keys': stub.jwks}).encode(), 200
+                try:
+                    self.send_response(code)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client timed out first
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/keys'
+
+    def add_key(self):
+        kid = uuid.uuid4().hex
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+        self.jwks.append({**jwk, 'kid': kid, 'use': 'sig'})
+        self.private_keys[kid] = private_key
+        return kid
+
+    def token(self, email, kid=None, audience=CLIENT_ID):
+        kid = kid or next(iter(self.private_keys))
+        claims = {'preferred_username': email, 'name': email, 'aud': audience, 'exp': int(time.time()) + 600}
+        return jwt.encode(claims, self.private_keys[kid], algorithm='RS256', headers={'kid': kid})
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Command(BaseCommand):
+    help = "Measure SSO login latency with and without the JWKS cache, against a local stub key endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument(
+            '--latency', type=float, default=80,
+            help='Milliseconds the stub JWKS endpoint takes to answer, to stand in for the real round trip.',
+        )
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        view = MicrosoftLoginView.as_view()
+        self.stdout.write(f'{"mode":<9} {"logins":>6} {"p50 ms":>8} {"p95 ms":>8} {"fetches":>8}')
+
+        with StubJWKSServer(latency=options['latency'] / 1000) as stub:
+            tokens = [stub.token(f'bench{i}@example.com') for i in range(options['logins'])]
+            # "uncached" reproduces the old behaviour: a fresh, unpooled GET per login.
+            modes = {
+                'uncached': jwks.JWKSCache(stub.url, ttl=0, max_stale=0, session=requests),
+                'cached': jwks.JWKSCache(stub.url),
+            }
+            for mode, cache in modes.items():
+                jwks.reset()
+                jwks._caches[stub.url] = cache
+                timings = []
+                with override_settings(SSO_JWKS_URL=stub.url, SSO_CLIENT_ID=CLIENT_ID), transaction.atomic():
+                    for token in tokens:
+                        request = factory.post('/api/sso-login/', {'access_token': token}, format='json')
+                        t0 = time.perf_counter()
+                        response = view(request)
+                        timings.append((time.perf_counter() - t0) * 1000)
+                        if response.status_code != 200:
+                            raise RuntimeError(f'login failed: {response.data}')
+                    transaction.set_rollback(True)
+                timings.sort()
+                p95 = timings[int(len(timings) * 0.95) - 1]
+                self.stdout.write(
+                    f'{mode:<9} {len(timings):>6} {statistics.median(timings):>8.2f} {p95:>8.2f} {cache.fetch_count:>8}'
+                )
+        jwks.reset()
@@ -0,0 +1,68 @@
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from api.management.commands.bench_search import WORDS
+from api.models import CATEGORY_CHOICES, TASK_TYPE_CHOICES
+from api.typeahead import TypeaheadIndex
+
+
+class Command(BaseCommand):
+    help = "Measure autocomplete lookup latency on a synthetic in-memory title set (no database)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=100_000)
+        parser.add_argument('--lookups', type=int, default=20_000)
+        parser.add_argument('--updates', type=int, default=2_000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        categories = [c[0] for c in CATEGORY_CHOICES]
+        task_types = [t[0] for t in TASK_TYPE_CHOICES]
+        rows = [
+            (pk, ' '.join(rng.choices(WORDS, k=rng.randint(2, 6))).capitalize(),
+             rng.choice(categories), rng.choice(task_types), int(rng.paretovariate(1.2)))
+            for pk in range(1, options['titles'] + 1)
+        ]
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        index = TypeaheadIndex(max_prompts=options['titles'])
+        index.load(rows)
+        build = time.perf_counter() - started
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        self.stdout.write(f'Built {len(rows)} titles in {build:.2f}s, ~{memory / 2**20:.0f} MiB')
+
+        # Prefixes typed one keystroke at a time, as the UI sends them.
+        prefixes = []
+        while len(prefixes) < options['lookups']:
+            word = rng.choice(WORDS)
+            prefixes.extend(word[:i] for i in range(1, len(word) + 1))
+
+        for label in ('cold', 'warm'):
+            timings = []
+            for prefix in prefixes[:options['lookups']]:
+                t0 = time.perf_counter()
+                index.lookup(prefix)
+                timings.append((time.perf_counter() - t0) * 1e6)
+            self.report(label, timings)
+
+        timings = []
+        for _ in range(options['updates']):
+            pk, title, category, task_type, copies = rng.choice(rows)
+            t0 = time.perf_counter()
+            index.upsert_prompt(pk, title, category, task_type, copies + rng.randint(1, 5))
+            timings.append((time.perf_counter() - t0) * 1e6)
+        self.report('update', timings)
+
+    def report(self, label, timings):
+        timings.sort()
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        self.stdout.write(
+            f'{label:<7} n={len(timings):<6} p50={statistics.median(timings):8.1f}us '
+            f'p99={p99:8.1f}us max={timings[-1]:9.1f}us'
+        )
@@ -0,0 +1,101 @@
+import random
+import statistics
+import time
+import zlib
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import versioning
+from api.management.commands.bench_search import WORDS
+from api.models import Prompt, PromptVersion
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare PromptVersion storage as full copies vs. keyframes + diffs, and time "
+        "rebuilding versions from the database. Rolls back unless --keep."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prompts', type=int, default=200)
+        parser.add_argument('--edits', type=int, default=60, help='Versions per prompt.')
+        parser.add_argument('--lines', type=int, default=60, help='Lines of prompt text.')
+        parser.add_argument('--samples', type=int, default=500)
+        parser.add_argument('--keep', action='store_true')
+
+    def handle(self, *args, **options):
+        rng = random.Random(11)
+        with transaction.atomic():
+            user, _ = User.objects.get_or_create(username='bench-versions')
+            full_raw = full_zlib = stored = 0
+            started = time.perf_counter()
+            for _ in range(options['prompts']):
+                prompt = Prompt.objects.create(
+                    user=user, title='Bench', prompt_text='', category='engineering',
+                    task_type='research', output_format='text', status='approved',
+                )
+                lines = [self.line(rng) for _ in range(options['lines'])]
+                guidance = self.line(rng)
+                latest, latest_texts, batch = None, None, []
+                for _ in range(options['edits']):
+                    self.mutate(rng, lines)
+                    snapshot = {
+                        'title': prompt.title, 'task_type': 'research', 'output_format': 'text',
+                        'category': 'engineering', 'prompt_description': 'Synthetic history',
+                        'prompt_text': '\n'.join(lines), 'guidance': guidance,
+                    }
+                    texts = {f: snapshot[f] for f in versioning.TEXT_FIELDS}
+                    version = versioning.build_version(prompt.pk, snapshot, latest, latest_texts, edited_by=user)
+                    if version is None:
+                        continue
+                    raw = ''.join(v or '' for v in texts.values()).encode()
+                    full_raw += len(raw)
+                    full_zlib += len(zlib.compress(raw))
+                    stored += len(version.payload)
+                    batch.append(version)
+                    latest, latest_texts = version, texts
+                PromptVersion.objects.bulk_create(batch)
+            versions = PromptVersion.objects.filter(prompt__user=user).count()
+            self.stdout.write(f'Seeded {versions} versions in {time.perf_counter() - started:.1f}s')
+            self.stdout.write(f'full copies, raw      {full_raw / 2**20:9.2f} MiB')
+            self.stdout.write(f'full copies, zlib     {full_zlib / 2**20:9.2f} MiB  (roughly what TOAST would keep)')
+            self.stdout.write(f'keyframes + diffs     {stored / 2**20:9.2f} MiB  ({full_raw / max(stored, 1):.1f}x smaller than raw)')
+
+            ids = list(
+                PromptVersion.objects.filter(prompt__user=user)
+                .values_list('pk', 'prompt_id', 'depth')
+            )
+            by_depth = {}
+            for pk, prompt_id, depth in rng.sample(ids, min(options['samples'], len(ids))):
+                version = PromptVersion.objects.only('pk', 'prompt_id').get(pk=pk)
+                t0 = time.perf_counter()
+                versioning.load_texts([version])
+                by_depth.setdefault(depth, []).append((time.perf_counter() - t0) * 1000)
+            everything = sorted(t for timings in by_depth.values() for t in timings)
+            self.stdout.write(
+                f'rebuild one version   p50={statistics.median(everything):.2f}ms '
+                f'p95={everything[int(len(everything) * 0.95) - 1]:.2f}ms'
+            )
+            for depth in (0, versioning.KEYFRAME_INTERVAL // 2, versioning.KEYFRAME_INTERVAL - 1):
+                if depth in by_depth:
+                    self.stdout.write(f'  depth {depth:>2}: p50={statistics.median(by_depth[depth]):.2f}ms')
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def line(self, rng):
+        return ' '.join(rng.choices(WORDS, k=rng.randint(6, 14)))
+
+    def mutate(self, rng, lines):
+        # A typical edit touches a line or two.
+        for _ in range(rng.randint(1, 2)):
+            choice = rng.random()
+            i = rng.randrange(len(lines))
+            if choice < 0.6:
+                lines[i] = self.line(rng)
+            elif choice < 0.8:
+                lines.insert(i, self.line(rng))
+            elif len(lines) > 5:
+                del lines[i]
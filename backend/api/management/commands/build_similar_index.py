@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import similar
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the TF-IDF index behind /prompts/<id>/similar/. Schedule a full build nightly and "
+        "--incremental every few minutes; running workers switch to the new build on their own."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only re-vectorize prompts changed since the last build, keeping its vocabulary.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        previous = similar.read_manifest()
+        manifest = similar.build(incremental=options['incremental'])
+        if previous and manifest['version'] == previous['version']:
+            self.stdout.write(f"Index {manifest['version']} is up to date.")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Built index {manifest['version']} ({manifest['mode']}): {manifest['prompts']} prompts, "
+            f"{manifest['terms']} terms, {manifest['nnz']} weights in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,64 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from api import exporter
+from api.models import Prompt
+from api.pagination import CATALOG_ORDERING
+
+
+class Command(BaseCommand):
+    help = (
+        "Export prompts, their versions or their copy feedback as JSONL, CSV or xlsx, streamed "
+        "from the database. Filters match the prompt list endpoint; prompt exports re-import "
+        "with import_prompts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', choices=exporter.DATASETS, default='prompts')
+        parser.add_argument('--format', dest='file_format', choices=sorted(exporter.ENCODERS), default='jsonl')
+        parser.add_argument('--output', '-o', default='-', help='File to write, or - for stdout.')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--status')
+        parser.add_argument('--category')
+        parser.add_argument('--task-type')
+        parser.add_argument('--output-format')
+        parser.add_argument('--username')
+        parser.add_argument('--search', help='Case-insensitive match on title, description or text.')
+        parser.add_argument('--public', action='store_true', help='Only the public, approved catalog.')
+
+    def handle(self, *args, **options):
+        if options['file_format'] == 'xlsx' and options['output'] == '-':
+            raise CommandError('xlsx needs --output.')
+        prompts = self.selection(options)
+        blocks = exporter.export(options['dataset'], prompts, options['file_format'], compress=options['gzip'])
+
+        written = 0
+        target = sys.stdout.buffer if options['output'] == '-' else open(options['output'], 'wb')
+        try:
+            for block in blocks:
+                target.write(block)
+                written += len(block)
+        finally:
+            if target is not sys.stdout.buffer:
+                target.close()
+        if options['output'] != '-':
+            self.stderr.write(f"Wrote {written:,} bytes to {options['output']}.")
+
+    def selection(self, options):
+        prompts = Prompt.objects.all()
+        if options['public']:
+            prompts = prompts.filter(is_public=True, status='approved')
+        for option, field in (
+            ('status', 'status'), ('category', 'category'), ('task_type', 'task_type'),
+            ('output_format', 'output_format'), ('username', 'user__username'),
+        ):
+            if options[option]:
+                prompts = prompts.filter(**{field: options[option]})
+        if options['search']:
+            term = options['search']
+            prompts = prompts.filter(
+                Q(title__icontains=term) | Q(prompt_description__icontains=term) | Q(prompt_text__icontains=term)
+            )
+        return prompts.order_by(*CATALOG_ORDERING)
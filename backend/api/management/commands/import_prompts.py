@@ -0,0 +1,130 @@
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api import facets, importer, listing_cache, typeahead
+from api import snapshot as catalog_snapshot
+
+# 20 bind parameters per row; Postgres allows 65535 per statement.
+MAX_BATCH_SIZE = 3000
+MAX_REPORTED_ERRORS = 20
+
+
+def batches(rows, size):
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Import prompts from an .xlsx, .csv or .jsonl file with title, prompt_text, category, "
+        "task_type, output_format and optional prompt_description, guidance columns. Rows already in "
+        "the library (same content) are skipped, so the import can be re-run safely."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', help='Owner of the imported prompts (default: the first superuser).')
+        parser.add_argument('--status', choices=['approved', 'pending'], default='approved')
+        parser.add_argument('--private', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--workers', type=int, default=0,
+            help='Validation processes. 0 validates inline, which is faster unless rows need heavy cleaning.',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            raise CommandError(f'--batch-size must be between 1 and {MAX_BATCH_SIZE}.')
+        user = self.get_user(options['user'])
+        try:
+            rows = importer.read_rows(options['path'])
+            chunks = batches(rows, batch_size)
+            totals = self.run(chunks, user, options)
+        except (importer.ImportFormatError, OSError) as exc:
+            raise CommandError(str(exc))
+
+        if totals['created']:
+            self.catalog_changed(options)
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {totals['read']} rows, {totals['created']} created, "
+            f"{totals['duplicates']} already present, {totals['invalid']} invalid "
+            f"in {totals['elapsed']:.1f}s ({totals['read'] / max(totals['elapsed'], 1e-9):,.0f} rows/s)."
+        ))
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'No user named {username!r}.')
+        user = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if user is None:
+            raise CommandError('No superuser to own the prompts; create one or pass --user.')
+        return user
+
+    def validated(self, chunks, workers):
+        """(batch size, valid rows, errors) per batch, in file order."""
+        if workers <= 0:
+            for batch in chunks:
+                yield (len(batch),) + importer.clean_batch(batch)
+            return
+        # Bounded read-ahead: at most two batches per worker in flight.
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for batch in chunks:
+                pending.append((len(batch), pool.submit(importer.clean_batch, batch)))
+                if len(pending) >= workers * 2:
+                    size, future = pending.popleft()
+                    yield (size,) + future.result()
+            while pending:
+                size, future = pending.popleft()
+                yield (size,) + future.result()
+
+    def run(self, chunks, user, options):
+        totals = {'read': 0, 'created': 0, 'duplicates': 0, 'invalid': 0}
+        started = last_report = time.perf_counter()
+        for size, valid, errors in self.validated(chunks, options['workers']):
+            created = 0
+            if valid and not options['dry_run']:
+                created = importer.write_batch(
+                    valid, user, status=options['status'], is_public=not options['private'],
+                )
+            totals['read'] += size
+            totals['created'] += created
+            if not options['dry_run']:
+                totals['duplicates'] += len(valid) - created
+            for number, error in errors:
+                if totals['invalid'] < MAX_REPORTED_ERRORS:
+                    self.stderr.write(f'Row {number}: {error}')
+                totals['invalid'] += 1
+
+            now = time.perf_counter()
+            if now - last_report >= 2:
+                last_report = now
+                self.stdout.write(
+                    f"  {totals['read']:,} rows read, {totals['created']:,} created "
+                    f"({totals['read'] / (now - started):,.0f} rows/s)"
+                )
+        totals['elapsed'] = time.perf_counter() - started
+        if totals['invalid'] > MAX_REPORTED_ERRORS:
+            self.stderr.write(f"... and {totals['invalid'] - MAX_REPORTED_ERRORS} more invalid rows.")
+        return totals
+
+    def catalog_changed(self, options):
+        # Rows went in with raw INSERTs, so no signals fired.
+        listing_cache.bump_version()
+        facets.bump_version()
+        if options['status'] == 'approved' and not options['private']:
+            typeahead.request_rebuild()
+            # Built here: a background rebuild would die with this process.
+            catalog_snapshot.build_snapshot()
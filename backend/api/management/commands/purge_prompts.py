@@ -0,0 +1,222 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, models, transaction
+from django.utils import timezone
+
+from api import facets, listing_cache, typeahead
+from api import snapshot as catalog_snapshot
+from api.changes import CHANGE_LOG_RETENTION
+from api.models import Prompt, PromptChange
+
+# Give up on a chunk rather than queue behind a long transaction: a waiting
+# DELETE or TRUNCATE blocks every later writer (or, for TRUNCATE, reader).
+LOCK_TIMEOUT = '2s'
+LOCK_RETRIES = 5
+PRUNE_CHUNK_SIZE = 10000
+
+
+def dependents():
+    """(table, column, on_delete) for every foreign key pointing at Prompt."""
+    return [
+        (rel.related_model._meta.db_table, rel.field.column, rel.on_delete)
+        for rel in Prompt._meta.related_objects
+        if rel.on_delete in (models.CASCADE, models.SET_NULL)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete prompts and everything hanging off them (votes, bookmarks, feedback, versions) "
+        "with set-based SQL in short, chunked transactions. Filters combine with AND; --all "
+        "selects every prompt. Also drops change-log entries older than the sync retention."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', action='append', choices=['pending', 'approved', 'rejected'])
+        parser.add_argument('--category', action='append')
+        parser.add_argument('--author', action='append', help='Username; repeat for several.')
+        parser.add_argument('--older-than', type=int, metavar='DAYS', help='Created more than DAYS days ago.')
+        parser.add_argument('--all', action='store_true', help='Purge every prompt.')
+        parser.add_argument(
+            '--truncate', action='store_true',
+            help='With --all: TRUNCATE the tables instead of deleting in chunks. Fast, but locks them briefly.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Prompts per transaction.')
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between chunks.')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would go.')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive')
+
+    def handle(self, *args, **options):
+        queryset = self.selection(options)
+        if options['truncate'] and not options['all']:
+            raise CommandError('--truncate only works with --all.')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+
+        self.report_counts(queryset)
+        if options['dry_run']:
+            return
+        if options['interactive']:
+            answer = input('Type "yes" to delete these rows: ')
+            if answer != 'yes':
+                raise CommandError('Purge cancelled.')
+
+        started = time.perf_counter()
+        if options['truncate']:
+            deleted = self.truncate()
+        else:
+            deleted = self.delete_in_chunks(queryset, options['chunk_size'], options['pause'])
+        pruned = self.prune_change_log()
+        if deleted:
+            self.catalog_changed()
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {deleted} prompts and {pruned} expired change-log rows '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
+
+    def selection(self, options):
+        filters = models.Q()
+        if options['status']:
+            filters &= models.Q(status__in=options['status'])
+        if options['category']:
+            filters &= models.Q(category__in=options['category'])
+        if options['author']:
+            found = dict(User.objects.filter(username__in=options['author']).values_list('username', 'pk'))
+            missing = sorted(set(options['author']) - set(found))
+            if missing:
+                raise CommandError(f'Unknown author(s): {", ".join(missing)}')
+            filters &= models.Q(user_id__in=found.values())
+        if options['older_than'] is not None:
+            filters &= models.Q(created_at__lt=timezone.now() - timedelta(days=options['older_than']))
+        if not filters and not options['all']:
+            raise CommandError('Pass at least one filter, or --all to purge every prompt.')
+        if filters and options['all']:
+            raise CommandError('--all cannot be combined with filters.')
+        return Prompt.objects.filter(filters)
+
+    def report_counts(self, queryset):
+        ids = queryset.values('pk')
+        self.stdout.write(f'{Prompt._meta.db_table}: {queryset.count()}')
+        for rel in Prompt._meta.related_objects:
+            related = rel.related_model._base_manager.filter(**{f'{rel.field.name}__in': ids})
+            verb = 'cleared' if rel.on_delete == models.SET_NULL else 'deleted'
+            self.stdout.write(f'{rel.related_model._meta.db_table}: {related.count()} {verb}')
+        expired = PromptChange.objects.filter(changed_at__lt=timezone.now() - CHANGE_LOG_RETENTION)
+        self.stdout.write(f'{PromptChange._meta.db_table}: {expired.count()} expired')
+
+    def locked(self, work):
+        """Run ``work(cursor)`` in a transaction with a short lock timeout, retrying on lock waits."""
+        for attempt in range(LOCK_RETRIES):
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                    return work(cursor)
+            except OperationalError as exc:
+                if 'lock timeout' not in str(exc) or attempt == LOCK_RETRIES - 1:
+                    raise
+                self.stderr.write('Waiting for locks held by other transactions...')
+                time.sleep(1 + attempt)
+
+    def delete_chunk(self, cursor, queryset, ids):
+        prompts = Prompt._meta.db_table
+        # Lock first, so votes or bookmarks cannot be added to these prompts
+        # between deleting the children and the prompts themselves, and
+        # re-check the filters: a row may have changed since it was listed.
+        ids = list(
+            queryset.filter(pk__in=ids).order_by('pk').select_for_update().values_list('pk', flat=True)
+        )
+        if not ids:
+            return 0
+        for table, column, on_delete in dependents():
+            if on_delete == models.SET_NULL:
+                cursor.execute(f'UPDATE {table} SET {column} = NULL WHERE {column} = ANY(%s)', [ids])
+            else:
+                cursor.execute(f'DELETE FROM {table} WHERE {column} = ANY(%s)', [ids])
+        # Delta-sync clients have to drop the public ones.
+        cursor.execute(
+            f"""
+            INSERT INTO {PromptChange._meta.db_table} (prompt_id, action, changed_at)
+            SELECT id, %s, %s FROM {prompts}
+            WHERE id = ANY(%s) AND is_public AND status = 'approved'
+            """,
+            [PromptChange.ACTION_DELETED, timezone.now(), ids],
+        )
+        cursor.execute(f'DELETE FROM {prompts} WHERE id = ANY(%s) RETURNING id', [ids])
+        deleted = [pk for pk, in cursor.fetchall()]
+        transaction.on_commit(lambda: typeahead.sync_prompts(deleted))
+        return len(deleted)
+
+    def delete_in_chunks(self, queryset, chunk_size, pause):
+        deleted, last_id = 0, 0
+        started = last_report = time.perf_counter()
+        while True:
+            ids = list(
+                queryset.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not ids:
+                return deleted
+            last_id = ids[-1]
+            deleted += self.locked(lambda cursor: self.delete_chunk(cursor, queryset, ids))
+
+            now = time.perf_counter()
+            if now - last_report >= 2:
+                last_report = now
+                self.stdout.write(f'  {deleted:,} prompts deleted ({deleted / (now - started):,.0f}/s)')
+            if pause:
+                time.sleep(pause)
+
+    def truncate(self):
+        prompts = Prompt._meta.db_table
+        if any(on_delete == models.SET_NULL for _, _, on_delete in dependents()):
+            raise CommandError('Some rows pointing at prompts must survive them; purge without --truncate.')
+
+        def work(cursor):
+            cursor.execute(f'SELECT count(*) FROM {prompts}')
+            count = cursor.fetchone()[0]
+            cursor.execute(
+                f"""
+                INSERT INTO {PromptChange._meta.db_table} (prompt_id, action, changed_at)
+                SELECT id, %s, %s FROM {prompts} WHERE is_public AND status = 'approved'
+                """,
+                [PromptChange.ACTION_DELETED, timezone.now()],
+            )
+            # Every referencing table by name, not CASCADE, so a new foreign
+            # key to Prompt makes this fail instead of silently wiping it.
+            # Ids keep counting up; tombstones and caches refer to them.
+            tables = [prompts] + sorted({table for table, _, _ in dependents()})
+            # Foreign keys are deferred; TRUNCATE refuses to run with checks pending.
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute(f'TRUNCATE {", ".join(tables)}')
+            transaction.on_commit(typeahead.reset_index)
+            return count
+
+        return self.locked(work)
+
+    def prune_change_log(self):
+        table = PromptChange._meta.db_table
+        cutoff = timezone.now() - CHANGE_LOG_RETENTION
+
+        def work(cursor):
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN '
+                f'(SELECT id FROM {table} WHERE changed_at < %s LIMIT %s)',
+                [cutoff, PRUNE_CHUNK_SIZE],
+            )
+            return cursor.rowcount
+
+        pruned = 0
+        while True:
+            count = self.locked(work)
+            pruned += count
+            if count < PRUNE_CHUNK_SIZE:
+                return pruned
+
+    def catalog_changed(self):
+        # Raw SQL sends no signals; do what api/signals.py would, once.
+        listing_cache.bump_version()
+        facets.bump_version()
+        typeahead.request_rebuild()
+        catalog_snapshot.build_snapshot()
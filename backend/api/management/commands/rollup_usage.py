@@ -0,0 +1,40 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import usage
+
+
+class Command(BaseCommand):
+    help = (
+        "Aggregate the usage event log into per-prompt daily totals (served by /prompts/<id>/stats/), "
+        "then prune raw events past USAGE_EVENT_RETENTION_DAYS. Safe to re-run; schedule it hourly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', metavar='YYYY-MM-DD',
+            help='Recompute every day from this one on (default: from the day before the last rollup).',
+        )
+        parser.add_argument('--no-prune', action='store_false', dest='prune')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a YYYY-MM-DD date.')
+        else:
+            since = usage.default_since()
+        if since is None:
+            self.stdout.write('No usage events yet.')
+            return
+
+        since, rows = usage.rollup(since)
+        pruned = usage.prune() if options['prune'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {rows} prompt-days since {since}, pruned {pruned} raw events '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
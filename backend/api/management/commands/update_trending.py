@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import listing_cache, trending
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold the copies, likes and ratings since the previous run into the trending score behind "
+        "?ordering=trending. Meant to run every few minutes (cron or similar); only prompts with new "
+        "activity are written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Rescore every prompt from dated history; needed after changing TRENDING_HALF_LIFE_HOURS.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            if options['rebuild']:
+                moved = trending.rebuild()
+                summary = f'{moved} prompts have a trending score'
+            else:
+                moved = trending.update()
+                summary = f'{moved} prompts gained activity'
+        if moved:
+            # Cached ?ordering=trending pages are out of order now.
+            listing_cache.bump_version()
+        self.stdout.write(self.style.SUCCESS(f'{summary} ({time.perf_counter() - started:.2f}s).'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_copiedpromptfeedback_rating_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prompt',
+            name='is_public',
+            field=models.BooleanField(default=True),
+        ),
+    ]
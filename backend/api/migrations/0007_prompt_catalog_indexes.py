@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_prompt_is_public'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prompt',
+            index=models.Index(condition=models.Q(('is_public', True), ('status', 'approved')), fields=['-copy_count', '-created_at', '-id'], name='prompt_public_catalog_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prompt',
+            index=models.Index(fields=['status', '-copy_count', '-created_at', '-id'], name='prompt_status_catalog_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:19
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_prompt_catalog_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromptChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prompt_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('deleted', 'Deleted'), ('hidden', 'Rejected, private or back in review')], max_length=10)),
+                ('changed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='prompt',
+            index=models.Index(fields=['updated_at'], name='prompt_updated_at_idx'),
+        ),
+    ]
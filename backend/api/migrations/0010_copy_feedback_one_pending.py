@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_prompt_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # save_copied_prompt already deleted older pending rows before adding
+        # a new one, but concurrent copies could leave two; keep the newest.
+        migrations.RunSQL(
+            """
+            DELETE FROM api_copiedpromptfeedback AS old
+            USING api_copiedpromptfeedback AS newer
+            WHERE old.status = 'pending' AND newer.status = 'pending'
+              AND old.user_id = newer.user_id
+              AND (old.created_at, old.id) < (newer.created_at, newer.id)
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='copiedpromptfeedback',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('user',), name='copy_feedback_one_pending_per_user'),
+        ),
+    ]
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import zlib
+from difflib import SequenceMatcher
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+TEXT_FIELDS = ('prompt_description', 'prompt_text', 'guidance')
+SNAPSHOT_FIELDS = ('title', 'task_type', 'output_format', 'category') + TEXT_FIELDS
+KEYFRAME_INTERVAL = 16
+
+# The payload format as of this migration, frozen here rather than imported
+# from api.versioning, so later changes there cannot change what this does.
+
+
+def content_hash(snapshot):
+    raw = json.dumps([snapshot[field] for field in SNAPSHOT_FIELDS], separators=(',', ':'))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def pack(document):
+    return zlib.compress(json.dumps(document, separators=(',', ':')).encode(), 9)
+
+
+def unpack(payload):
+    return json.loads(zlib.decompress(bytes(payload)))
+
+
+def encode_delta(base, texts):
+    delta = {}
+    for field in TEXT_FIELDS:
+        old, new = base[field], texts[field]
+        if old == new:
+            continue
+        if old is None or new is None:
+            delta[field] = ['s', new]
+            continue
+        old_lines = old.splitlines(keepends=True)
+        new_lines = new.splitlines(keepends=True)
+        ops = []
+        for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes():
+            if tag == 'equal':
+                ops.append([i1, i2])
+            elif j2 > j1:
+                ops.append(''.join(new_lines[j1:j2]))
+        delta[field] = ['d', ops] if len(json.dumps(ops)) < len(new) else ['s', new]
+    return delta
+
+
+def apply_delta(base, delta):
+    texts = dict(base)
+    for field, (kind, value) in delta.items():
+        if kind == 'd':
+            old_lines = base[field].splitlines(keepends=True)
+            value = ''.join(op if isinstance(op, str) else ''.join(old_lines[op[0]:op[1]]) for op in value)
+        texts[field] = value
+    return texts
+
+
+def versions_by_prompt(PromptVersion):
+    """Yield (prompt_id, versions oldest first), one prompt at a time."""
+    prompt_ids = (
+        PromptVersion.objects.order_by('prompt_id').values_list('prompt_id', flat=True).distinct()
+    )
+    for prompt_id in prompt_ids.iterator():
+        yield prompt_id, list(PromptVersion.objects.filter(prompt_id=prompt_id).order_by('pk'))
+
+
+def to_deltas(apps, schema_editor):
+    PromptVersion = apps.get_model('api', 'PromptVersion')
+    pending = []
+    for _, versions in versions_by_prompt(PromptVersion):
+        previous = None
+        depth = None
+        for version in versions:
+            snapshot = {
+                field: getattr(version, field)
+                for field in SNAPSHOT_FIELDS
+            }
+            texts = {field: snapshot[field] for field in TEXT_FIELDS}
+            keyframe = previous is None or depth + 1 >= KEYFRAME_INTERVAL
+            depth = 0 if keyframe else depth + 1
+            version.content_hash = content_hash(snapshot)
+            version.is_keyframe = keyframe
+            version.depth = depth
+            version.payload = pack(texts if keyframe else encode_delta(previous, texts))
+            previous = texts
+            pending.append(version)
+        if len(pending) >= BATCH_SIZE:
+            PromptVersion.objects.bulk_update(pending, ['content_hash', 'is_keyframe', 'depth', 'payload'])
+            pending = []
+    PromptVersion.objects.bulk_update(pending, ['content_hash', 'is_keyframe', 'depth', 'payload'])
+
+
+def to_full_copies(apps, schema_editor):
+    PromptVersion = apps.get_model('api', 'PromptVersion')
+    pending = []
+    for _, versions in versions_by_prompt(PromptVersion):
+        texts = None
+        for version in versions:
+            document = unpack(version.payload)
+            texts = document if version.is_keyframe else apply_delta(texts, document)
+            for field in TEXT_FIELDS:
+                setattr(version, field, texts[field])
+            pending.append(version)
+        if len(pending) >= BATCH_SIZE:
+            PromptVersion.objects.bulk_update(pending, TEXT_FIELDS)
+            pending = []
+    PromptVersion.objects.bulk_update(pending, TEXT_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_user_token_version'),
+    ]
+
+    operations = [
+        # Nullable for the duration, so the columns can come back on reverse.
+        migrations.AlterField(
+            model_name='promptversion',
+            name='prompt_text',
+            field=models.TextField(null=True),
+        ),
+        migrations.AddField(
+            model_name='promptversion',
+            name='payload',
+            field=models.BinaryField(default=b''),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='promptversion',
+            name='content_hash',
+            field=models.CharField(default='', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='promptversion',
+            name='is_keyframe',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='promptversion',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(to_deltas, to_full_copies),
+        migrations.RemoveField(
+            model_name='promptversion',
+            name='prompt_description',
+        ),
+        migrations.RemoveField(
+            model_name='promptversion',
+            name='prompt_text',
+        ),
+        migrations.RemoveField(
+            model_name='promptversion',
+            name='guidance',
+        ),
+    ]
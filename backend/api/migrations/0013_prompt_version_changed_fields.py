@@ -0,0 +1,75 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:05
+
+import json
+import zlib
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+TEXT_FIELDS = ('prompt_description', 'prompt_text', 'guidance')
+SNAPSHOT_FIELDS = ('title', 'task_type', 'output_format', 'category') + TEXT_FIELDS
+
+# Payload decoding as of this migration (see 0012), frozen rather than
+# imported from api.versioning.
+
+
+def replay(rows):
+    texts = None
+    rebuilt = {}
+    for row in rows:
+        document = json.loads(zlib.decompress(bytes(row.payload)))
+        if not row.is_keyframe:
+            patched = dict(texts)
+            for field, (kind, value) in document.items():
+                if kind == 'd':
+                    old_lines = texts[field].splitlines(keepends=True)
+                    value = ''.join(op if isinstance(op, str) else ''.join(old_lines[op[0]:op[1]]) for op in value)
+                patched[field] = value
+            document = patched
+        texts = rebuilt[row.pk] = document
+    return rebuilt
+
+
+def changed_fields(previous, snapshot):
+    if previous is None:
+        return list(SNAPSHOT_FIELDS)
+    return [field for field in SNAPSHOT_FIELDS if previous[field] != snapshot[field]]
+
+
+def backfill_changed_fields(apps, schema_editor):
+    PromptVersion = apps.get_model('api', 'PromptVersion')
+    prompt_ids = (
+        PromptVersion.objects.order_by('prompt_id').values_list('prompt_id', flat=True).distinct()
+    )
+    pending = []
+    for prompt_id in prompt_ids.iterator():
+        versions = list(PromptVersion.objects.filter(prompt_id=prompt_id).order_by('pk'))
+        texts = replay(versions)
+        previous = None
+        for version in versions:
+            snapshot = {field: getattr(version, field) for field in SNAPSHOT_FIELDS if field not in TEXT_FIELDS}
+            snapshot.update(texts[version.pk])
+            version.changed_fields = changed_fields(previous, snapshot)
+            previous = snapshot
+            pending.append(version)
+        if len(pending) >= BATCH_SIZE:
+            PromptVersion.objects.bulk_update(pending, ['changed_fields'])
+            pending = []
+    PromptVersion.objects.bulk_update(pending, ['changed_fields'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_prompt_version_deltas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promptversion',
+            name='changed_fields',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=32), blank=True, default=list, size=None),
+        ),
+        migrations.RunPython(backfill_changed_fields, migrations.RunPython.noop),
+    ]
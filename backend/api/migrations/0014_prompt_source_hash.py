@@ -0,0 +1,79 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:13
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+SNAPSHOT_FIELDS = (
+    'title', 'task_type', 'output_format', 'category', 'prompt_description', 'prompt_text', 'guidance',
+)
+
+
+# How import_prompts cleans and hashes a row as of this migration, frozen
+# here: prompts imported before the column existed must hash like a re-import
+# of the same file, or the first re-run duplicates all of them.
+
+def _choice_key(text):
+    return ' '.join(text.lower().replace('_', ' ').replace('&', ' and ').split())
+
+
+def _choice_map(choices):
+    lookup = {}
+    for value, label in choices:
+        for part in label.split('/'):
+            lookup.setdefault(_choice_key(part), value)
+    for value, label in choices:
+        lookup[_choice_key(value)] = value
+        lookup[_choice_key(label)] = value
+    return lookup
+
+
+def _text(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def backfill_source_hash(apps, schema_editor):
+    Prompt = apps.get_model('api', 'Prompt')
+    choices = {
+        field: _choice_map(Prompt._meta.get_field(field).choices)
+        for field in ('task_type', 'output_format')
+    }
+    seen = set()
+    pending = []
+    for prompt in Prompt.objects.order_by('pk').only('pk', *SNAPSHOT_FIELDS).iterator(chunk_size=BATCH_SIZE):
+        snapshot = {field: _text(getattr(prompt, field)) or None for field in SNAPSHOT_FIELDS}
+        for field, lookup in choices.items():
+            if snapshot[field]:
+                snapshot[field] = lookup.get(_choice_key(snapshot[field]), snapshot[field])
+        raw = json.dumps([snapshot[field] for field in SNAPSHOT_FIELDS], separators=(',', ':'))
+        digest = hashlib.sha256(raw.encode()).hexdigest()
+        # Duplicates already in the table: the oldest one keeps the hash.
+        if digest in seen:
+            continue
+        seen.add(digest)
+        prompt.source_hash = digest
+        pending.append(prompt)
+        if len(pending) >= BATCH_SIZE:
+            Prompt.objects.bulk_update(pending, ['source_hash'])
+            pending = []
+    Prompt.objects.bulk_update(pending, ['source_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_prompt_version_changed_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prompt',
+            name='source_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_source_hash, migrations.RunPython.noop),
+    ]
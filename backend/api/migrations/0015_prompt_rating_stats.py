@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_rating_stats(apps, schema_editor):
+    # Frozen copy of api.ratings.rebuild() for a freshly created, empty stats table.
+    stats = apps.get_model('api', 'PromptRatingStats')._meta.db_table
+    prompts = apps.get_model('api', 'Prompt')._meta.db_table
+    feedback = apps.get_model('api', 'CopiedPromptFeedback')._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {stats}
+                (prompt_id, rating_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5, updated_at)
+            SELECT prompt_id, count(*), sum(rating),
+                   count(*) FILTER (WHERE rating = 1), count(*) FILTER (WHERE rating = 2),
+                   count(*) FILTER (WHERE rating = 3), count(*) FILTER (WHERE rating = 4),
+                   count(*) FILTER (WHERE rating = 5), now()
+            FROM {feedback}
+            WHERE status = 'submitted' AND rating BETWEEN 1 AND 5
+            GROUP BY prompt_id
+            """
+        )
+        cursor.execute(
+            f"""
+            UPDATE {prompts} p
+            SET rating_count = s.rating_count, rating_average = s.rating_sum::float / s.rating_count
+            FROM {stats} s WHERE p.id = s.prompt_id
+            """
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_prompt_source_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromptRatingStats',
+            fields=[
+                ('prompt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating_stats', serialize=False, to='api.prompt')),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='prompt',
+            name='rating_average',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='prompt',
+            name='rating_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='prompt',
+            index=models.Index(condition=models.Q(('is_public', True), ('status', 'approved')), fields=['-rating_average', '-rating_count', '-id'], name='prompt_public_rating_idx'),
+        ),
+        migrations.RunPython(backfill_rating_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_trending(apps, schema_editor):
+    # Score dated history and checkpoint today's counters, so all-time
+    # copies are not mistaken for a burst on the first update_trending run.
+    # A frozen copy of api.trending.rebuild() as of this migration: likes
+    # weigh 3 and rating stars 0.5, both measured from 2000-01-01 UTC.
+    prompts = apps.get_model('api', 'Prompt')._meta.db_table
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH events AS (
+                SELECT prompt_id, 3.0::float8 AS weight,
+                       extract(epoch FROM updated_at - timestamptz '2000-01-01 00:00:00+00') / %s AS x
+                FROM {apps.get_model('api', 'Vote')._meta.db_table} WHERE value = 1 AND updated_at <= now()
+                UNION ALL
+                SELECT prompt_id, 0.5 * rating,
+                       extract(epoch FROM created_at - timestamptz '2000-01-01 00:00:00+00') / %s
+                FROM {apps.get_model('api', 'CopiedPromptFeedback')._meta.db_table}
+                WHERE status = 'submitted' AND rating BETWEEN 1 AND 5 AND created_at <= now()
+            ), peaks AS (
+                SELECT prompt_id, max(x) AS peak FROM events GROUP BY prompt_id
+            ), scores AS (
+                SELECT e.prompt_id, k.peak + ln(sum(e.weight * power(2::float8, greatest(e.x - k.peak, -60)))) / ln(2)
+                       AS score
+                FROM events e JOIN peaks k USING (prompt_id)
+                GROUP BY e.prompt_id, k.peak
+            )
+            UPDATE {prompts} p SET trending_score = s.score
+            FROM scores s WHERE p.id = s.prompt_id
+            """,
+            [half_life, half_life],
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {apps.get_model('api', 'TrendingCheckpoint')._meta.db_table}
+                (prompt_id, copy_count, like_count, rating_sum)
+            SELECT p.id, p.copy_count, p.like_count, coalesce(s.rating_sum, 0)
+            FROM {prompts} p
+            LEFT JOIN {apps.get_model('api', 'PromptRatingStats')._meta.db_table} s ON s.prompt_id = p.id
+            """
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_prompt_rating_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingCheckpoint',
+            fields=[
+                ('prompt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending_checkpoint', serialize=False, to='api.prompt')),
+                ('copy_count', models.IntegerField(default=0)),
+                ('like_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='prompt',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='prompt',
+            index=models.Index(condition=models.Q(('is_public', True), ('status', 'approved')), fields=['-trending_score', '-id'], name='prompt_public_trending_idx'),
+        ),
+        migrations.RunPython(seed_trending, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:51
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_prompt_trending_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('copy', 'Copy'), ('vote', 'Vote'), ('bookmark', 'Bookmark'), ('feedback', 'Feedback')], max_length=10)),
+                ('prompt_id', models.BigIntegerField()),
+                ('user_id', models.BigIntegerField(null=True)),
+                ('value', models.SmallIntegerField(default=0)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.BrinIndex(fields=['occurred_at'], name='usage_event_occurred_brin')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PromptDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('copies', models.PositiveIntegerField(default=0)),
+                ('upvotes', models.PositiveIntegerField(default=0)),
+                ('downvotes', models.PositiveIntegerField(default=0)),
+                ('bookmarks', models.PositiveIntegerField(default=0)),
+                ('ratings', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('prompt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='api.prompt')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('prompt', 'day'), name='unique_prompt_daily_stats')],
+            },
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
 from django.conf import settings
-from django.db.models import UniqueConstraint
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.utils import timezone
+from django.db.models import Q, UniqueConstraint
  
 TASK_TYPE_CHOICES = [
     ('create_content', 'Create Content'),
@@ -43,6 +47,14 @@ STATUS_CHOICES = [
     ('rejected', 'Rejected'),
 ]
  
+# Text search configuration for Prompt.search_vector and the queries run against it.
+SEARCH_CONFIG = 'english'
+ 
+class PromptManager(models.Manager):
+    def get_queryset(self):
+        # The tsvector is only ever used inside SQL; don't ship it back per row.
+        return super().get_queryset().defer('search_vector')
+ 
 class Prompt(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -83,10 +95,77 @@ class Prompt(models.Model):
     like_count = models.IntegerField(default=0)
     dislike_count = models.IntegerField(default=0)
     copy_count = models.IntegerField(default=0)
+    # Mirrors of PromptRatingStats, kept on the row for listing and sorting.
+    rating_count = models.IntegerField(default=0)
+    rating_average = models.FloatField(default=0)
+    # Time-decayed activity, in the log form described in api/trending.py.
+    trending_score = models.FloatField(default=0)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Content hash of the imported row (api/importer.py); re-imports skip it.
+    source_hash = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
+    # Maintained by Postgres itself, so bulk_create/update() paths stay in sync.
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('title', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('prompt_description', weight='B', config=SEARCH_CONFIG)
+            + SearchVector('prompt_text', weight='C', config=SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = PromptManager()
+
+    class Meta:
+        # Back the keyset pagination in api/pagination.py: one partial index
+        # for the public catalog and one per-status index for moderation.
+        indexes = [
+            models.Index(
+                fields=['-copy_count', '-created_at', '-id'],
+                condition=Q(is_public=True, status='approved'),
+                name='prompt_public_catalog_idx',
+            ),
+            models.Index(
+                fields=['status', '-copy_count', '-created_at', '-id'],
+                name='prompt_status_catalog_idx',
+            ),
+            # ?ordering=rating over the public catalog (api/pagination.py);
+            # ?ordering=trending has its own index below.
+            models.Index(
+                fields=['-rating_average', '-rating_count', '-id'],
+                condition=Q(is_public=True, status='approved'),
+                name='prompt_public_rating_idx',
+            ),
+            # ?ordering=trending over the public catalog.
+            models.Index(
+                fields=['-trending_score', '-id'],
+                condition=Q(is_public=True, status='approved'),
+                name='prompt_public_trending_idx',
+            ),
+            # Delta sync (/prompts/changes/) scans by modification time.
+            models.Index(fields=['updated_at'], name='prompt_updated_at_idx'),
+            GinIndex(fields=['search_vector'], name='prompt_search_vector_idx'),
+        ]
+
+    # Whether the row was in the public catalog when it was loaded; lets the
+    # change log notice prompts that leave it (see api/signals.py).
+    _loaded_in_catalog = False
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'is_public' in field_names and 'status' in field_names:
+            instance._loaded_in_catalog = instance.in_public_catalog
+        return instance
+
+    @property
+    def in_public_catalog(self):
+        return self.is_public and self.status == 'approved'
+
     def __str__(self):
         return self.title if self.title else f'Prompt {self.id}'
  
@@ -140,14 +219,20 @@ class PromptVersion(models.Model):
     version_created_at = models.DateTimeField(auto_now_add=True)
 
     title = models.CharField(max_length=255)
-    prompt_description = models.TextField(blank=True, null=True)
-    prompt_text = models.TextField()
-    guidance = models.TextField(blank=True, null=True)
-
     task_type = models.CharField(max_length=50, choices=TASK_TYPE_CHOICES)
     output_format = models.CharField(max_length=50, choices=OUTPUT_FORMAT_CHOICES)
     category = models.CharField(max_length=50)
 
+    # prompt_description / prompt_text / guidance live in payload as a
+    # keyframe or a diff against the previous version; see api/versioning.py,
+    # which also sets them back on instances as plain attributes.
+    payload = models.BinaryField()
+    content_hash = models.CharField(max_length=64)
+    is_keyframe = models.BooleanField(default=True)
+    depth = models.PositiveSmallIntegerField(default=0)
+    # Snapshot fields that differ from the previous version (all of them for the first).
+    changed_fields = ArrayField(models.CharField(max_length=32), default=list, blank=True)
+
     class Meta:
         ordering = ['-version_created_at']
  
@@ -170,5 +255,151 @@ class CopiedPromptFeedback(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # Only the most recent copy waits for feedback; /copy/ upserts
+            # against this with ON CONFLICT.
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(status='pending'),
+                name='copy_feedback_one_pending_per_user',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.prompt} - {self.rating} stars"
+
+
+class PromptRatingStats(models.Model):
+    """
+    Submitted feedback ratings per prompt, maintained incrementally by
+    api/ratings.py (rebuild with ``manage.py rebuild_rating_stats``).
+    """
+    prompt = models.OneToOneField(
+        Prompt, on_delete=models.CASCADE, primary_key=True, related_name="rating_stats"
+    )
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    @property
+    def histogram(self):
+        return {star: getattr(self, f'stars_{star}') for star in range(1, 6)}
+
+    def __str__(self):
+        return f"prompt={self.prompt_id} {self.rating_count} ratings"
+
+
+class TrendingCheckpoint(models.Model):
+    """
+    Counters as of the last ``manage.py update_trending`` run; growth past
+    them is scored as new activity (see api/trending.py).
+    """
+    prompt = models.OneToOneField(
+        Prompt, on_delete=models.CASCADE, primary_key=True, related_name="trending_checkpoint"
+    )
+    copy_count = models.IntegerField(default=0)
+    like_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"prompt={self.prompt_id} copies={self.copy_count} likes={self.like_count}"
+
+ 
+class PromptChange(models.Model):
+    """
+    Tombstone log for the delta-sync endpoint. Upserts are found through
+    Prompt.updated_at; this table only records prompts that left the public
+    catalog, since those rows are gone or no longer match the catalog filter.
+    """
+    ACTION_DELETED = 'deleted'
+    ACTION_HIDDEN = 'hidden'
+    ACTION_CHOICES = [
+        (ACTION_DELETED, 'Deleted'),
+        (ACTION_HIDDEN, 'Rejected, private or back in review'),
+    ]
+
+    # Plain id rather than a ForeignKey: the prompt may no longer exist.
+    prompt_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"prompt={self.prompt_id} {self.action} @ {self.changed_at:%Y-%m-%d %H:%M:%S}"
+ 
+
+class UserTokenVersion(models.Model):
+    """
+    Per-user counter stamped into issued JWTs (see api/authentication.py).
+    Bumped whenever the User row changes, so tokens carrying older claims
+    stop being trusted on their own.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="token_version"
+    )
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"user={self.user_id} v{self.version}"
+
+
+class UsageEvent(models.Model):
+    """
+    Append-only log of what happened to prompts, written in batches by
+    api/usage.py and rolled up into PromptDailyStats.
+    """
+    KIND_COPY = 'copy'
+    KIND_VOTE = 'vote'
+    KIND_BOOKMARK = 'bookmark'
+    KIND_FEEDBACK = 'feedback'
+    KIND_CHOICES = [
+        (KIND_COPY, 'Copy'),
+        (KIND_VOTE, 'Vote'),
+        (KIND_BOOKMARK, 'Bookmark'),
+        (KIND_FEEDBACK, 'Feedback'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Plain ids rather than ForeignKeys: no lookups on the hot insert path,
+    # and the log keeps its history when prompts or users go away.
+    prompt_id = models.BigIntegerField()
+    user_id = models.BigIntegerField(null=True)
+    # Vote: the new value (0 when withdrawn). Bookmark: 1 added, 0 removed.
+    # Feedback: the star rating, 0 when skipped.
+    value = models.SmallIntegerField(default=0)
+    occurred_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # Rows arrive in time order, so a tiny BRIN index serves the rollup
+        # and pruning range scans.
+        indexes = [BrinIndex(fields=['occurred_at'], name='usage_event_occurred_brin')]
+
+    def __str__(self):
+        return f"prompt={self.prompt_id} {self.kind}={self.value} @ {self.occurred_at:%Y-%m-%d %H:%M:%S}"
+
+
+class PromptDailyStats(models.Model):
+    """Per-prompt, per-day totals of UsageEvent (``manage.py rollup_usage``)."""
+    prompt = models.ForeignKey(Prompt, on_delete=models.CASCADE, related_name="daily_stats")
+    day = models.DateField()
+    copies = models.PositiveIntegerField(default=0)
+    upvotes = models.PositiveIntegerField(default=0)
+    downvotes = models.PositiveIntegerField(default=0)
+    bookmarks = models.PositiveIntegerField(default=0)
+    ratings = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index behind /prompts/<id>/stats/ range reads.
+            UniqueConstraint(fields=["prompt", "day"], name="unique_prompt_daily_stats"),
+        ]
+
+    def __str__(self):
+        return f"prompt={self.prompt_id} {self.day}"
@@ -0,0 +1,115 @@
+"""
+Bulk approve / reject for the moderation dashboard.
+
+One conditional UPDATE moves every listed prompt that is not already in the
+target status, and reports which rows it moved and what they were before.
+queryset-style updates skip the model signals, so the side effects that
+api/signals.py would run per save happen here once per batch instead: cache
+version bumps, the delta-sync tombstones and the typeahead index.
+
+An approved prompt that gets rejected is snapshotted first, as an edit would
+(PromptViewSet.perform_update), so its approved content stays in history.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import facets, listing_cache, typeahead, versioning
+from .models import Prompt, PromptChange, PromptVersion
+
+ACTIONS = {'approve': 'approved', 'reject': 'rejected'}
+MAX_BATCH = 500
+
+
+def _update_status(ids, new_status):
+    """(id, old status, is_public) for each row the UPDATE actually changed."""
+    table = Prompt._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH old AS (
+                SELECT id, status FROM {table}
+                WHERE id = ANY(%s) AND status <> %s
+                FOR UPDATE
+            )
+            UPDATE {table} AS p SET status = %s, updated_at = %s
+            FROM old WHERE p.id = old.id
+            RETURNING p.id, old.status, p.is_public
+            """,
+            [list(ids), new_status, new_status, timezone.now()],
+        )
+        return cursor.fetchall()
+
+
+def _snapshot(prompt_ids, moderator):
+    """Record the current content of ``prompt_ids`` as versions, in one INSERT."""
+    if not prompt_ids:
+        return []
+    prompts = Prompt.objects.filter(pk__in=prompt_ids).only('pk', *versioning.SNAPSHOT_FIELDS)
+    latest = {
+        version.prompt_id: version
+        for version in PromptVersion.objects.filter(prompt_id__in=prompt_ids)
+        .order_by('prompt_id', '-pk').distinct('prompt_id').defer('payload')
+    }
+    versioning.load_texts(list(latest.values()))
+    versions = []
+    for prompt in prompts:
+        previous = latest.get(prompt.pk)
+        previous_texts = None
+        if previous is not None:
+            previous_texts = {field: getattr(previous, field) for field in versioning.TEXT_FIELDS}
+        version = versioning.build_version(
+            prompt.pk, versioning.snapshot_of(prompt), previous, previous_texts, edited_by=moderator,
+        )
+        if version is not None:
+            versions.append(version)
+    return PromptVersion.objects.bulk_create(versions)
+
+
+def _sync_typeahead(entered, left):
+    index = typeahead.loaded_index()
+    if index is None:
+        return
+    for pk in left:
+        index.remove_prompt(pk)
+    rows = Prompt.objects.filter(pk__in=entered).values_list('pk', 'title', 'category', 'task_type', 'copy_count')
+    for row in rows:
+        index.upsert_prompt(*row)
+
+
+def moderate(ids, action, moderator=None):
+    """
+    Apply ``action`` ('approve' or 'reject') to the prompts in ``ids``.
+    Returns {status, updated, unchanged, not_found}, each a sorted id list.
+    """
+    new_status = ACTIONS[action]
+    ids = sorted(set(ids))
+    with transaction.atomic():
+        changed = _update_status(ids, new_status)
+        updated = sorted(pk for pk, _, _ in changed)
+        rest = set(ids) - set(updated)
+        existing = set(Prompt.objects.filter(pk__in=rest).values_list('pk', flat=True)) if rest else set()
+
+        if new_status != 'approved':
+            _snapshot([pk for pk, old_status, _ in changed if old_status == 'approved'], moderator)
+
+        # Public prompts crossing the approved line enter or leave the catalog.
+        entered = [pk for pk, old_status, public in changed if public and new_status == 'approved']
+        left = [pk for pk, old_status, public in changed if public and old_status == 'approved']
+        if left:
+            PromptChange.objects.bulk_create(
+                PromptChange(prompt_id=pk, action=PromptChange.ACTION_HIDDEN) for pk in left
+            )
+        if entered or left:
+            listing_cache.bump_version()
+            transaction.on_commit(listing_cache.bump_version)
+            transaction.on_commit(lambda: _sync_typeahead(entered, left))
+        if changed:
+            facets.bump_version()
+            transaction.on_commit(facets.bump_version)
+
+    return {
+        'status': new_status,
+        'updated': updated,
+        'unchanged': sorted(existing),
+        'not_found': sorted(rest - existing),
+    }
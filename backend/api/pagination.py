@@ -0,0 +1,164 @@
+import base64
+import json
+
+from django.db import models
+from django.db.models import F, Func, Value
+from django.db.models.lookups import LessThan
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+# The catalog sort order. The trailing id makes the tuple unique, so a
+# cursor always names exactly one position in the list.
+CATALOG_ORDERING = ('-copy_count', '-created_at', '-id')
+# ?ordering=rating: best average first, the more-rated of equal averages first.
+RATING_ORDERING = ('-rating_average', '-rating_count', '-id')
+# ?ordering=trending: see api/trending.py.
+TRENDING_ORDERING = ('-trending_score', '-id')
+ORDERINGS = {'popular': CATALOG_ORDERING, 'rating': RATING_ORDERING, 'trending': TRENDING_ORDERING}
+ORDERING_PARAM = 'ordering'
+
+# How each sort column travels in a cursor: (to JSON, from JSON).
+CURSOR_FIELDS = {
+    'copy_count': (int, int),
+    'created_at': (lambda value: value.isoformat(), parse_datetime),
+    'id': (int, int),
+    'rating_average': (float, float),
+    'rating_count': (int, int),
+    'trending_score': (float, float),
+}
+
+
+def catalog_ordering(params):
+    """The ordering tuple selected by ``?ordering=`` (popular by default)."""
+    name = params.get(ORDERING_PARAM) or 'popular'
+    if name not in ORDERINGS:
+        raise ValidationError({'error': f"Unknown ordering {name!r}; use one of {', '.join(ORDERINGS)}."})
+    return ORDERINGS[name]
+
+
+class Row(Func):
+    # Renders "(a, b, c)" so Postgres compares the whole tuple at once and can
+    # seek straight into the matching catalog index.
+    template = '(%(expressions)s)'
+    output_field = models.Field()
+
+
+def _columns(ordering):
+    return [name.lstrip('-') for name in ordering]
+
+
+def encode_cursor(prompt, ordering=CATALOG_ORDERING):
+    payload = [CURSOR_FIELDS[name][0](getattr(prompt, name)) for name in _columns(ordering)]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, ordering=CATALOG_ORDERING):
+    columns = _columns(ordering)
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise ValueError(token)
+        values = [CURSOR_FIELDS[name][1](value) for name, value in zip(columns, payload)]
+        if any(value is None for value in values):
+            raise ValueError(token)
+        return values
+    except (ValueError, TypeError):
+        raise ValidationError({'error': 'Invalid cursor.'})
+
+
+class PromptPagination(BasePagination):
+    """
+    Pagination for PromptViewSet.
+
+    * ``?cursor=`` (empty for the first page) selects keyset pagination over
+      the ``?ordering=`` (CATALOG_ORDERING by default) and returns
+      ``{next, results}``.
+    * ``?limit=&offset=`` is the original contract and still returns a bare
+      list, as does a request with neither.
+
+    Slicing happens here rather than in get_queryset so that filter backends
+    (search, category, ...) always run on the unsliced queryset.
+    """
+    default_limit = 60
+    max_limit = 500
+
+    def is_active(self, request):
+        return 'cursor' in request.query_params
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.is_active(request)
+        if not self.cursor_mode:
+            return self.paginate_legacy(queryset, request)
+
+        ordering = catalog_ordering(request.query_params)
+        token = request.query_params.get('cursor')
+        if token:
+            # Every sort key is descending, so "after the cursor" is "less than it".
+            values = decode_cursor(token, ordering)
+            queryset = queryset.filter(LessThan(
+                Row(*(F(name) for name in _columns(ordering))),
+                Row(*(Value(value) for value in values)),
+            ))
+
+        limit = self.get_limit(request)
+        page = list(queryset.order_by(*ordering)[:limit + 1])
+        self.next_cursor = encode_cursor(page[limit - 1], ordering) if len(page) > limit else None
+        return page[:limit]
+
+    def paginate_legacy(self, queryset, request):
+        params = request.query_params
+        try:
+            offset = max(int(params.get('offset') or 0), 0)
+        except ValueError:
+            offset = 0
+        try:
+            limit = int(params['limit'])
+        except (KeyError, ValueError):
+            return None
+        if limit < 0:
+            return None
+        return list(queryset[offset:offset + limit])
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return Response(data)
+        return Response({'next': self.next_cursor, 'results': data})
+
+
+class HistoryPagination(BasePagination):
+    """
+    Keyset pagination for a prompt's version history, newest first.
+    ``?cursor=`` is the id of the last version on the previous page.
+    """
+    default_limit = 20
+    max_limit = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        try:
+            limit = int(params.get('limit', self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = max(1, min(limit, self.max_limit))
+        if params.get('cursor'):
+            try:
+                queryset = queryset.filter(pk__lt=int(params['cursor']))
+            except ValueError:
+                raise ValidationError({'error': 'Invalid cursor.'})
+        page = list(queryset.order_by('-pk')[:limit + 1])
+        self.next_cursor = str(page[limit - 1].pk) if len(page) > limit else None
+        return page[:limit]
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.next_cursor, 'results': data})
@@ -0,0 +1,106 @@
+"""
+Materialized star-rating statistics.
+
+PromptRatingStats keeps, per prompt, the count, sum and 1-5 histogram of
+submitted CopiedPromptFeedback ratings. Prompt.rating_count and
+Prompt.rating_average mirror the first two so listings can render and sort
+by them straight off the row (and its catalog index).
+
+submit_copy_feedback calls record_rating in the transaction that submits the
+feedback; both tables move in one statement, by the delta of that one rating,
+so concurrent raters never overwrite each other. ``manage.py
+rebuild_rating_stats`` recomputes everything from the feedback table, for
+paths that bypass it (users deleted, feedback edited in the admin, ...).
+"""
+from django.db import connection
+from django.utils import timezone
+
+from .models import CopiedPromptFeedback, Prompt, PromptRatingStats
+
+STARS = range(1, 6)
+HISTOGRAM_COLUMNS = tuple(f'stars_{star}' for star in STARS)
+
+
+def is_rating(value):
+    return isinstance(value, int) and value in STARS
+
+
+def record_rating(prompt_id, rating):
+    """Add one ``rating`` (1-5) for ``prompt_id`` to its stats and Prompt columns."""
+    stats = PromptRatingStats._meta.db_table
+    columns = ', '.join(HISTOGRAM_COLUMNS)
+    bumps = ', '.join(f'{column} = s.{column} + EXCLUDED.{column}' for column in HISTOGRAM_COLUMNS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH stats AS (
+                INSERT INTO {stats} AS s (prompt_id, rating_count, rating_sum, {columns}, updated_at)
+                VALUES (%s, 1, %s, {', '.join(['%s'] * len(HISTOGRAM_COLUMNS))}, %s)
+                ON CONFLICT (prompt_id) DO UPDATE SET
+                    rating_count = s.rating_count + 1,
+                    rating_sum = s.rating_sum + EXCLUDED.rating_sum,
+                    {bumps},
+                    updated_at = EXCLUDED.updated_at
+                RETURNING prompt_id, rating_count, rating_sum
+            )
+            UPDATE {Prompt._meta.db_table} p
+            SET rating_count = stats.rating_count,
+                rating_average = stats.rating_sum::float / stats.rating_count
+            FROM stats WHERE p.id = stats.prompt_id
+            """,
+            [prompt_id, rating, *(int(star == rating) for star in STARS), timezone.now()],
+        )
+
+
+def rebuild():
+    """
+    Recompute every prompt's stats from the feedback table with set-based
+    SQL. Returns the number of prompts that have ratings.
+    """
+    stats = PromptRatingStats._meta.db_table
+    prompts = Prompt._meta.db_table
+    columns = ', '.join(HISTOGRAM_COLUMNS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {stats} (prompt_id, rating_count, rating_sum, {columns}, updated_at)
+            SELECT prompt_id, count(*), sum(rating),
+                   {', '.join(f'count(*) FILTER (WHERE rating = {star})' for star in STARS)}, %s
+            FROM {CopiedPromptFeedback._meta.db_table}
+            WHERE status = 'submitted' AND rating BETWEEN 1 AND 5
+            GROUP BY prompt_id
+            ON CONFLICT (prompt_id) DO UPDATE SET
+                rating_count = EXCLUDED.rating_count,
+                rating_sum = EXCLUDED.rating_sum,
+                {', '.join(f'{column} = EXCLUDED.{column}' for column in HISTOGRAM_COLUMNS)},
+                updated_at = EXCLUDED.updated_at
+            """,
+            [timezone.now()],
+        )
+        rated = cursor.rowcount
+        cursor.execute(
+            f"""
+            DELETE FROM {stats} s WHERE NOT EXISTS (
+                SELECT 1 FROM {CopiedPromptFeedback._meta.db_table} f
+                WHERE f.prompt_id = s.prompt_id AND f.status = 'submitted' AND f.rating BETWEEN 1 AND 5
+            )
+            """
+        )
+        # Only touch rows whose numbers actually change.
+        cursor.execute(
+            f"""
+            UPDATE {prompts} p
+            SET rating_count = s.rating_count, rating_average = s.rating_sum::float / s.rating_count
+            FROM {stats} s
+            WHERE p.id = s.prompt_id AND (
+                p.rating_count <> s.rating_count OR p.rating_average <> s.rating_sum::float / s.rating_count
+            )
+            """
+        )
+        cursor.execute(
+            f"""
+            UPDATE {prompts} p SET rating_count = 0, rating_average = 0
+            WHERE p.rating_count <> 0 AND NOT EXISTS (SELECT 1 FROM {stats} s WHERE s.prompt_id = p.id)
+            """
+        )
+    return rated
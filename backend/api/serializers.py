@@ -1,5 +1,4 @@
 from rest_framework import serializers
-from django.db.models import Sum
 from .models import (Prompt, PromptVersion, TASK_TYPE_CHOICES,
     OUTPUT_FORMAT_CHOICES,)
 from django.contrib.auth.models import User
@@ -7,9 +6,10 @@ from django.contrib.auth.models import User
  
 class PromptSerializer(serializers.ModelSerializer):
     user_username = serializers.ReadOnlyField(source='user.username')
-    vote_count = serializers.SerializerMethodField()
-    like_count = serializers.SerializerMethodField()
-    dislike_count = serializers.SerializerMethodField()
+    # like_count / dislike_count / vote are denormalized on Prompt and kept
+    # in sync by the vote endpoints, so they are read straight off the row;
+    # likewise rating_count / rating_average (api/ratings.py).
+    vote_count = serializers.IntegerField(source='vote', read_only=True)
     user_vote = serializers.SerializerMethodField()
     is_bookmarked = serializers.SerializerMethodField()
    
@@ -33,6 +33,8 @@ class PromptSerializer(serializers.ModelSerializer):
             'like_count',  
             'dislike_count',
             'copy_count',  
+            'rating_count',
+            'rating_average',
             'user_vote',
             'is_bookmarked',
             'created_at',
@@ -51,32 +53,49 @@ class PromptSerializer(serializers.ModelSerializer):
             'like_count',    
             'dislike_count',
             'copy_count',
+            'rating_count',
+            'rating_average',
         ]
    
-    def get_vote_count(self, obj):
-        agg = obj.votes.aggregate(total=Sum('value'))
-        return agg['total'] or 0
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Only present for ?search_mode=fulltext&headline=1 (api/filters.py).
+        if hasattr(instance, 'search_headline'):
+            data['search_headline'] = instance.search_headline
+        return data
  
+    # user_vote / is_bookmarked are annotated by PromptViewSet.get_queryset
+    # (see annotate_for_user); the per-row queries below are only the
+    # fallback for instances loaded outside that queryset.
     def get_user_vote(self, obj):
+        if hasattr(obj, 'user_vote'):
+            return obj.user_vote or 0
         request = self.context.get('request', None)
         if not request or not request.user or not request.user.is_authenticated:
             return 0
         v = obj.votes.filter(user=request.user).first()
         return v.value if v else 0
    
-    def get_like_count(self, obj):
-        return obj.votes.filter(value=1).count()
- 
-    def get_dislike_count(self, obj):
-        return obj.votes.filter(value=-1).count()
-   
     def get_is_bookmarked(self, obj):
+        if hasattr(obj, 'is_bookmarked'):
+            return bool(obj.is_bookmarked)
         request = self.context.get('request', None)
         if not request or not request.user or not request.user.is_authenticated:
             return False
         return obj.bookmarks.filter(user=request.user).exists()
-    def get_like_count(self, obj):
-        return obj.votes.filter(value=1).count()
+ 
+ 
+class CatalogPromptSerializer(PromptSerializer):
+    # The shared, user-agnostic view of a prompt (no user_vote/is_bookmarked)
+    # used for payloads that are cached or served to every caller alike.
+    user_vote = None
+    is_bookmarked = None
+ 
+    class Meta(PromptSerializer.Meta):
+        fields = [
+            f for f in PromptSerializer.Meta.fields
+            if f not in ('user_vote', 'is_bookmarked')
+        ]
  
  
 class UserSerializer(serializers.ModelSerializer):
@@ -99,10 +118,47 @@ class UserSerializer(serializers.ModelSerializer):
         return user
  
  
+TASK_TYPE_LABELS = dict(TASK_TYPE_CHOICES)
+OUTPUT_FORMAT_LABELS = dict(OUTPUT_FORMAT_CHOICES)
+ 
+ 
+class PromptVersionSummarySerializer(serializers.ModelSerializer):
+    """History list entry: metadata only, no texts (see PromptViewSet.history)."""
+    edited_by_username = serializers.ReadOnlyField(source='edited_by.username')
+    task_type_label = serializers.SerializerMethodField()
+    output_format_label = serializers.SerializerMethodField()
+ 
+    class Meta:
+        model = PromptVersion
+        fields = [
+            "id",
+            "prompt",
+            "title",
+            "task_type",
+            "output_format",
+            "category",
+            "edited_by_username",
+            "version_created_at",
+            "task_type_label",
+            "output_format_label",
+            "changed_fields",
+        ]
+ 
+    def get_task_type_label(self, obj):
+        return TASK_TYPE_LABELS.get(obj.task_type, obj.task_type)
+ 
+    def get_output_format_label(self, obj):
+        return OUTPUT_FORMAT_LABELS.get(obj.output_format, obj.output_format)
+ 
+ 
 class PromptVersionSerializer(serializers.ModelSerializer):
     edited_by_username = serializers.ReadOnlyField(source='edited_by.username')
     task_type_label = serializers.SerializerMethodField()
     output_format_label = serializers.SerializerMethodField()
+    # Not columns: api.versioning.load_texts rebuilds them from the payload.
+    prompt_description = serializers.CharField(read_only=True, allow_null=True)
+    prompt_text = serializers.CharField(read_only=True)
+    guidance = serializers.CharField(read_only=True, allow_null=True)
  
     class Meta:
         model = PromptVersion
@@ -123,9 +179,9 @@ class PromptVersionSerializer(serializers.ModelSerializer):
         ]
  
     def get_task_type_label(self, obj):
-        return dict(TASK_TYPE_CHOICES).get(obj.task_type, obj.task_type)
+        return TASK_TYPE_LABELS.get(obj.task_type, obj.task_type)
  
     def get_output_format_label(self, obj):
-        return dict(OUTPUT_FORMAT_CHOICES).get(obj.output_format, obj.output_format)
+        return OUTPUT_FORMAT_LABELS.get(obj.output_format, obj.output_format)
  
  
\ No newline at end of file
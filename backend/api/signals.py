@@ -0,0 +1,82 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import facets, listing_cache, typeahead
+from .authentication import bump_token_version, forget_token_version
+from .models import Prompt, PromptChange
+
+
+def _bump_listing_cache(instance):
+    if instance._loaded_in_catalog or instance.in_public_catalog:
+        # Now, so this transaction does not read its own stale pages, and
+        # again at commit, so nobody caches the pre-commit rows under the
+        # new version in between.
+        listing_cache.bump_version()
+        transaction.on_commit(listing_cache.bump_version)
+
+
+def _bump_facets():
+    # Every scope (public, staff, per user) can see the change, so all go.
+    facets.bump_version()
+    transaction.on_commit(facets.bump_version)
+
+
+# Registered first: it needs _loaded_in_catalog before the handler below resets it.
+@receiver(post_save, sender=Prompt)
+def invalidate_listing_cache(sender, instance, **kwargs):
+    _bump_listing_cache(instance)
+    _bump_facets()
+
+
+@receiver(post_delete, sender=Prompt)
+def invalidate_listing_cache_on_delete(sender, instance, **kwargs):
+    _bump_listing_cache(instance)
+    _bump_facets()
+
+
+@receiver(post_save, sender=Prompt)
+def log_prompt_left_catalog(sender, instance, created, **kwargs):
+    if not created and instance._loaded_in_catalog and not instance.in_public_catalog:
+        PromptChange.objects.create(prompt_id=instance.pk, action=PromptChange.ACTION_HIDDEN)
+    instance._loaded_in_catalog = instance.in_public_catalog
+
+
+@receiver(post_delete, sender=Prompt)
+def log_prompt_deleted(sender, instance, **kwargs):
+    if instance._loaded_in_catalog:
+        PromptChange.objects.create(prompt_id=instance.pk, action=PromptChange.ACTION_DELETED)
+
+
+@receiver(post_save, sender=Prompt)
+def update_typeahead(sender, instance, **kwargs):
+    if typeahead.loaded_index() is not None:
+        pk = instance.pk
+        transaction.on_commit(lambda: typeahead.sync_prompts([pk]))
+
+
+@receiver(post_delete, sender=Prompt)
+def remove_from_typeahead(sender, instance, **kwargs):
+    index = typeahead.loaded_index()
+    if index is not None:
+        pk = instance.pk
+        transaction.on_commit(lambda: index.remove_prompt(pk))
+
+
+@receiver(post_save, sender=User)
+def revoke_user_claims(sender, instance, created, **kwargs):
+    # Tokens carry is_staff and friends as claims; make them stale.
+    if not created:
+        bump_token_version(instance.pk)
+        pk = instance.pk
+        transaction.on_commit(lambda: forget_token_version(pk))
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user(sender, instance, **kwargs):
+    # Their token version row went with them; drop the cached one so the
+    # next request re-reads it and finds no user.
+    pk = instance.pk
+    forget_token_version(pk)
+    transaction.on_commit(lambda: forget_token_version(pk))
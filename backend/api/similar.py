@@ -0,0 +1,348 @@
+"""
+"More like this" for /prompts/<id>/similar/: cosine similarity between
+TF-IDF vectors of the title, description and text of the public, approved
+catalog.
+
+The index is a handful of NumPy arrays saved as .npy files under
+SIMILAR_INDEX_DIR, one directory per build plus a manifest naming the
+current one, swapped in the way the catalog snapshot is (api/snapshot.py).
+Workers open them with mmap_mode='r', so every process on a host shares one
+copy through the page cache, and switch to a newer build within
+SIMILAR_INDEX_RELOAD_SECONDS.
+
+Rows are scaled to unit length, so dot products are cosines. Next to the row
+matrix the index keeps its transpose, the postings of every term; a query
+multiplies its sparse vector(s) by that and only touches the postings of its
+own terms, so its cost follows how common those terms are rather than the
+size of the catalog.
+
+``manage.py build_similar_index`` builds from scratch; with --incremental it
+only re-vectorizes prompts edited (or newly approved) since the previous
+build, against that build's vocabulary and IDF weights, and drops prompts
+that left the catalog. Words are only learned by a full build: schedule one
+nightly and the incremental one every few minutes.
+"""
+import fcntl
+import json
+import re
+import shutil
+import threading
+import time
+from array import array
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from scipy import sparse
+
+from .changes import SYNC_OVERLAP
+from .models import Prompt
+from .snapshot import _write_atomic
+
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = '.build.lock'
+# Older builds are kept around briefly for workers that still map them.
+KEEP_VERSIONS = 2
+BUILD_CHUNK_SIZE = 2000
+
+TOKEN_RE = re.compile(r'[^\W\d_]{2,}')
+STOP_WORDS = frozenset(
+    'about above after again all also am an and any are as at be because been before being below '
+    'between both but by can could did do does doing down during each few for from further had has '
+    'have having he her here hers him his how if in into is it its itself just me more most my no '
+    'nor not now of off on once only or other our ours out over own same she should so some such '
+    'than that the their theirs them then there these they this those through to too under until '
+    'up very was we were what when where which while who whom why will with would you your yours'.split()
+)
+# A word in the title says more about a prompt than one deep in its text.
+FIELD_WEIGHTS = (3, 2, 1)
+# Words in fewer prompts than this cannot make two prompts similar.
+MIN_DF = 2
+# Words in more than this share of a large catalog say little and would make
+# every query walk most of it.
+MAX_DF_RATIO = 0.5
+MAX_DF_MIN_PROMPTS = 1000
+
+
+def index_dir():
+    return Path(settings.SIMILAR_INDEX_DIR)
+
+
+def tokenize(text):
+    return [term for term in TOKEN_RE.findall(text.casefold()) if term not in STOP_WORDS]
+
+
+def term_counts(title, description, text):
+    counts = Counter()
+    for value, weight in zip((title, description, text), FIELD_WEIGHTS):
+        for term in tokenize(value or ''):
+            counts[term] += weight
+    return counts
+
+
+def _catalog():
+    return Prompt.objects.filter(is_public=True, status='approved')
+
+
+def _documents(prompts):
+    rows = prompts.order_by('pk').values_list('pk', 'title', 'prompt_description', 'prompt_text')
+    for pk, *fields in rows.iterator(chunk_size=BUILD_CHUNK_SIZE):
+        yield pk, term_counts(*fields)
+
+
+def _weigh(counts, idf):
+    """Sublinear TF times IDF, every row scaled to unit length."""
+    matrix = counts.tocsr()
+    matrix.sum_duplicates()
+    matrix.data = ((1 + np.log(matrix.data)) * idf[matrix.indices]).astype(np.float32)
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    norms = np.sqrt(np.bincount(rows, weights=matrix.data ** 2, minlength=matrix.shape[0]))
+    matrix.data /= norms[rows].astype(np.float32)
+    return matrix
+
+
+def _fit(documents):
+    """(ids, terms, idf, matrix) for ``documents``, learning the vocabulary."""
+    vocabulary = {}
+    ids, indptr, columns, counts = array('q'), array('q', [0]), array('q'), array('f')
+    for pk, terms in documents:
+        ids.append(pk)
+        for term, count in terms.items():
+            columns.append(vocabulary.setdefault(term, len(vocabulary)))
+            counts.append(count)
+        indptr.append(len(columns))
+
+    n = len(ids)
+    columns = np.frombuffer(columns, dtype=np.int64)
+    df = np.bincount(columns, minlength=len(vocabulary))
+    keep = df >= MIN_DF
+    if n >= MAX_DF_MIN_PROMPTS:
+        keep &= df <= MAX_DF_RATIO * n
+    kept = keep[columns]
+    rows = np.repeat(np.arange(n), np.diff(np.frombuffer(indptr, dtype=np.int64)))
+    counts = sparse.coo_matrix(
+        (np.frombuffer(counts, dtype=np.float32)[kept], (rows[kept], (np.cumsum(keep) - 1)[columns[kept]])),
+        shape=(n, int(keep.sum())),
+    )
+    terms = [term for term, column in vocabulary.items() if keep[column]]
+    idf = (np.log((1 + n) / (1 + df[keep])) + 1).astype(np.float32)
+    return np.frombuffer(ids, dtype=np.int64), terms, idf, _weigh(counts, idf)
+
+
+def _transform(documents, vocabulary, idf):
+    """(ids, matrix) for ``documents`` against a fixed vocabulary."""
+    ids, indptr, columns, counts = array('q'), array('q', [0]), array('q'), array('f')
+    for pk, terms in documents:
+        ids.append(pk)
+        for term, count in terms.items():
+            column = vocabulary.get(term)
+            if column is not None:
+                columns.append(column)
+                counts.append(count)
+        indptr.append(len(columns))
+    counts = sparse.csr_matrix(
+        (np.frombuffer(counts, dtype=np.float32), np.frombuffer(columns, dtype=np.int64),
+         np.frombuffer(indptr, dtype=np.int64)),
+        shape=(len(ids), len(idf)),
+    )
+    return np.frombuffer(ids, dtype=np.int64), _weigh(counts, idf)
+
+
+class SimilarIndex:
+    def __init__(self, path, manifest):
+        def load(name):
+            return np.load(path / f'{name}.npy', mmap_mode='r')
+
+        self.path = path
+        self.version = manifest['version']
+        self.ids = load('ids')
+        self.idf = load('idf')
+        shape = (len(self.ids), len(self.idf))
+        # Both index arrays are saved with one dtype, so scipy wraps the
+        # mappings as they are instead of copying them.
+        self.matrix = sparse.csr_matrix((load('data'), load('indices'), load('indptr')), shape=shape)
+        self.postings = sparse.csr_matrix((load('t_data'), load('t_indices'), load('t_indptr')), shape=shape[::-1])
+        self._vocabulary = None
+
+    @property
+    def vocabulary(self):
+        # Only prompts missing from the index need it, and it is the one part
+        # that has to be parsed rather than mapped.
+        if self._vocabulary is None:
+            terms = json.loads((self.path / 'terms.json').read_text(encoding='utf-8'))
+            self._vocabulary = {term: column for column, term in enumerate(terms)}
+        return self._vocabulary
+
+    def row(self, prompt_id):
+        row = int(np.searchsorted(self.ids, prompt_id))
+        return row if row < len(self.ids) and self.ids[row] == prompt_id else None
+
+    def search(self, queries, k, exclude):
+        """
+        The ``k`` (prompt id, cosine) pairs closest to each row of the sparse
+        ``queries`` matrix, best first. ``exclude[i]`` is the index row to
+        leave out of the results for query i (its own), or -1.
+        """
+        products = (queries @ self.postings).tocsr()
+        results = []
+        for i, skip in enumerate(exclude):
+            start, end = products.indptr[i], products.indptr[i + 1]
+            rows, scores = products.indices[start:end], products.data[start:end]
+            wanted = (rows != skip) & (scores > 0)
+            rows, scores = rows[wanted], scores[wanted]
+            if len(scores) > k:
+                best = np.argpartition(scores, -k)[-k:]
+                rows, scores = rows[best], scores[best]
+            # Ties go to the older prompt, so results are stable.
+            order = np.lexsort((rows, -scores))
+            results.append([(int(self.ids[row]), float(score)) for row, score in zip(rows[order], scores[order])])
+        return results
+
+    def similar(self, prompt, k):
+        """The ``k`` (prompt id, cosine) pairs most like ``prompt``, best first."""
+        row = self.row(prompt.pk)
+        if row is None:
+            # Not in the catalog (yet): vectorize it on the spot.
+            counts = term_counts(prompt.title, prompt.prompt_description, prompt.prompt_text)
+            _, queries = _transform([(prompt.pk, counts)], self.vocabulary, self.idf)
+            row = -1
+        else:
+            queries = self.matrix[[row]]
+        return self.search(queries, k, [row])[0]
+
+    def terms(self):
+        return list(self.vocabulary)
+
+
+def read_manifest(directory=None):
+    try:
+        with open((directory or index_dir()) / MANIFEST_NAME, 'rb') as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _save(path, ids, terms, idf, matrix):
+    path.mkdir()
+    postings = matrix.T.tocsr()
+    index_dtype = np.int32 if max(matrix.nnz, *matrix.shape) < 2 ** 31 else np.int64
+    arrays = {'ids': ids, 'idf': idf}
+    for prefix, m in (('', matrix), ('t_', postings)):
+        m.sort_indices()
+        arrays[f'{prefix}data'] = m.data.astype(np.float32)
+        arrays[f'{prefix}indices'] = m.indices.astype(index_dtype)
+        arrays[f'{prefix}indptr'] = m.indptr.astype(index_dtype)
+    for name, values in arrays.items():
+        np.save(path / f'{name}.npy', np.ascontiguousarray(values))
+    (path / 'terms.json').write_text(json.dumps(terms, ensure_ascii=False), encoding='utf-8')
+
+
+def _update(index, since):
+    """(ids, matrix) for ``index`` brought up to date, or None if nothing changed."""
+    live = np.fromiter(_catalog().order_by('pk').values_list('pk', flat=True).iterator(), dtype=np.int64)
+    # Approvals done with queryset.update() leave updated_at alone.
+    missing = np.setdiff1d(live, index.ids, assume_unique=True)
+    changed = _catalog().filter(Q(updated_at__gte=since) | Q(pk__in=missing.tolist()))
+    new_ids, new_rows = _transform(_documents(changed), index.vocabulary, index.idf)
+
+    keep = np.isin(index.ids, live, assume_unique=True) & ~np.isin(index.ids, new_ids, assume_unique=True)
+    if not len(new_ids) and keep.all():
+        return None
+    ids = np.concatenate([index.ids[keep], new_ids])
+    matrix = sparse.vstack([index.matrix[keep], new_rows], format='csr')
+    order = np.argsort(ids, kind='stable')
+    return ids[order], matrix[order]
+
+
+def build(incremental=False, directory=None):
+    """
+    Build a new index and return its manifest. ``incremental`` updates the
+    current one instead (and builds from scratch if there is none).
+
+    Builders in different processes serialize on a lock file; the manifest is
+    swapped in last, so readers only ever see a complete index.
+    """
+    directory = Path(directory or index_dir())
+    directory.mkdir(parents=True, exist_ok=True)
+
+    with open(directory / LOCK_NAME, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            previous = read_manifest(directory)
+            # Taken before reading, so edits committed during the build are
+            # picked up by the next incremental one.
+            built_at = timezone.now()
+            if incremental and previous:
+                current = SimilarIndex(directory / previous['path'], previous)
+                since = datetime.fromisoformat(previous['built_at']) - SYNC_OVERLAP
+                updated = _update(current, since)
+                if updated is None:
+                    return previous
+                ids, matrix = updated
+                terms, idf = current.terms(), np.asarray(current.idf)
+                mode = 'incremental'
+            else:
+                ids, terms, idf, matrix = _fit(_documents(_catalog()))
+                mode = 'full'
+
+            version = (previous['version'] if previous else 0) + 1
+            path = directory / f'index-{version}'
+            shutil.rmtree(path, ignore_errors=True)
+            _save(path, ids, terms, idf, matrix)
+
+            manifest = {
+                'version': version,
+                'path': path.name,
+                'mode': mode,
+                'built_at': built_at.isoformat(),
+                'prompts': len(ids),
+                'terms': len(terms),
+                'nnz': int(matrix.nnz),
+            }
+            _write_atomic(directory / MANIFEST_NAME, json.dumps(manifest).encode())
+            _prune(directory, version)
+            return manifest
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _prune(directory, current_version):
+    for path in directory.glob('index-*'):
+        try:
+            version = int(path.name.split('-', 1)[1])
+        except ValueError:
+            continue
+        if version <= current_version - KEEP_VERSIONS:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+# --- Per-process handle ---
+
+_lock = threading.Lock()
+_index = None
+_checked_at = 0.0
+
+
+def get_index():
+    """
+    This process's view of the current index, or None until
+    build_similar_index has built one: a full build takes too long to run
+    inside a request.
+    """
+    global _index, _checked_at
+    with _lock:
+        now = time.monotonic()
+        if _index is None or now - _checked_at >= settings.SIMILAR_INDEX_RELOAD_SECONDS:
+            directory = index_dir()
+            manifest = read_manifest(directory)
+            if manifest is None:
+                return _index
+            path = directory / manifest['path']
+            if _index is None or _index.path != path or _index.version != manifest['version']:
+                _index = SimilarIndex(path, manifest)
+            _checked_at = now
+        return _index
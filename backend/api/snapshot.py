@@ -0,0 +1,196 @@
+"""
+Prebuilt snapshot of the public, approved catalog.
+
+The snapshot is one JSON document written to CATALOG_SNAPSHOT_DIR as
+pre-compressed files plus a small manifest. Every worker serves the same
+bytes straight from disk; the ORM is only touched when the snapshot is
+rebuilt after a write changes the public set.
+"""
+import fcntl
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .changes import catalog_watermark, format_watermark
+from .models import Prompt
+from .pagination import CATALOG_ORDERING
+from .serializers import CatalogPromptSerializer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = '.build.lock'
+# Older files are kept around briefly for requests that already opened them.
+KEEP_VERSIONS = 2
+BUILD_CHUNK_SIZE = 2000
+
+
+def snapshot_dir():
+    return Path(settings.CATALOG_SNAPSHOT_DIR)
+
+
+def _write_atomic(path, data):
+    tmp = path.with_name(f'.{path.name}.tmp')
+    with open(tmp, 'wb') as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def _iter_catalog_json(version, generated_at, watermark):
+    qs = (
+        Prompt.objects.filter(is_public=True, status='approved')
+        .select_related('user')
+        .order_by(*CATALOG_ORDERING)
+    )
+    encoder = JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+    header = {'version': version, 'generated_at': generated_at, 'watermark': watermark}
+    yield encoder.encode(header)[:-1] + ',"prompts":['
+    first = True
+    for prompt in qs.iterator(chunk_size=BUILD_CHUNK_SIZE):
+        row = encoder.encode(CatalogPromptSerializer(prompt).data)
+        yield row if first else ',' + row
+        first = False
+    yield ']}'
+
+
+def read_manifest():
+    try:
+        with open(snapshot_dir() / MANIFEST_NAME, 'rb') as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def build_snapshot():
+    """
+    Rebuild the snapshot and return its manifest.
+
+    Builders in different processes serialize on a lock file; the manifest is
+    swapped in last, so readers only ever see a complete snapshot.
+    """
+    directory = snapshot_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    with open(directory / LOCK_NAME, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            previous = read_manifest()
+            version = (previous['version'] if previous else 0) + 1
+            generated_at = timezone.now().isoformat()
+            # Taken before reading, so /prompts/changes/?since=<watermark>
+            # picks up anything committed while the snapshot was built.
+            watermark = format_watermark(catalog_watermark())
+
+            digest = hashlib.sha256()
+            gz_path = directory / f'catalog-{version}.json.gz'
+            br_path = directory / f'catalog-{version}.json.br'
+            compressor = brotli.Compressor(quality=9) if brotli else None
+            size = 0
+
+            with ExitStack() as stack:
+                raw_gz = stack.enter_context(open(gz_path, 'wb'))
+                gz = stack.enter_context(
+                    gzip.GzipFile(fileobj=raw_gz, mode='wb', compresslevel=9, mtime=0)
+                )
+                br = stack.enter_context(open(br_path, 'wb')) if compressor else None
+                for chunk in _iter_catalog_json(version, generated_at, watermark):
+                    data = chunk.encode('utf-8')
+                    digest.update(data)
+                    size += len(data)
+                    gz.write(data)
+                    if br:
+                        br.write(compressor.process(data))
+                if br:
+                    br.write(compressor.finish())
+
+            files = {'gzip': gz_path.name}
+            if compressor:
+                files['br'] = br_path.name
+
+            manifest = {
+                'version': version,
+                'etag': digest.hexdigest(),
+                'generated_at': generated_at,
+                'size': size,
+                'files': files,
+            }
+            _write_atomic(directory / MANIFEST_NAME, json.dumps(manifest).encode())
+            _prune(directory, version)
+            return manifest
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _prune(directory, current_version):
+    for path in directory.glob('catalog-*.json.*'):
+        try:
+            version = int(path.name.split('-', 1)[1].split('.', 1)[0])
+        except ValueError:
+            continue
+        if version <= current_version - KEEP_VERSIONS:
+            path.unlink(missing_ok=True)
+
+
+def get_manifest():
+    """Return the current manifest, building the first snapshot if needed."""
+    return read_manifest() or build_snapshot()
+
+
+# --- Background rebuilds ---
+# Writes only flag that a rebuild is needed; a single worker thread per
+# process coalesces bursts of flags into as few rebuilds as possible.
+
+_state_lock = threading.Lock()
+_pending = threading.Event()
+_worker = None
+
+
+def _run_worker():
+    global _worker
+    try:
+        while True:
+            with _state_lock:
+                if not _pending.is_set():
+                    _worker = None
+                    return
+                _pending.clear()
+            try:
+                build_snapshot()
+            except Exception:
+                logger.exception('Catalog snapshot rebuild failed')
+    finally:
+        connection.close()
+
+
+def _start_rebuild():
+    global _worker
+    if not settings.CATALOG_SNAPSHOT_BACKGROUND:
+        build_snapshot()
+        return
+    with _state_lock:
+        _pending.set()
+        if _worker is None:
+            _worker = threading.Thread(target=_run_worker, name='catalog-snapshot', daemon=True)
+            _worker.start()
+
+
+def schedule_rebuild():
+    """Rebuild the snapshot once the current transaction commits."""
+    transaction.on_commit(_start_rebuild)
@@ -1 +1,1677 @@
-from django.test import TestCase
+import csv
+import gzip
+import importlib
+import io
+import json
+import mmap
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+from datetime import timedelta
+
+import numpy as np
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import Count, F, Q, Sum
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+
+from . import (
+    copybuffer, feedback, importer, jwks, listing_cache, similar, trending, typeahead, usage, versioning,
+)
+from .management.commands.bench_sso_login import CLIENT_ID, StubJWKSServer
+from .changes import SYNC_OVERLAP, format_watermark
+from .models import (
+    Bookmark, CopiedPromptFeedback, Prompt, PromptChange, PromptDailyStats, PromptRatingStats, PromptVersion,
+    UsageEvent, Vote,
+)
+
+
+def make_prompts(user, n, **kwargs):
+    fields = dict(
+        category='engineering', task_type='research', output_format='text',
+        status='approved', is_public=True,
+    )
+    fields.update(kwargs)
+    return Prompt.objects.bulk_create([
+        Prompt(user=user, title=f'Prompt {i}', prompt_text=f'text {i}', **fields)
+        for i in range(n)
+    ])
+
+
+class PromptListQueryBudgetTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='x')
+        self.reader = User.objects.create_user('reader', password='x')
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+
+    def count_queries(self, user, url):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        return len(ctx), res.data
+
+    def test_list_query_count_is_independent_of_page_size(self):
+        prompts = make_prompts(self.author, 60)
+        for p in prompts[::3]:
+            Vote.objects.create(user=self.reader, prompt=p, value=1)
+            Bookmark.objects.create(user=self.reader, prompt=p)
+
+        small, _ = self.count_queries(self.reader, '/api/prompts/?limit=5')
+        large, _ = self.count_queries(self.reader, '/api/prompts/?limit=60')
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 1)
+
+    def test_staff_and_mine_views_share_the_budget(self):
+        make_prompts(self.author, 30, status='pending')
+        small, _ = self.count_queries(self.admin, '/api/prompts/?limit=3&status=pending')
+        large, _ = self.count_queries(self.admin, '/api/prompts/?limit=30&status=pending')
+        self.assertEqual(small, large)
+
+        small, _ = self.count_queries(self.author, '/api/prompts/?limit=3&mine=1')
+        large, _ = self.count_queries(self.author, '/api/prompts/?limit=30&mine=1')
+        self.assertEqual(small, large)
+
+    def test_annotated_fields_match_per_row_state(self):
+        liked, disliked, untouched = make_prompts(self.author, 3)
+        Vote.objects.create(user=self.reader, prompt=liked, value=1)
+        Vote.objects.create(user=self.reader, prompt=disliked, value=-1)
+        Bookmark.objects.create(user=self.reader, prompt=disliked)
+        Prompt.objects.filter(pk=liked.pk).update(like_count=1, vote=1)
+        Prompt.objects.filter(pk=disliked.pk).update(dislike_count=1, vote=-1)
+
+        _, data = self.count_queries(self.reader, '/api/prompts/')
+        rows = {row['id']: row for row in data}
+        self.assertEqual(rows[liked.pk]['user_vote'], 1)
+        self.assertEqual(rows[liked.pk]['vote_count'], 1)
+        self.assertEqual(rows[liked.pk]['like_count'], 1)
+        self.assertEqual(rows[disliked.pk]['user_vote'], -1)
+        self.assertEqual(rows[disliked.pk]['dislike_count'], 1)
+        self.assertTrue(rows[disliked.pk]['is_bookmarked'])
+        self.assertEqual(rows[untouched.pk]['user_vote'], 0)
+        self.assertFalse(rows[untouched.pk]['is_bookmarked'])
+        self.assertEqual(rows[untouched.pk]['user_username'], 'author')
+
+    def test_detail_is_a_single_query(self):
+        prompt, = make_prompts(self.author, 1)
+        Bookmark.objects.create(user=self.reader, prompt=prompt)
+        n, data = self.count_queries(self.reader, f'/api/prompts/{prompt.pk}/')
+        self.assertEqual(n, 1)
+        self.assertTrue(data['is_bookmarked'])
+
+
+class PromptCursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='x')
+        self.client.force_authenticate(self.author)
+        make_prompts(self.author, 25)
+        # Ties on copy_count force the seek to fall through to created_at/id.
+        for i, p in enumerate(Prompt.objects.order_by('id')):
+            Prompt.objects.filter(pk=p.pk).update(copy_count=i % 4)
+
+    def walk(self, url):
+        ids, pages = [], 0
+        res = self.client.get(url)
+        while True:
+            self.assertEqual(res.status_code, 200)
+            ids += [row['id'] for row in res.data['results']]
+            pages += 1
+            if not res.data['next']:
+                return ids, pages
+            res = self.client.get(f"{url.split('cursor=')[0]}cursor={res.data['next']}")
+
+    def test_cursor_walk_matches_full_ordering(self):
+        expected = list(
+            Prompt.objects.order_by('-copy_count', '-created_at', '-id').values_list('id', flat=True)
+        )
+        ids, pages = self.walk('/api/prompts/?limit=7&cursor=')
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 4)
+
+    def test_rows_do_not_shift_when_counts_change_mid_walk(self):
+        first = self.client.get('/api/prompts/?limit=10&cursor=').data
+        seen = [row['id'] for row in first['results']]
+        # A prompt on the first page drops below everything still unread and
+        # one that was still unread jumps to the top.
+        unread = Prompt.objects.exclude(pk__in=seen).order_by('copy_count').first()
+        Prompt.objects.filter(pk=seen[0]).update(copy_count=-1)
+        Prompt.objects.filter(pk=unread.pk).update(copy_count=100)
+        rest = self.client.get(f"/api/prompts/?limit=100&cursor={first['next']}").data
+        rest_ids = [row['id'] for row in rest['results']]
+        # Nothing else on the first page repeats, and no unread row is skipped
+        # apart from the one that moved behind the cursor.
+        self.assertEqual(set(seen) & set(rest_ids), {seen[0]})
+        self.assertEqual(set(seen) | set(rest_ids) | {unread.pk}, set(Prompt.objects.values_list('id', flat=True)))
+
+    def test_legacy_offset_contract_is_unchanged(self):
+        res = self.client.get('/api/prompts/?limit=10&offset=20')
+        self.assertIsInstance(res.data, list)
+        self.assertEqual(len(res.data), 5)
+
+    def test_invalid_cursor_is_rejected(self):
+        res = self.client.get('/api/prompts/?cursor=not-a-cursor')
+        self.assertEqual(res.status_code, 400)
+
+
+class CatalogSnapshotTests(APITestCase):
+    def setUp(self):
+        self.snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshot_dir)
+        overrides = override_settings(
+            CATALOG_SNAPSHOT_DIR=self.snapshot_dir,
+            CATALOG_SNAPSHOT_BACKGROUND=False,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.author = User.objects.create_user('author', password='x')
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.public = make_prompts(self.author, 3)
+        make_prompts(self.author, 2, status='pending')
+        make_prompts(self.author, 1, is_public=False)
+
+    def fetch(self, user, **headers):
+        self.client.force_authenticate(user)
+        return self.client.get('/api/prompts/snapshot/', HTTP_ACCEPT_ENCODING='gzip', **headers)
+
+    def decode(self, res):
+        return json.loads(gzip.decompress(b''.join(res.streaming_content)))
+
+    def test_snapshot_contains_only_public_approved_prompts(self):
+        res = self.fetch(self.author)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        body = self.decode(res)
+        self.assertEqual(body['version'], int(res['X-Catalog-Version']))
+        self.assertEqual({p['id'] for p in body['prompts']}, {p.id for p in self.public})
+        self.assertNotIn('user_vote', body['prompts'][0])
+        self.assertNotIn('is_bookmarked', body['prompts'][0])
+
+    def test_etag_revalidation_skips_the_orm(self):
+        etag = self.fetch(self.author)['ETag']
+        self.client.force_authenticate(self.author)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(
+                '/api/prompts/snapshot/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag,
+            )
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(len(ctx), 0)
+
+    def test_moderation_rebuilds_snapshot(self):
+        first = self.fetch(self.author)
+        pending = Prompt.objects.filter(status='pending').first()
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/prompts/{pending.pk}/approve/')
+        second = self.fetch(self.author, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertGreater(int(second['X-Catalog-Version']), int(first['X-Catalog-Version']))
+        self.assertIn(pending.pk, {p['id'] for p in self.decode(second)['prompts']})
+
+    def test_identity_fallback_without_compression_support(self):
+        self.fetch(self.author)
+        res = self.client.get('/api/prompts/snapshot/', HTTP_ACCEPT_ENCODING='identity')
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(len(json.loads(res.content)['prompts']), 3)
+
+
+class CatalogChangesTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='x')
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.kept, self.rejected, self.hidden, self.deleted = make_prompts(self.author, 4)
+        # Everything above predates the client's watermark.
+        old = timezone.now() - timedelta(hours=1)
+        Prompt.objects.update(updated_at=old)
+        self.since = format_watermark(old + SYNC_OVERLAP + timedelta(seconds=1))
+
+    def changes(self, since):
+        self.client.force_authenticate(self.author)
+        return self.client.get('/api/prompts/changes/', {'since': since})
+
+    def test_reports_upserts_and_tombstones(self):
+        self.client.force_authenticate(self.admin)
+        self.client.post(f'/api/prompts/{self.rejected.pk}/reject/')
+        self.client.patch(f'/api/prompts/{self.hidden.pk}/', {'is_public': False}, format='json')
+        self.client.delete(f'/api/prompts/{self.deleted.pk}/')
+        new, = make_prompts(self.author, 1)
+
+        res = self.changes(self.since)
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(res.data['reset'])
+        self.assertEqual([p['id'] for p in res.data['upserts']], [new.pk])
+        self.assertEqual(
+            res.data['tombstones'], sorted([self.rejected.pk, self.hidden.pk, self.deleted.pk]),
+        )
+        self.assertEqual(
+            set(PromptChange.objects.values_list('action', flat=True)), {'hidden', 'deleted'},
+        )
+
+        # Nothing new since the returned watermark beyond the overlap re-read.
+        again = self.changes(res.data['watermark']).data
+        self.assertLessEqual({p['id'] for p in again['upserts']}, {new.pk})
+
+    def test_republished_prompt_is_an_upsert_not_a_tombstone(self):
+        self.client.force_authenticate(self.admin)
+        self.client.post(f'/api/prompts/{self.rejected.pk}/reject/')
+        self.client.post(f'/api/prompts/{self.rejected.pk}/approve/')
+        res = self.changes(self.since)
+        self.assertEqual([p['id'] for p in res.data['upserts']], [self.rejected.pk])
+        self.assertEqual(res.data['tombstones'], [])
+
+    def test_stale_or_missing_watermark(self):
+        stale = format_watermark(timezone.now() - timedelta(days=365))
+        self.assertTrue(self.changes(stale).data['reset'])
+        self.assertEqual(self.changes('yesterday').status_code, 400)
+
+
+class PromptFullTextSearchTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='x')
+        self.client.force_authenticate(self.author)
+        self.in_title, self.in_body, self.other = Prompt.objects.bulk_create([
+            Prompt(user=self.author, title='Quarterly budget review', prompt_text='Summarize it.',
+                   category='finance', status='approved'),
+            Prompt(user=self.author, title='Meeting notes', prompt_text='Draft a budget for the offsite.',
+                   category='finance', status='approved'),
+            Prompt(user=self.author, title='Unit tests', prompt_text='Write pytest cases.',
+                   category='engineering', status='approved'),
+        ])
+
+    def search(self, **params):
+        res = self.client.get('/api/prompts/', {'search_mode': 'fulltext', **params})
+        self.assertEqual(res.status_code, 200)
+        return res.data
+
+    def test_title_matches_outrank_body_matches(self):
+        ids = [p['id'] for p in self.search(search='budgets')]
+        self.assertEqual(ids, [self.in_title.pk, self.in_body.pk])
+
+    def test_websearch_syntax_and_headline(self):
+        rows = self.search(search='budget -quarterly', headline='1')
+        self.assertEqual([p['id'] for p in rows], [self.in_body.pk])
+        self.assertIn('<mark>budget</mark>', rows[0]['search_headline'])
+
+    def test_filters_and_limit_compose_with_search(self):
+        rows = self.search(search='budget', category='finance', limit='1', offset='1')
+        self.assertEqual([p['id'] for p in rows], [self.in_body.pk])
+        self.assertNotIn('search_headline', rows[0])
+
+    def test_default_mode_is_still_substring_search(self):
+        res = self.client.get('/api/prompts/', {'search': 'pytes'})
+        self.assertEqual([p['id'] for p in res.data], [self.other.pk])
+
+
+class TypeaheadIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = typeahead.TypeaheadIndex(max_prompts=4)
+        self.index.load([
+            (1, 'Quarterly budget review', 'finance', 'summarize', 30),
+            (2, 'Budget forecast', 'finance', 'research', 50),
+            (3, 'Bug triage checklist', 'engineering', 'plan_organize', 10),
+        ])
+
+    def texts(self, prefix, limit=8):
+        return [c['text'] for c in self.index.lookup(prefix, limit)]
+
+    def test_prefix_matches_title_words_ranked_by_copies(self):
+        self.assertEqual(self.texts('bu'), ['Budget forecast', 'Quarterly budget review', 'Bug triage checklist'])
+        self.assertEqual(self.texts('budget r'), ['Quarterly budget review'])
+        self.assertEqual(self.texts('  QUARTERLY  '), ['Quarterly budget review'])
+
+    def test_facets_are_ranked_by_summed_copies(self):
+        finance = self.index.lookup('fin')[0]
+        self.assertEqual((finance['kind'], finance['value'], finance['score']), ('category', 'finance', 80))
+
+    def test_incremental_updates_patch_cached_results(self):
+        self.assertEqual(self.texts('b', 1), ['Budget forecast'])
+        self.index.upsert_prompt(3, 'Bug triage checklist', 'engineering', 'plan_organize', 99)
+        self.assertEqual(self.texts('b', 1), ['Bug triage checklist'])
+        self.index.upsert_prompt(3, 'Bug triage checklist', 'engineering', 'plan_organize', 1)
+        self.assertEqual(self.texts('b', 1), ['Budget forecast'])
+        self.index.remove_prompt(2)
+        self.assertEqual(self.texts('bu'), ['Quarterly budget review', 'Bug triage checklist'])
+        self.assertEqual(self.index.lookup('fin')[0]['score'], 30)
+
+    def test_capacity_evicts_least_copied_prompt(self):
+        self.index.upsert_prompt(4, 'Brand voice guide', 'marketing', 'create_content', 40)
+        self.index.upsert_prompt(5, 'Brainstorm names', 'marketing', 'ideate', 5)
+        self.assertEqual(self.texts('brai'), [])
+        self.index.upsert_prompt(6, 'Branding workshop', 'marketing', 'ideate', 20)
+        self.assertEqual(self.texts('bug'), [])
+        self.assertEqual(self.texts('bran'), ['Brand voice guide', 'Branding workshop'])
+
+
+class AutocompleteEndpointTests(APITestCase):
+    def setUp(self):
+        typeahead.reset_index()
+        self.addCleanup(typeahead.reset_index)
+        self.author = User.objects.create_user('author', password='x')
+        self.client.force_authenticate(self.author)
+        make_prompts(self.author, 2)
+
+    def test_index_follows_prompt_writes(self):
+        res = self.client.get('/api/prompts/autocomplete/', {'q': 'prompt'})
+        self.assertEqual([c['text'] for c in res.data], ['Prompt 1', 'Prompt 0'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new = Prompt.objects.create(
+                user=self.author, title='Prompt zeta', prompt_text='z', category='design',
+                status='approved', copy_count=5,
+            )
+            Prompt.objects.filter(title='Prompt 0').delete()
+        res = self.client.get('/api/prompts/autocomplete/', {'q': 'prompt', 'limit': 1})
+        self.assertEqual(res.data[0]['value'], new.pk)
+        res = self.client.get('/api/prompts/autocomplete/', {'q': 'prompt 0'})
+        self.assertEqual(res.data, [])
+
+
+class VoteAccountingTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='x')
+        self.voter = User.objects.create_user('voter', password='x')
+        self.prompt, = make_prompts(self.author, 1)
+        self.client.force_authenticate(self.voter)
+
+    def vote(self, direction):
+        return self.client.post(f'/api/prompts/{self.prompt.pk}/{direction}/').data
+
+    def test_transitions_apply_deltas(self):
+        self.assertEqual(self.vote('upvote'), {
+            'id': self.prompt.pk, 'user_vote': 1, 'vote_count': 1, 'like_count': 1, 'dislike_count': 0,
+        })
+        data = self.vote('downvote')
+        self.assertEqual((data['user_vote'], data['vote_count'], data['like_count'], data['dislike_count']), (-1, -1, 0, 1))
+        data = self.vote('downvote')
+        self.assertEqual((data['user_vote'], data['vote_count'], data['like_count'], data['dislike_count']), (0, 0, 0, 0))
+        self.assertFalse(Vote.objects.exists())
+
+
+# Events are written straight through: a buffered one would be flushed at exit,
+# after the test database is gone.
+@override_settings(USAGE_BUFFER_FLUSH_SECONDS=0)
+class VoteConcurrencyTests(TransactionTestCase):
+    THREADS = 12
+    CLICKS = 10
+
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='x')
+        self.prompt, = make_prompts(self.author, 1)
+        self.voters = [User.objects.create_user(f'voter{i}', password='x') for i in range(self.THREADS)]
+
+    def hammer(self, users):
+        barrier = threading.Barrier(len(users))
+        errors = []
+
+        def run(i, user):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                barrier.wait()
+                for n in range(self.CLICKS):
+                    direction = 'upvote' if (i + n) % 3 else 'downvote'
+                    res = client.post(f'/api/prompts/{self.prompt.pk}/{direction}/')
+                    if res.status_code != 200:
+                        errors.append(res.status_code)
+            except Exception as exc:
+                errors.append(repr(exc))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(i, u)) for i, u in enumerate(users)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+
+    def assertCountersExact(self):
+        self.prompt.refresh_from_db()
+        actual = Vote.objects.filter(prompt=self.prompt).aggregate(
+            likes=Count('id', filter=Q(value=1)),
+            dislikes=Count('id', filter=Q(value=-1)),
+            total=Sum('value'),
+        )
+        self.assertEqual(self.prompt.like_count, actual['likes'])
+        self.assertEqual(self.prompt.dislike_count, actual['dislikes'])
+        self.assertEqual(self.prompt.vote, actual['total'] or 0)
+
+    def test_many_voters_on_one_prompt(self):
+        self.hammer(self.voters)
+        self.assertCountersExact()
+
+    def test_one_voter_clicking_from_many_threads(self):
+        self.hammer([self.voters[0]] * self.THREADS)
+        self.assertCountersExact()
+        self.assertLessEqual(Vote.objects.count(), 1)
+
+
+@override_settings(COPY_BUFFER_FLUSH_SECONDS=3600, COPY_BUFFER_MAX_PENDING=10_000)
+class CopyBufferTests(APITestCase):
+    def setUp(self):
+        copybuffer.flush()
+        self.author = User.objects.create_user('author', password='x')
+        self.client.force_authenticate(self.author)
+        self.first, self.second = make_prompts(self.author, 2)
+
+    def copy(self, prompt):
+        return self.client.post(f'/api/prompts/{prompt.pk}/copy/').data['copy_count']
+
+    def test_copies_are_buffered_and_flushed_in_one_batch(self):
+        self.assertEqual([self.copy(self.first) for _ in range(3)], [1, 2, 3])
+        self.copy(self.second)
+        self.assertEqual(Prompt.objects.get(pk=self.first.pk).copy_count, 0)
+        updated_at = Prompt.objects.get(pk=self.first.pk).updated_at
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(copybuffer.flush(), 2)
+        self.assertEqual(sum('UPDATE' in q['sql'] for q in ctx.captured_queries), 1)
+
+        first = Prompt.objects.get(pk=self.first.pk)
+        self.assertEqual((first.copy_count, first.updated_at), (3, updated_at))
+        self.assertEqual(Prompt.objects.get(pk=self.second.pk).copy_count, 1)
+        self.assertEqual(copybuffer.pending(self.first.pk), 0)
+        self.assertEqual(self.copy(self.first), 4)
+
+    def test_flush_updates_rows_in_id_order(self):
+        self.copy(self.second)
+        self.copy(self.first)
+        with CaptureQueriesContext(connection) as ctx:
+            copybuffer.flush()
+        update, = [q['sql'] for q in ctx.captured_queries if 'UPDATE' in q['sql']]
+        self.assertLess(update.index(f'({self.first.pk}::bigint'), update.index(f'({self.second.pk}::bigint'))
+
+    def test_failed_flush_keeps_increments(self):
+        self.copy(self.first)
+        with mock.patch.object(copybuffer, '_write', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                copybuffer.flush()
+        self.assertEqual(copybuffer.pending(self.first.pk), 1)
+        copybuffer.flush()
+        self.assertEqual(Prompt.objects.get(pk=self.first.pk).copy_count, 1)
+
+    @override_settings(COPY_BUFFER_FLUSH_SECONDS=0)
+    def test_write_through_mode(self):
+        self.assertEqual(self.copy(self.first), 1)
+        self.assertEqual(Prompt.objects.get(pk=self.first.pk).copy_count, 1)
+
+
+@override_settings(COPY_BUFFER_FLUSH_SECONDS=0)
+class CopyEventTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='x')
+        self.reader = User.objects.create_user('reader', password='x')
+        self.client.force_authenticate(self.reader)
+        self.first, self.second = make_prompts(self.author, 2)
+
+    def pending(self):
+        return list(
+            CopiedPromptFeedback.objects.filter(user=self.reader, status='pending')
+            .values_list('prompt_id', flat=True)
+        )
+
+    def test_copy_event_counts_and_keeps_one_pending_row(self):
+        response = self.client.post('/api/copy/', {'prompt_id': self.first.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['copy_count'], 1)
+        pending_id = CopiedPromptFeedback.objects.get(user=self.reader).pk
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post('/api/copy/', {'prompt_id': self.second.pk})
+        self.assertFalse(any(q['sql'].startswith('DELETE') for q in ctx.captured_queries))
+
+        self.assertEqual(self.pending(), [self.second.pk])
+        self.assertEqual(CopiedPromptFeedback.objects.get(user=self.reader).pk, pending_id)
+        self.assertEqual(Prompt.objects.get(pk=self.second.pk).copy_count, 1)
+
+    def test_answered_feedback_is_kept(self):
+        self.client.post('/api/copy/', {'prompt_id': self.first.pk})
+        self.client.post('/api/copy/submit/', {'prompt_id': self.first.pk, 'status': 'submitted', 'rating': 4})
+        self.client.post('/api/copy/', {'prompt_id': self.second.pk})
+        self.assertEqual(CopiedPromptFeedback.objects.filter(user=self.reader).count(), 2)
+        self.assertEqual(self.pending(), [self.second.pk])
+
+    def test_legacy_endpoints_split_the_event(self):
+        self.assertEqual(self.client.post(f'/api/prompts/{self.first.pk}/copy/').data['copy_count'], 1)
+        self.assertEqual(self.pending(), [])
+        self.client.post('/api/copy/save/', {'prompt_id': self.first.pk})
+        self.assertEqual(self.pending(), [self.first.pk])
+        self.assertEqual(Prompt.objects.get(pk=self.first.pk).copy_count, 1)
+
+    def test_hidden_prompt_is_not_found(self):
+        hidden = make_prompts(self.author, 1, status='pending')[0]
+        self.assertEqual(self.client.post('/api/copy/', {'prompt_id': hidden.pk}).status_code, 404)
+        self.assertEqual(self.client.post('/api/copy/', {}).status_code, 400)
+
+
+class PendingFeedbackCheckTests(APITestCase):
+    def setUp(self):
+        listing_cache.get_cache().clear()
+        self.author = User.objects.create_user('author', password='x')
+        self.reader = User.objects.create_user('reader', password='x')
+        self.client.force_authenticate(self.reader)
+        self.prompt, = make_prompts(self.author, 1)
+
+    def check(self, url='/api/feedback/pending/'):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        return len(ctx), res.data
+
+    def test_nothing_pending_is_answered_from_cache(self):
+        self.assertEqual(self.check(), (1, {'pending': False}))
+        self.assertEqual(self.check(), (0, {'pending': False}))
+
+    def test_copy_and_submit_invalidate_the_flag(self):
+        self.check()
+        self.client.post('/api/copy/', {'prompt_id': self.prompt.pk})
+        n, data = self.check('/api/copy/check/')
+        self.assertEqual(n, 1)
+        self.assertEqual(data, {'pending': True, 'prompt_id': self.prompt.pk, 'prompt_title': 'Prompt 0'})
+
+        self.client.post('/api/copy/submit/', {'prompt_id': self.prompt.pk, 'status': 'skipped'})
+        self.assertEqual(self.check()[1], {'pending': False})
+        self.assertEqual(self.check()[0], 0)
+
+    def test_current_user_carries_the_answer(self):
+        self.client.post('/api/copy/', {'prompt_id': self.prompt.pk})
+        _, data = self.check('/api/auth/user/')
+        self.assertEqual(data['username'], 'reader')
+        self.assertEqual(data['pending_feedback']['prompt_id'], self.prompt.pk)
+
+    def test_stale_reader_does_not_hide_a_new_copy(self):
+        # A copy committing while a reader still holds its "none" answer.
+        feedback.feedback_requested(self.reader.pk)
+        listing_cache.get_cache().add(f'feedback:pending:{self.reader.pk}', feedback.NONE)
+        CopiedPromptFeedback.objects.create(user=self.reader, prompt=self.prompt)
+        self.assertTrue(self.check()[1]['pending'])
+
+
+class ListingCacheTests(APITestCase):
+    def setUp(self):
+        listing_cache.get_cache().clear()
+        self.author = User.objects.create_user('author', password='x')
+        self.reader = User.objects.create_user('reader', password='x')
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.prompts = make_prompts(self.author, 5)
+
+    def fetch(self, user, url='/api/prompts/?category=engineering&limit=10'):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        return len(ctx), {row['id']: row for row in res.data}
+
+    def test_hit_is_shared_and_personalized(self):
+        Vote.objects.create(user=self.reader, prompt=self.prompts[0], value=1)
+        Bookmark.objects.create(user=self.reader, prompt=self.prompts[1])
+        Prompt.objects.filter(pk=self.prompts[0].pk).update(like_count=1, vote=1)
+
+        _, author_view = self.fetch(self.author)
+        queries, reader_view = self.fetch(self.reader)
+        self.assertEqual(queries, 1)
+        self.assertEqual(reader_view[self.prompts[0].pk]['user_vote'], 1)
+        self.assertEqual(reader_view[self.prompts[0].pk]['vote_count'], 1)
+        self.assertTrue(reader_view[self.prompts[1].pk]['is_bookmarked'])
+        self.assertEqual(author_view[self.prompts[0].pk]['user_vote'], 0)
+        self.assertFalse(author_view[self.prompts[1].pk]['is_bookmarked'])
+
+    def test_counters_stay_fresh_on_a_hit(self):
+        self.fetch(self.reader)
+        Prompt.objects.filter(pk=self.prompts[2].pk).update(dislike_count=3, vote=-3)
+        _, rows = self.fetch(self.reader)
+        self.assertEqual(rows[self.prompts[2].pk]['dislike_count'], 3)
+        self.assertEqual(rows[self.prompts[2].pk]['vote_count'], -3)
+
+    def test_moderation_bumps_the_version(self):
+        self.fetch(self.reader)
+        pending = make_prompts(self.author, 1, status='pending')[0]
+        _, rows = self.fetch(self.reader)
+        self.assertNotIn(pending.pk, rows)
+
+        self.client.force_authenticate(self.admin)
+        self.client.post(f'/api/prompts/{pending.pk}/approve/')
+        _, rows = self.fetch(self.reader)
+        self.assertIn(pending.pk, rows)
+
+        self.client.force_authenticate(self.author)
+        self.client.delete(f'/api/prompts/{self.prompts[0].pk}/')
+        _, rows = self.fetch(self.reader)
+        self.assertNotIn(self.prompts[0].pk, rows)
+
+    def test_uncacheable_requests_bypass(self):
+        self.assertIsNone(listing_cache.cache_key({'search': 'x'}))
+        self.assertIsNone(listing_cache.cache_key({'mine': '1'}))
+        self.assertEqual(
+            listing_cache.cache_key({'limit': '5', 'category': 'engineering'}),
+            listing_cache.cache_key({'category': 'engineering', 'limit': '5'}),
+        )
+
+
+class ListingCacheSingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        listing_cache.get_cache().clear()
+
+    def test_concurrent_misses_build_once(self):
+        calls = []
+        start = threading.Barrier(8)
+
+        def build():
+            calls.append(1)
+            time.sleep(0.1)
+            return ['page']
+
+        def worker(results):
+            start.wait()
+            results.append(listing_cache.get_or_build('catalog:list:test', build))
+
+        results = []
+        threads = [threading.Thread(target=worker, args=(results,)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [['page']] * 8)
+
+
+class UserOverlayTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='x')
+        self.reader = User.objects.create_user('reader', password='x')
+        self.prompts = make_prompts(self.author, 4)
+        self.client.force_authenticate(self.reader)
+
+    def test_overlay_lists_votes_and_bookmarks(self):
+        a, b, c, d = self.prompts
+        Vote.objects.create(user=self.reader, prompt=c, value=1)
+        Vote.objects.create(user=self.reader, prompt=a, value=1)
+        Vote.objects.create(user=self.reader, prompt=b, value=-1)
+        Vote.objects.create(user=self.author, prompt=d, value=1)
+        Bookmark.objects.create(user=self.reader, prompt=d)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get('/api/me/overlay/')
+        self.assertEqual(len(ctx), 2)
+        self.assertEqual(res.json(), {
+            'votes': {'up': [a.pk, c.pk], 'down': [b.pk]},
+            'bookmarks': [d.pk],
+        })
+
+    def test_unchanged_overlay_is_not_modified(self):
+        etag = self.client.get('/api/me/overlay/')['ETag']
+        res = self.client.get('/api/me/overlay/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+
+        self.client.post(f'/api/prompts/{self.prompts[0].pk}/bookmark/')
+        res = self.client.get('/api/me/overlay/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['bookmarks'], [self.prompts[0].pk])
+        self.assertNotEqual(res['ETag'], etag)
+
+
+class JWKSCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.stub = StubJWKSServer().__enter__()
+        self.addCleanup(self.stub.__exit__)
+        self.kid = next(iter(self.stub.private_keys))
+
+    def cache(self, **kwargs):
+        options = {'ttl': 60, 'max_stale': 60, 'min_refresh_interval': 60, 'timeout': (1, 1)}
+        options.update(kwargs)
+        return jwks.JWKSCache(self.stub.url, **options)
+
+    def test_keys_are_fetched_once_within_ttl(self):
+        cache = self.cache()
+        self.assertIs(cache.get_key(self.kid), cache.get_key(self.kid))
+        self.assertEqual(self.stub.requests, 1)
+
+    def test_unknown_kid_refreshes_at_most_once_per_interval(self):
+        cache = self.cache()
+        cache.get_key(self.kid)
+        rotated = self.stub.add_key()
+        self.assertIsNotNone(cache.get_key(rotated))
+        self.assertEqual(self.stub.requests, 2)
+        for _ in range(5):
+            with self.assertRaises(jwks.SigningKeyNotFound):
+                cache.get_key('no-such-kid')
+        self.assertEqual(self.stub.requests, 2)
+
+    def test_stale_keys_are_served_while_the_endpoint_is_down(self):
+        cache = self.cache(ttl=0)
+        key = cache.get_key(self.kid)
+        self.stub.fail = True
+        self.assertIs(cache.get_key(self.kid), key)
+        deadline = time.monotonic() + 5
+        while cache._refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertGreater(self.stub.requests, 1)
+        self.assertIs(cache.get_key(self.kid), key)
+
+    def test_unreachable_endpoint_without_keys(self):
+        self.stub.fail = True
+        with self.assertRaises(jwks.JWKSUnavailable):
+            self.cache().get_key(self.kid)
+
+    def test_slow_endpoint_times_out(self):
+        self.stub.latency = 2
+        started = time.monotonic()
+        with self.assertRaises(jwks.JWKSUnavailable):
+            self.cache(timeout=(1, 0.1)).get_key(self.kid)
+        self.assertLess(time.monotonic() - started, 1.5)
+
+
+class SSOLoginTests(APITestCase):
+    def setUp(self):
+        jwks.reset()
+        self.addCleanup(jwks.reset)
+        self.stub = StubJWKSServer().__enter__()
+        self.addCleanup(self.stub.__exit__)
+        patcher = override_settings(SSO_JWKS_URL=self.stub.url, SSO_CLIENT_ID=CLIENT_ID)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def login(self, token):
+        return self.client.post('/api/sso-login/', {'access_token': token}, format='json')
+
+    def test_login_issues_jwt_and_reuses_cached_keys(self):
+        first = self.login(self.stub.token('ada@example.com'))
+        second = self.login(self.stub.token('ada@example.com'))
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(self.stub.requests, 1)
+        self.assertEqual(User.objects.filter(username='ada@example.com').count(), 1)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {second.data["access"]}')
+        self.assertEqual(self.client.get('/api/auth/user/').data['username'], 'ada@example.com')
+
+    def test_wrong_audience_is_rejected(self):
+        res = self.login(self.stub.token('ada@example.com', audience='someone-else'))
+        self.assertEqual(res.status_code, 401)
+
+    def test_key_endpoint_down_is_a_503(self):
+        self.stub.fail = True
+        with self.assertLogs('api.views', 'WARNING'):
+            self.assertEqual(self.login(self.stub.token('ada@example.com')).status_code, 503)
+
+
+class ClaimsAuthenticationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('reader', password='x', email='reader@example.com')
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.prompt, = make_prompts(self.admin, 1, status='pending')
+        # /auth/user/ also answers the pending-feedback check; warm its flag so
+        # only authentication shows up in the query counts.
+        listing_cache.get_cache().clear()
+        feedback.pending_feedback(self.user)
+
+    def obtain(self, username):
+        res = self.client.post('/api/token/', {'username': username, 'password': 'x'}, format='json')
+        self.assertEqual(res.status_code, 200)
+        return res.data
+
+    def get(self, access, url):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {access}')
+        return res, [q['sql'] for q in ctx.captured_queries]
+
+    def test_requests_do_not_load_the_user_row(self):
+        access = self.obtain('reader')['access']
+        self.get(access, '/api/auth/user/')  # warms the token version cache
+        res, queries = self.get(access, '/api/auth/user/')
+        self.assertEqual(queries, [])
+        self.assertEqual(res.data, {
+            'id': self.user.pk, 'username': 'reader', 'email': 'reader@example.com', 'is_staff': False,
+            'pending_feedback': {'pending': False},
+        })
+
+        res, queries = self.get(access, '/api/prompts/?mine=1')
+        self.assertEqual(res.status_code, 200)
+        user_lookups = [q for q in queries if 'FROM "auth_user" WHERE' in q]
+        self.assertEqual(user_lookups, [])
+
+    def test_promotion_takes_effect_for_existing_tokens(self):
+        access = self.obtain('reader')['access']
+        approve = f'/api/prompts/{self.prompt.pk}/approve/'
+        res = self.client.post(approve, HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(res.status_code, 403)
+
+        admin_access = self.obtain('admin')['access']
+        self.client.post('/api/auth/promote-admin/', {'username': 'reader'}, HTTP_AUTHORIZATION=f'Bearer {admin_access}')
+
+        res = self.client.post(approve, HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(res.status_code, 200)
+
+    def test_refresh_restamps_claims(self):
+        tokens = self.obtain('reader')
+        self.user.is_staff = True
+        self.user.save()  # bumps the token version
+        res = self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+        res, queries = self.get(res.data['access'], '/api/auth/user/')
+        self.assertTrue(res.data['is_staff'])
+        self.assertEqual(queries, [])
+
+    def test_deleted_users_tokens_are_rejected(self):
+        access = self.obtain('reader')['access']
+        res, _ = self.get(access, '/api/auth/user/')  # caches version 0
+        self.assertEqual(res.status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        res, _ = self.get(access, '/api/auth/user/')
+        self.assertEqual(res.status_code, 401)
+
+        # Other processes only drop their cached version after the TTL.
+        other = User.objects.create_user('other', password='x')
+        access = self.obtain('other')['access']
+        self.get(access, '/api/auth/user/')
+        with mock.patch('api.signals.forget_token_version'):
+            other.delete()
+        later = time.monotonic() + settings.AUTH_TOKEN_VERSION_TTL + 1
+        with mock.patch('api.authentication.time.monotonic', return_value=later):
+            res, _ = self.get(access, '/api/auth/user/')
+        self.assertEqual(res.status_code, 401)
+
+    def test_tokens_without_claims_still_work(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        access = str(RefreshToken.for_user(self.user).access_token)
+        res, queries = self.get(access, '/api/auth/user/')
+        self.assertEqual(res.data['username'], 'reader')
+        self.assertEqual(len(queries), 1)
+
+
+class FacetsTests(APITestCase):
+    def setUp(self):
+        listing_cache.get_cache().clear()
+        self.author = User.objects.create_user('author', password='x')
+        self.reader = User.objects.create_user('reader', password='x')
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        make_prompts(self.author, 3)
+        make_prompts(self.author, 2, category='finance', output_format='code')
+        make_prompts(self.author, 1, status='pending')
+        make_prompts(self.author, 1, is_public=False)
+        make_prompts(self.reader, 1, category='custom-team', status='pending')
+
+    def facets(self, user, url='/api/facets/'):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        counts = {
+            name: {item['value']: item['count'] for item in res.data[name] if item['count']}
+            for name in ('category', 'task_type', 'output_format', 'status')
+        }
+        return len(ctx), res.data['total'], counts
+
+    def test_scopes_follow_list_visibility(self):
+        queries, total, counts = self.facets(self.reader)
+        self.assertEqual(queries, 1)
+        self.assertEqual(total, 5)
+        self.assertEqual(counts['category'], {'engineering': 3, 'finance': 2})
+        self.assertEqual(counts['output_format'], {'text': 3, 'code': 2})
+        self.assertEqual(counts['status'], {'approved': 5})
+
+        _, total, counts = self.facets(self.reader, '/api/facets/?mine=1')
+        self.assertEqual((total, counts['category']), (1, {'custom-team': 1}))
+
+        _, total, counts = self.facets(self.admin)
+        self.assertEqual(total, 8)
+        self.assertEqual(counts['status'], {'approved': 6, 'pending': 2})
+
+    def test_cached_until_a_prompt_changes(self):
+        self.facets(self.reader)
+        queries, total, _ = self.facets(self.reader)
+        self.assertEqual((queries, total), (0, 5))
+
+        added, = make_prompts(self.author, 1, category='finance')
+        added.save()  # bulk_create sends no signals
+        _, total, counts = self.facets(self.reader)
+        self.assertEqual((total, counts['category']['finance']), (6, 3))
+
+    def test_null_buckets_are_counted_apart_from_the_total(self):
+        make_prompts(self.author, 2, task_type=None, output_format=None)
+        _, total, counts = self.facets(self.reader)
+        self.assertEqual(total, 7)
+        self.assertEqual(counts['task_type'], {'research': 5, None: 2})
+        self.assertEqual(counts['output_format'], {'text': 3, 'code': 2, None: 2})
+        self.assertEqual(counts['category'], {'engineering': 5, 'finance': 2})
+
+    def test_categories_endpoint_still_lists_own_custom_categories(self):
+        self.client.force_authenticate(self.reader)
+        categories = self.client.get('/api/categories/').data
+        self.assertIn('custom-team', categories)
+        self.assertIn('marketing', categories)
+        self.assertEqual(categories, sorted(categories))
+
+
+class BulkModerationTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.author = User.objects.create_user('author', password='x')
+        self.client.force_authenticate(self.admin)
+
+    def test_approve_reports_outcomes_per_id(self):
+        pending = make_prompts(self.author, 30, status='pending')
+        approved, = make_prompts(self.author, 1)
+        ids = [p.pk for p in pending] + [approved.pk, 999999]
+        version = listing_cache.current_version()
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post('/api/prompts/moderate/', {'action': 'approve', 'ids': ids}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertLessEqual(len(ctx), 5)
+        self.assertEqual(res.data, {
+            'status': 'approved',
+            'updated': sorted(p.pk for p in pending),
+            'unchanged': [approved.pk],
+            'not_found': [999999],
+        })
+        self.assertEqual(Prompt.objects.filter(status='approved').count(), 31)
+        self.assertGreater(listing_cache.current_version(), version)
+
+    def test_reject_snapshots_approved_prompts_and_logs_tombstones(self):
+        approved = make_prompts(self.author, 3)
+        pending, = make_prompts(self.author, 1, status='pending')
+        ids = [p.pk for p in approved] + [pending.pk]
+        res = self.client.post('/api/prompts/moderate/', {'action': 'reject', 'ids': ids}, format='json')
+        self.assertEqual(res.data['updated'], sorted(ids))
+        self.assertEqual(
+            sorted(PromptChange.objects.filter(action='hidden').values_list('prompt_id', flat=True)),
+            sorted(p.pk for p in approved),
+        )
+        versions = list(PromptVersion.objects.order_by('prompt_id'))
+        self.assertEqual([v.prompt_id for v in versions], sorted(p.pk for p in approved))
+        self.assertTrue(all(v.edited_by_id == self.admin.pk for v in versions))
+        versioning.load_texts(versions)
+        self.assertEqual(versions[0].prompt_text, 'text 0')
+
+        # Nothing left to move the second time round.
+        res = self.client.post('/api/prompts/moderate/', {'action': 'reject', 'ids': ids}, format='json')
+        self.assertEqual(res.data['updated'], [])
+        self.assertEqual(PromptVersion.objects.count(), 3)
+
+    def test_rejects_bad_requests(self):
+        url = '/api/prompts/moderate/'
+        self.assertEqual(self.client.post(url, {'action': 'delete', 'ids': [1]}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'action': 'approve', 'ids': []}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'action': 'approve', 'ids': ['1']}, format='json').status_code, 400)
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.client.post(url, {'action': 'approve', 'ids': [1]}, format='json').status_code, 403)
+
+
+class ImportPromptsTests(APITestCase):
+    def setUp(self):
+        self.snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshot_dir)
+        overrides = override_settings(CATALOG_SNAPSHOT_DIR=self.snapshot_dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.owner = User.objects.create_superuser('owner', password='x')
+
+    def write_csv(self, rows):
+        path = f'{self.snapshot_dir}/prompts.csv'
+        with open(path, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(['Title', 'prompt_text', 'category', 'task_type', 'output_format  '])
+            writer.writerows(rows)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_prompts', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_is_idempotent_and_creates_versions(self):
+        path = self.write_csv([
+            ['Summary', 'Summarize this', 'communication', 'Summarize / Review', 'text '],
+            ['Plan', 'Plan that', 'engineering', 'plan & organize', 'template'],
+            ['Plan', 'Plan that', 'engineering', 'plan_organize', 'template_framework'],
+            ['Broken', 'x', 'engineering', 'dance', 'text'],
+            ['', 'no title', 'engineering', 'ideate', 'text'],
+            ['No format', 'x', 'engineering', 'ideate', ''],
+        ])
+        out, err = self.run_import(path, '--batch-size', '2')
+        self.assertIn('2 created', out)
+        self.assertIn("Row 5: unknown task_type 'dance'", err)
+        self.assertIn('Row 6: title is required', err)
+        self.assertIn('Row 7: output_format is required', err)
+        plan = Prompt.objects.get(title='Plan')
+        self.assertEqual((plan.task_type, plan.output_format, plan.status), ('plan_organize', 'template_framework', 'approved'))
+        self.assertEqual(PromptVersion.objects.count(), 2)
+        version, = versioning.load_texts([plan.versions.get()])
+        self.assertEqual(version.prompt_text, 'Plan that')
+
+        out, _ = self.run_import(path, '--workers', '2')
+        self.assertIn('0 created, 3 already present, 3 invalid', out)
+        self.assertEqual(Prompt.objects.count(), 2)
+
+    def test_imported_prompts_reach_the_typeahead_index(self):
+        typeahead.reset_index()
+        self.addCleanup(typeahead.reset_index)
+        index = typeahead.get_index()
+        version = listing_cache.current_version(typeahead.VERSION_KEY)
+        path = self.write_csv([['Quarterly forecast', 'Forecast this', 'finance', 'research', 'text']])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run_import(path)
+        self.assertEqual([c['text'] for c in index.lookup('quarterly')], ['Quarterly forecast'])
+        # Other processes are told to rebuild theirs.
+        self.assertEqual(listing_cache.current_version(typeahead.VERSION_KEY), version + 1)
+
+        with mock.patch.object(typeahead, 'RELOAD_CHECK_SECONDS', 0):
+            self.assertIsNot(typeahead.get_index(), index)
+
+    def test_prompts_imported_before_hashing_are_backfilled(self):
+        backfill = importlib.import_module('api.migrations.0014_prompt_source_hash').backfill_source_hash
+        # As the old import script stored them: raw cells, labels for choices.
+        for _ in range(2):
+            Prompt.objects.create(
+                user=self.owner, title=' Summary', prompt_text='Summarize this ', category='communication',
+                task_type='Summarize / Review', output_format='text', status='approved',
+            )
+        backfill(django_apps, None)
+        self.assertEqual(Prompt.objects.exclude(source_hash=None).count(), 1)
+
+        path = self.write_csv([['Summary', 'Summarize this', 'communication', 'summarize', 'Text']])
+        out, _ = self.run_import(path)
+        self.assertIn('0 created, 1 already present', out)
+
+    def test_jsonl_and_errors(self):
+        path = f'{self.snapshot_dir}/prompts.jsonl'
+        with open(path, 'w') as handle:
+            handle.write(json.dumps({'title': 'A', 'prompt_text': 'a', 'category': 'hr', 'task_type': 'ideate', 'output_format': 'Code', 'description': 'd'}) + '\n')
+            handle.write('not json\n')
+        out, err = self.run_import(path, '--status', 'pending', '--private')
+        self.assertIn('1 created', out)
+        self.assertIn('Row 2: invalid JSON', err)
+        prompt = Prompt.objects.get()
+        self.assertEqual((prompt.prompt_description, prompt.status, prompt.is_public), ('d', 'pending', False))
+        with self.assertRaises(CommandError):
+            self.run_import(f'{self.snapshot_dir}/prompts.txt')
+
+
+class PurgePromptsTests(APITestCase):
+    def setUp(self):
+        self.snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshot_dir)
+        overrides = override_settings(CATALOG_SNAPSHOT_DIR=self.snapshot_dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.author = User.objects.create_user('author', password='x')
+        self.reader = User.objects.create_user('reader', password='x')
+        self.public = make_prompts(self.author, 3)
+        self.pending = make_prompts(self.author, 2, status='pending', category='hr')
+        for prompt in self.public + self.pending:
+            Vote.objects.create(user=self.reader, prompt=prompt, value=1)
+            Bookmark.objects.create(user=self.reader, prompt=prompt)
+            CopiedPromptFeedback.objects.create(user=self.reader, prompt=prompt, status='done')
+            versioning.record_version(prompt, edited_by=self.author)
+
+    def purge(self, *args):
+        out = io.StringIO()
+        call_command('purge_prompts', *args, '--noinput', '--pause', '0', stdout=out)
+        return out.getvalue()
+
+    def test_filtered_purge_removes_prompts_and_dependents(self):
+        out = self.purge('--status', 'pending', '--category', 'hr', '--chunk-size', '1')
+        self.assertIn('Purged 2 prompts', out)
+        self.assertEqual(set(Prompt.objects.values_list('pk', flat=True)), {p.pk for p in self.public})
+        for model in (Vote, Bookmark, CopiedPromptFeedback, PromptVersion):
+            self.assertEqual(model.objects.count(), 3)
+        # Pending prompts were never in the catalog, so no tombstones.
+        self.assertFalse(PromptChange.objects.exists())
+
+    def test_purged_titles_leave_the_typeahead_index(self):
+        typeahead.reset_index()
+        self.addCleanup(typeahead.reset_index)
+        Prompt.objects.filter(pk=self.public[0].pk).update(title='Churn analysis')
+        index = typeahead.get_index()
+        version = listing_cache.current_version(typeahead.VERSION_KEY)
+        self.assertEqual(len(index.lookup('churn')), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.purge('--author', 'author', '--chunk-size', '2')
+        self.assertEqual(index.lookup('churn'), [])
+        self.assertEqual(index.lookup('prompt'), [])
+        self.assertEqual(listing_cache.current_version(typeahead.VERSION_KEY), version + 1)
+
+    def test_dry_run_only_counts(self):
+        out = self.purge('--author', 'author', '--dry-run')
+        self.assertIn('api_prompt: 5', out)
+        self.assertIn('api_vote: 5 deleted', out)
+        self.assertEqual(Prompt.objects.count(), 5)
+
+    def test_full_purge_leaves_tombstones_and_prunes_old_ones(self):
+        PromptChange.objects.create(prompt_id=1, action='deleted', changed_at=timezone.now() - timedelta(days=60))
+        for args in (['--all'], ['--all', '--truncate']):
+            self.purge(*args)
+            self.assertFalse(Prompt.objects.exists())
+            self.assertFalse(Vote.objects.exists())
+            self.assertFalse(PromptVersion.objects.exists())
+            make_prompts(self.author, 1)
+        self.assertEqual(PromptChange.objects.count(), 4)
+
+    def test_requires_a_selection(self):
+        with self.assertRaises(CommandError):
+            self.purge()
+        with self.assertRaises(CommandError):
+            self.purge('--status', 'pending', '--truncate')
+        with self.assertRaises(CommandError):
+            self.purge('--author', 'nobody')
+
+
+class RatingStatsTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='x')
+        self.prompts = make_prompts(self.author, 3)
+
+    def rate(self, prompt, rating, username=None):
+        user = User.objects.create_user(username or f'rater{User.objects.count()}', password='x')
+        self.client.force_authenticate(user)
+        self.client.post('/api/copy/', {'prompt_id': prompt.pk})
+        return self.client.post('/api/copy/submit/', {'prompt_id': prompt.pk, 'status': 'submitted', 'rating': rating})
+
+    def test_submitted_ratings_update_stats_and_prompt(self):
+        first = self.prompts[0]
+        for rating in (5, 4, 4):
+            self.assertEqual(self.rate(first, rating).status_code, 200)
+        self.client.post('/api/copy/', {'prompt_id': first.pk})
+        self.client.post('/api/copy/submit/', {'prompt_id': first.pk, 'status': 'skipped'})
+
+        stats = PromptRatingStats.objects.get(prompt=first)
+        self.assertEqual((stats.rating_count, stats.rating_sum), (3, 13))
+        self.assertEqual(stats.histogram, {1: 0, 2: 0, 3: 0, 4: 2, 5: 1})
+        first.refresh_from_db()
+        self.assertEqual(first.rating_count, 3)
+        self.assertAlmostEqual(first.rating_average, 13 / 3)
+
+    def test_double_submit_counts_once(self):
+        self.rate(self.prompts[0], 5, username='twice')
+        again = self.client.post('/api/copy/submit/', {'prompt_id': self.prompts[0].pk, 'status': 'submitted', 'rating': 1})
+        self.assertEqual(again.status_code, 404)
+        self.assertEqual(PromptRatingStats.objects.get(prompt=self.prompts[0]).rating_count, 1)
+
+    def test_out_of_range_rating_is_rejected(self):
+        self.assertEqual(self.rate(self.prompts[0], 9).status_code, 400)
+        self.assertFalse(PromptRatingStats.objects.exists())
+
+    def test_list_exposes_and_sorts_by_rating(self):
+        low, high, unrated = self.prompts
+        self.rate(low, 2)
+        self.rate(high, 5)
+        self.rate(high, 4)
+        self.client.force_authenticate(self.author)
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get('/api/prompts/?ordering=rating').data
+        self.assertEqual(len(ctx), 1)
+        self.assertEqual([row['id'] for row in data], [high.pk, low.pk, unrated.pk])
+        self.assertEqual((data[0]['rating_count'], data[0]['rating_average']), (2, 4.5))
+
+        ids, res = [], self.client.get('/api/prompts/?ordering=rating&limit=1&cursor=')
+        while True:
+            ids += [row['id'] for row in res.data['results']]
+            if not res.data['next']:
+                break
+            res = self.client.get(f"/api/prompts/?ordering=rating&limit=1&cursor={res.data['next']}")
+        self.assertEqual(ids, [high.pk, low.pk, unrated.pk])
+        self.assertEqual(self.client.get('/api/prompts/?ordering=nonsense').status_code, 400)
+
+    def test_rebuild_matches_incremental_stats(self):
+        # The command rebuilds the catalog snapshot too.
+        snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, snapshot_dir)
+        overrides = override_settings(CATALOG_SNAPSHOT_DIR=snapshot_dir, CATALOG_SNAPSHOT_BACKGROUND=False)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.rate(self.prompts[0], 3)
+        self.rate(self.prompts[1], 5)
+        # Feedback removed behind the endpoint's back leaves stale stats.
+        CopiedPromptFeedback.objects.filter(prompt=self.prompts[1]).delete()
+        call_command('rebuild_rating_stats', stdout=io.StringIO())
+
+        self.assertEqual(list(PromptRatingStats.objects.values_list('prompt_id', 'rating_count', 'stars_3')), [
+            (self.prompts[0].pk, 1, 1),
+        ])
+        counts = dict(Prompt.objects.values_list('pk', 'rating_count'))
+        self.assertEqual(counts, {self.prompts[0].pk: 1, self.prompts[1].pk: 0, self.prompts[2].pk: 0})
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=24)
+class TrendingTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='x')
+        self.client.force_authenticate(self.author)
+        self.old, self.new, self.idle = make_prompts(self.author, 3)
+        trending.rebuild()
+        self.start = timezone.now()
+
+    def copies(self, prompt, count):
+        Prompt.objects.filter(pk=prompt.pk).update(copy_count=F('copy_count') + count)
+
+    def score(self, prompt):
+        return Prompt.objects.values_list('trending_score', flat=True).get(pk=prompt.pk)
+
+    def test_activity_decays_with_the_half_life(self):
+        self.copies(self.old, 8)
+        self.assertEqual(trending.update(now=self.start), 1)
+        self.copies(self.new, 1)
+        # Three half-lives later one copy weighs as much as the eight before.
+        self.assertEqual(trending.update(now=self.start + timedelta(hours=72)), 1)
+        self.assertAlmostEqual(self.score(self.old), self.score(self.new), places=9)
+        self.assertEqual(self.score(self.idle), 0)
+
+        self.copies(self.old, 1)
+        trending.update(now=self.start + timedelta(hours=72))
+        self.assertGreater(self.score(self.old), self.score(self.new))
+
+    def test_quiet_prompts_are_not_rewritten(self):
+        self.copies(self.old, 3)
+        trending.update(now=self.start)
+        Vote.objects.create(user=self.author, prompt=self.new, value=Vote.VOTE_DOWN)
+        Prompt.objects.filter(pk=self.new.pk).update(dislike_count=1, vote=-1)
+        self.assertEqual(trending.update(now=self.start + timedelta(hours=1)), 0)
+
+    def test_rebuild_scores_dated_likes_and_checkpoints_copies(self):
+        Vote.objects.create(user=self.author, prompt=self.new, value=Vote.VOTE_UP)
+        Prompt.objects.filter(pk=self.new.pk).update(like_count=1, vote=1)
+        self.copies(self.old, 50)
+        self.assertEqual(trending.rebuild(), 1)
+        self.assertEqual(trending.update(), 0)
+        self.assertGreater(self.score(self.new), 0)
+        self.assertEqual(self.score(self.old), 0)
+
+    def test_ordering_and_cursor_walk(self):
+        self.copies(self.old, 1)
+        self.copies(self.new, 5)
+        call_command('update_trending', stdout=io.StringIO())
+        expected = [self.new.pk, self.old.pk, self.idle.pk]
+        self.assertEqual([row['id'] for row in self.client.get('/api/prompts/?ordering=trending').data], expected)
+
+        ids, res = [], self.client.get('/api/prompts/?ordering=trending&limit=2&cursor=')
+        while True:
+            ids += [row['id'] for row in res.data['results']]
+            if not res.data['next']:
+                break
+            res = self.client.get(f"/api/prompts/?ordering=trending&limit=2&cursor={res.data['next']}")
+        self.assertEqual(ids, expected)
+
+
+@override_settings(USAGE_BUFFER_FLUSH_SECONDS=0, COPY_BUFFER_FLUSH_SECONDS=0)
+class UsageLogTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='x')
+        self.client.force_authenticate(self.author)
+        self.prompt, self.other = make_prompts(self.author, 2)
+
+    def event(self, prompt, kind, days_ago, value=0, hour=12):
+        at = timezone.now().replace(hour=hour, minute=0, second=0, microsecond=0) - timedelta(days=days_ago)
+        return UsageEvent(prompt_id=prompt.pk, user_id=self.author.pk, kind=kind, value=value, occurred_at=at)
+
+    def test_endpoints_append_events(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/copy/', {'prompt_id': self.prompt.pk})
+            self.client.post(f'/api/prompts/{self.prompt.pk}/upvote/')
+            self.client.post(f'/api/prompts/{self.prompt.pk}/bookmark/')
+            self.client.post('/api/copy/submit/', {'prompt_id': self.prompt.pk, 'status': 'submitted', 'rating': 4})
+        self.assertEqual(
+            list(UsageEvent.objects.order_by('pk').values_list('kind', 'value')),
+            [('copy', 0), ('vote', 1), ('bookmark', 1), ('feedback', 4)],
+        )
+
+    @override_settings(USAGE_BUFFER_FLUSH_SECONDS=3600, USAGE_BUFFER_MAX_PENDING=10_000)
+    def test_events_are_buffered_and_written_in_one_batch(self):
+        usage.flush()
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                usage.record(UsageEvent.KIND_COPY, self.prompt.pk, self.author.pk)
+        self.assertFalse(UsageEvent.objects.exists())
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(usage.flush(), 3)
+        self.assertEqual(sum(q['sql'].startswith('INSERT') for q in ctx.captured_queries), 1)
+        self.assertEqual(UsageEvent.objects.count(), 3)
+
+    def test_rollup_is_idempotent_and_prunes_after_retention(self):
+        # A day rolled up long ago whose raw events are past retention.
+        old_day = timezone.localdate() - timedelta(days=200)
+        PromptDailyStats.objects.create(prompt=self.prompt, day=old_day, copies=7)
+        UsageEvent.objects.bulk_create([
+            self.event(self.prompt, 'copy', 1), self.event(self.prompt, 'copy', 1),
+            self.event(self.prompt, 'vote', 1, value=-1), self.event(self.prompt, 'feedback', 0, value=5),
+            self.event(self.prompt, 'feedback', 0, value=0), self.event(self.other, 'bookmark', 0, value=1),
+            self.event(self.prompt, 'copy', 200),
+        ])
+        for _ in range(2):
+            call_command('rollup_usage', '--since', str(old_day), stdout=io.StringIO())
+        rows = {
+            (row.prompt_id, (timezone.localdate() - row.day).days): (row.copies, row.downvotes, row.ratings, row.rating_sum, row.bookmarks)
+            for row in PromptDailyStats.objects.all()
+        }
+        self.assertEqual(rows, {
+            (self.prompt.pk, 200): (7, 0, 0, 0, 0),
+            (self.prompt.pk, 1): (2, 1, 0, 0, 0),
+            (self.prompt.pk, 0): (0, 0, 1, 5, 0),
+            (self.other.pk, 0): (0, 0, 0, 0, 1),
+        })
+        # Only the raw event past USAGE_EVENT_RETENTION_DAYS went.
+        self.assertEqual(UsageEvent.objects.count(), 6)
+
+        # Later runs redo the last rolled-up days only.
+        UsageEvent.objects.bulk_create([self.event(self.prompt, 'copy', 0)])
+        call_command('rollup_usage', stdout=io.StringIO())
+        self.assertEqual(PromptDailyStats.objects.get(prompt=self.prompt, day=timezone.localdate()).copies, 1)
+        self.assertEqual(PromptDailyStats.objects.count(), 4)
+
+    def test_rollup_catches_up_after_missing_the_retention_period(self):
+        retention = settings.USAGE_EVENT_RETENTION_DAYS
+        last_day = timezone.localdate() - timedelta(days=retention + 30)
+        PromptDailyStats.objects.create(prompt=self.prompt, day=last_day, copies=7)
+        UsageEvent.objects.bulk_create([
+            self.event(self.prompt, 'copy', retention + 20), self.event(self.prompt, 'copy', retention + 20),
+            self.event(self.other, 'copy', retention + 5), self.event(self.prompt, 'copy', 1),
+        ])
+        call_command('rollup_usage', stdout=io.StringIO())
+        rows = {
+            (row.prompt_id, (timezone.localdate() - row.day).days): row.copies
+            for row in PromptDailyStats.objects.all()
+        }
+        self.assertEqual(rows, {
+            (self.prompt.pk, retention + 30): 7,
+            (self.prompt.pk, retention + 20): 2,
+            (self.other.pk, retention + 5): 1,
+            (self.prompt.pk, 1): 1,
+        })
+        # Pruned only once rolled up.
+        self.assertEqual(UsageEvent.objects.count(), 1)
+
+    def test_stats_endpoint_reads_the_rollup_only(self):
+        today = timezone.localdate()
+        PromptDailyStats.objects.create(prompt=self.prompt, day=today - timedelta(days=1), copies=3, upvotes=1)
+        PromptDailyStats.objects.create(prompt=self.prompt, day=today - timedelta(days=40), copies=9)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(f'/api/prompts/{self.prompt.pk}/stats/')
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(any(UsageEvent._meta.db_table in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(len(res.data['days']), 30)
+        self.assertEqual(res.data['days'][-2]['copies'], 3)
+        self.assertEqual(res.data['totals']['copies'], 3)
+
+        start = (today - timedelta(days=40)).isoformat()
+        res = self.client.get(f'/api/prompts/{self.prompt.pk}/stats/?from={start}&to={start}')
+        self.assertEqual(res.data['days'], [{
+            'day': start, 'copies': 9, 'upvotes': 0, 'downvotes': 0, 'bookmarks': 0, 'ratings': 0, 'rating_sum': 0,
+        }])
+        self.assertEqual(self.client.get(f'/api/prompts/{self.prompt.pk}/stats/?from=2026-13-01').status_code, 400)
+        for query in ('from=abc', 'to=abc', 'from=2026-01-01&to=tomorrow'):
+            self.assertEqual(self.client.get(f'/api/prompts/{self.prompt.pk}/stats/?{query}').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/prompts/{self.prompt.pk}/stats/?from=2020-01-01').status_code, 400)
+
+
+class SimilarPromptsTests(APITestCase):
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.index_dir)
+        overrides = override_settings(SIMILAR_INDEX_DIR=self.index_dir, SIMILAR_INDEX_RELOAD_SECONDS=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        # Drop whatever index an earlier test left this process holding.
+        handle = mock.patch.object(similar, '_index', None)
+        handle.start()
+        self.addCleanup(handle.stop)
+
+        self.author = User.objects.create_user('author', password='x')
+        self.client.force_authenticate(self.author)
+        texts = {
+            'summary': ('Summarize meeting notes', 'Turn raw meeting notes into a summary'),
+            'minutes': ('Meeting minutes summary', 'Summarize the notes of a meeting'),
+            'standup': ('Standup meeting recap', 'Recap the meeting for the team'),
+            'sql': ('Optimize a SQL query', 'Rewrite a slow SQL query'),
+            'schema': ('Review a SQL schema', 'Review tables and indexes of a schema'),
+        }
+        self.prompts = {}
+        for key, (title, text) in texts.items():
+            self.prompts[key] = Prompt.objects.create(
+                user=self.author, title=title, prompt_text=text, category='engineering',
+                task_type='research', output_format='text', status='approved', is_public=True,
+            )
+        self.hidden = Prompt.objects.create(
+            user=self.author, title='Summarize meeting notes (draft)',
+            prompt_text='Turn raw meeting notes into a summary', status='pending', is_public=True,
+        )
+        # Older than the overlap an incremental build re-reads.
+        Prompt.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+
+    def similar(self, prompt, **params):
+        res = self.client.get(f'/api/prompts/{prompt.pk}/similar/', params)
+        self.assertEqual(res.status_code, 200)
+        return [(row['id'], row['similarity']) for row in res.data['results']]
+
+    def test_unavailable_until_an_index_is_built(self):
+        res = self.client.get(f'/api/prompts/{self.prompts["summary"].pk}/similar/')
+        self.assertEqual(res.status_code, 503)
+        self.assertIsNone(similar.read_manifest())
+
+        call_command('build_similar_index', stdout=io.StringIO())
+        self.assertEqual(self.similar(self.prompts['summary'])[0][0], self.prompts['minutes'].pk)
+
+    def test_ranks_public_prompts_by_cosine(self):
+        similar.build()
+        results = self.similar(self.prompts['summary'])
+        ids = [pk for pk, _ in results]
+        self.assertEqual(ids[:2], [self.prompts['minutes'].pk, self.prompts['standup'].pk])
+        self.assertNotIn(self.prompts['summary'].pk, ids)
+        self.assertNotIn(self.hidden.pk, ids)
+        self.assertNotIn(self.prompts['schema'].pk, ids)
+        self.assertTrue(all(0 < score <= 1 for _, score in results))
+        self.assertEqual([score for _, score in results], sorted((score for _, score in results), reverse=True))
+        self.assertEqual(len(self.similar(self.prompts['summary'], limit=1)), 1)
+
+        # Not in the index: vectorized on the spot.
+        self.assertEqual(self.similar(self.hidden)[0][0], self.prompts['summary'].pk)
+
+    def test_index_is_memory_mapped_and_shared_by_version(self):
+        manifest = similar.build()
+        index = similar.get_index()
+        self.assertEqual(index.version, manifest['version'])
+        self.assertIsInstance(index.ids, np.memmap)
+        # scipy wraps the mapped arrays without copying them.
+        for values in (index.matrix.data, index.matrix.indices, index.postings.indptr):
+            while isinstance(values, np.ndarray):
+                values = values.base
+            self.assertIsInstance(values, mmap.mmap)
+        self.assertIs(similar.get_index(), index)
+
+        batch = index.search(index.matrix[[0, 1]], 2, [0, 1])
+        self.assertEqual(batch[0], index.similar(self.prompts['summary'], 2))
+
+        similar.build()
+        self.assertEqual(similar.get_index().version, manifest['version'] + 1)
+
+    def test_incremental_build(self):
+        first = similar.build()
+        self.assertEqual(similar.build(incremental=True)['version'], first['version'])
+
+        sql = self.prompts['sql']
+        sql.title, sql.prompt_text = 'Summarize meeting notes quickly', 'Meeting notes summary'
+        sql.save()
+        Prompt.objects.filter(pk=self.prompts['minutes'].pk).update(is_public=False)
+        Prompt.objects.filter(pk=self.hidden.pk).update(status='approved')
+
+        manifest = similar.build(incremental=True)
+        self.assertEqual((manifest['mode'], manifest['terms']), ('incremental', first['terms']))
+        ids = [pk for pk, _ in self.similar(self.prompts['summary'])]
+        self.assertNotIn(self.prompts['minutes'].pk, ids)
+        self.assertEqual(set(ids[:2]), {sql.pk, self.hidden.pk})
+
+        call_command('build_similar_index', stdout=io.StringIO())
+        self.assertEqual(similar.read_manifest()['mode'], 'full')
+        self.assertEqual(len(list(Path(self.index_dir).glob('index-*'))), similar.KEEP_VERSIONS)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('author', password='x')
+        self.admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.public = make_prompts(self.author, 3)
+        make_prompts(self.author, 2, status='pending', category='hr')
+        self.client.force_authenticate(self.author)
+
+    def fetch(self, **params):
+        res = self.client.get('/api/prompts/export/', params, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(res.status_code, 200)
+        body = b''.join(res.streaming_content)
+        if res.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return res, body
+
+    def test_prompts_follow_list_filters(self):
+        res, body = self.fetch()
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(sorted(row['id'] for row in rows), sorted(p.pk for p in self.public))
+        self.assertEqual(rows[0]['author'], 'author')
+
+        self.client.force_authenticate(self.admin)
+        _, body = self.fetch(**{'as': 'csv', 'category': 'hr'})
+        rows = list(csv.DictReader(io.StringIO(body.decode('utf-8-sig'))))
+        self.assertEqual([row['status'] for row in rows], ['pending', 'pending'])
+
+    def test_xlsx_reimports(self):
+        res, body = self.fetch(**{'as': 'xlsx'})
+        self.assertNotIn('Content-Encoding', res)
+        path = f'{tempfile.mkdtemp()}/export.xlsx'
+        self.addCleanup(shutil.rmtree, path.rsplit('/', 1)[0])
+        with open(path, 'wb') as handle:
+            handle.write(body)
+        valid, errors = importer.clean_batch(list(importer.read_rows(path)))
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(snapshot['title'] for snapshot, _ in valid), ['Prompt 0', 'Prompt 1', 'Prompt 2'])
+
+    def test_versions_and_feedback_are_staff_only(self):
+        prompt = self.public[0]
+        texts = [f'line {n}\nshared\n' for n in range(versioning.KEYFRAME_INTERVAL + 3)]
+        for text in texts:
+            prompt.prompt_text = text
+            versioning.record_version(prompt, edited_by=self.admin)
+        CopiedPromptFeedback.objects.create(user=self.admin, prompt=prompt, status='done', rating=4)
+        res = self.client.get('/api/prompts/export/', {'dataset': 'versions'})
+        self.assertEqual(res.status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        _, body = self.fetch(dataset='versions')
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([row['prompt_text'] for row in rows], texts)
+        _, body = self.fetch(dataset='feedback', **{'as': 'csv'})
+        rows = list(csv.DictReader(io.StringIO(body.decode('utf-8-sig'))))
+        self.assertEqual((rows[0]['prompt_title'], rows[0]['rating']), ('Prompt 0', '4'))
+
+    def test_command_writes_gzip(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = f'{directory}/prompts.csv.gz'
+        call_command('export_prompts', '--format', 'csv', '--gzip', '--public', '-o', path, stderr=io.StringIO())
+        with gzip.open(path, 'rt', encoding='utf-8-sig') as handle:
+            rows = list(csv.DictReader(handle))
+        self.assertEqual(len(rows), 3)
+
+
+class PromptVersionStorageTests(APITestCase):
+    def setUp(self):
+        # Staff edits of a private prompt stay approved, so every save snapshots.
+        self.author = User.objects.create_user('author', password='x', is_staff=True)
+        self.client.force_authenticate(self.author)
+        self.prompt, = make_prompts(self.author, 1, is_public=False)
+
+    def edit(self, **changes):
+        data = {
+            'title': self.prompt.title, 'prompt_text': self.prompt.prompt_text, 'category': 'engineering',
+            'task_type': 'research', 'output_format': 'text', 'is_public': False,
+        }
+        data.update(changes)
+        res = self.client.put(f'/api/prompts/{self.prompt.pk}/', data, format='json')
+        self.assertEqual(res.status_code, 200, res.data)
+        self.prompt.refresh_from_db()
+
+    def test_unchanged_saves_add_no_versions(self):
+        self.edit(prompt_text='first\nsecond\n')
+        self.edit(prompt_text='first\nsecond\n')
+        self.edit(prompt_text='first\nsecond\n')
+        # The original snapshot, then the edited text once.
+        self.assertEqual(self.prompt.versions.count(), 2)
+
+    def test_history_and_revert_rebuild_full_texts(self):
+        texts = ['\n'.join(f'line {i} of {n}' if i == n % 30 else f'line {i}' for i in range(30)) for n in range(40)]
+        for text in texts:
+            self.edit(prompt_text=text, guidance=None if len(text) % 2 else 'tips')
+        versions = list(self.prompt.versions.order_by('pk'))
+        self.assertTrue(versions[versioning.KEYFRAME_INTERVAL].is_keyframe)
+        self.assertFalse(versions[1].is_keyframe)
+        self.assertLess(max(v.depth for v in versions), versioning.KEYFRAME_INTERVAL)
+
+        for index in (1, 15, 16, 17, 39):
+            res = self.client.get(f'/api/prompts/{self.prompt.pk}/history/{versions[index].pk}/diff/')
+            self.assertEqual(res.data['version']['prompt_text'], texts[index - 1])
+
+        target = versions[20]
+        res = self.client.post(f'/api/prompts/{self.prompt.pk}/revert/{target.pk}/')
+        self.assertEqual(res.status_code, 200)
+        self.prompt.refresh_from_db()
+        self.assertEqual(self.prompt.prompt_text, texts[19])
+
+    def test_history_is_paginated_metadata(self):
+        for n in range(5):
+            self.edit(title=f'Title {n}')
+        url = f'/api/prompts/{self.prompt.pk}/history/'
+        with CaptureQueriesContext(connection) as ctx:
+            first = self.client.get(url, {'limit': 4}).data
+        self.assertLessEqual(len(ctx), 2)
+        self.assertFalse(any('payload' in q['sql'] for q in ctx.captured_queries[1:]))
+        self.assertNotIn('prompt_text', first['results'][0])
+        self.assertEqual(first['results'][0]['edited_by_username'], 'author')
+        self.assertEqual(first['results'][0]['changed_fields'], ['title'])
+        second = self.client.get(url, {'limit': 4, 'cursor': first['next']}).data
+        self.assertIsNone(second['next'])
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(ids, list(self.prompt.versions.order_by('-pk').values_list('pk', flat=True)))
+
+    def test_history_diff(self):
+        self.edit(prompt_text='alpha\nbeta')
+        self.edit(prompt_text='alpha\ngamma')
+        self.edit(prompt_text='alpha\ndelta')
+        older, newer = self.prompt.versions.order_by('pk')[1:3]
+        url = f'/api/prompts/{self.prompt.pk}/history/{newer.pk}/diff/'
+
+        res = self.client.get(url)
+        self.assertEqual(res.data['against_version'], older.pk)
+        self.assertEqual(res.data['version']['prompt_text'], 'alpha\ngamma')
+        self.assertEqual(list(res.data['changes']), ['prompt_text'])
+        self.assertTrue(res.data['changes']['prompt_text'].endswith(' alpha\n-beta\n+gamma'))
+
+        res = self.client.get(url, {'against': 'current', 'mode': 'word'})
+        self.assertEqual(
+            res.data['changes']['prompt_text'], [['=', 'alpha\n'], ['-', 'gamma'], ['+', 'delta']]
+        )
+
+        # Served from the cache: only the prompt itself is read.
+        with CaptureQueriesContext(connection) as ctx:
+            again = self.client.get(url, {'against': 'current', 'mode': 'word'})
+        self.assertEqual(again.data, res.data)
+        self.assertEqual(len(ctx), 1)
+
+        self.assertEqual(self.client.get(url, {'mode': 'html'}).status_code, 400)
+        other = User.objects.create_user('other', password='x')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_deltas_round_trip(self):
+        base = {'prompt_description': None, 'prompt_text': 'a\nb\nc\n', 'guidance': 'g'}
+        new = {'prompt_description': 'd', 'prompt_text': 'a\nB\nc\nd', 'guidance': 'g'}
+        delta = versioning.encode_delta(base, new)
+        self.assertNotIn('guidance', delta)
+        self.assertEqual(versioning.apply_delta(base, versioning.unpack(versioning.pack(delta))), new)
@@ -0,0 +1,156 @@
+"""
+Time-decayed "trending" score (``?ordering=trending``).
+
+Every piece of activity on a prompt (a copy, a like, rating stars) counts
+with a weight that halves every TRENDING_HALF_LIFE_HOURS. Rather than decay
+every score on every run, Prompt.trending_score holds the sum measured
+against a fixed epoch, as a base-2 logarithm:
+
+    trending_score = log2(sum(weight * 2 ** (hours since EPOCH / half-life)))
+
+Scaling all scores by the same decay factor does not change their order, so
+the stored value sorts exactly like the decayed one, a prompt only needs a
+write when it gets new activity, and the catalog index on the column serves
+the ordering. The logarithm keeps the numbers finite however far from the
+epoch they get; 0 (the default) is below any real activity.
+
+Copies and likes are counters without timestamps, so ``manage.py
+update_trending`` compares them with TrendingCheckpoint, the values seen on
+its previous run, and scores the growth as happening now. Run it every few
+minutes. After changing the half-life, run it with ``--rebuild``, which
+rescores from timestamped history alone: likes, ratings, and the copies
+still in the raw usage log (api/usage.py).
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import CopiedPromptFeedback, Prompt, PromptRatingStats, TrendingCheckpoint, UsageEvent, Vote
+
+# Anything dated before this would score below a prompt with no activity.
+EPOCH = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+WEIGHT_COPY = 1.0
+WEIGHT_LIKE = 3.0
+WEIGHT_STAR = 0.5
+# Terms this many half-lives below the largest one are dropped; Postgres
+# raises on float underflow instead of returning 0.
+MIN_EXPONENT = -60
+
+
+def _exponent(moment):
+    return (moment - EPOCH).total_seconds() / 3600 / settings.TRENDING_HALF_LIFE_HOURS
+
+
+def _log_add(a, b):
+    """SQL for log2(2 ** a + 2 ** b)."""
+    return (
+        f'greatest({a}, {b}) + ln(1 + power(2::float8, '
+        f'greatest(least({a}, {b}) - greatest({a}, {b}), {MIN_EXPONENT}))) / ln(2)'
+    )
+
+
+def update(now=None):
+    """
+    Score the activity since the previous run as happening at ``now``.
+    Returns the number of prompts whose score moved.
+    """
+    now = now or timezone.now()
+    prompts = Prompt._meta.db_table
+    checkpoints = TrendingCheckpoint._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH seen AS (
+                SELECT p.id, p.copy_count, p.like_count, coalesce(s.rating_sum, 0) AS rating_sum,
+                       coalesce(c.copy_count, 0) AS seen_copies, coalesce(c.like_count, 0) AS seen_likes,
+                       coalesce(c.rating_sum, 0) AS seen_stars
+                FROM {prompts} p
+                LEFT JOIN {PromptRatingStats._meta.db_table} s ON s.prompt_id = p.id
+                LEFT JOIN {checkpoints} c ON c.prompt_id = p.id
+                WHERE c.prompt_id IS NULL OR p.copy_count <> c.copy_count OR p.like_count <> c.like_count
+                   OR coalesce(s.rating_sum, 0) <> c.rating_sum
+            ), activity AS (
+                -- Counters can also go down (unlikes); only growth counts.
+                SELECT id, %s * greatest(copy_count - seen_copies, 0)
+                         + %s * greatest(like_count - seen_likes, 0)
+                         + %s * greatest(rating_sum - seen_stars, 0) AS amount
+                FROM seen
+            ), scored AS (
+                UPDATE {prompts} p
+                SET trending_score = {_log_add('p.trending_score', 'a.score')}
+                FROM (SELECT id, ln(amount) / ln(2) + %s AS score FROM activity WHERE amount > 0) a
+                WHERE p.id = a.id
+                RETURNING p.id
+            ), saved AS (
+                INSERT INTO {checkpoints} (prompt_id, copy_count, like_count, rating_sum)
+                SELECT id, copy_count, like_count, rating_sum FROM seen
+                ON CONFLICT (prompt_id) DO UPDATE SET
+                    copy_count = EXCLUDED.copy_count,
+                    like_count = EXCLUDED.like_count,
+                    rating_sum = EXCLUDED.rating_sum
+            )
+            SELECT count(*) FROM scored
+            """,
+            [WEIGHT_COPY, WEIGHT_LIKE, WEIGHT_STAR, _exponent(now)],
+        )
+        return cursor.fetchone()[0]
+
+
+def rebuild(now=None):
+    """
+    Rescore every prompt from dated history: likes at their vote time,
+    ratings at their copy time and copies from the usage log. Older copies
+    carry no dates and are only checkpointed. Returns the number of prompts
+    with a score.
+    """
+    now = now or timezone.now()
+    prompts = Prompt._meta.db_table
+    checkpoints = TrendingCheckpoint._meta.db_table
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH events AS (
+                SELECT prompt_id, %s::float8 AS weight,
+                       extract(epoch FROM updated_at - %s) / %s AS x
+                FROM {Vote._meta.db_table} WHERE value = %s AND updated_at <= %s
+                UNION ALL
+                SELECT prompt_id, %s * rating, extract(epoch FROM created_at - %s) / %s
+                FROM {CopiedPromptFeedback._meta.db_table}
+                WHERE status = 'submitted' AND rating BETWEEN 1 AND 5 AND created_at <= %s
+                UNION ALL
+                SELECT prompt_id, %s, extract(epoch FROM occurred_at - %s) / %s
+                FROM {UsageEvent._meta.db_table} WHERE kind = %s AND occurred_at <= %s
+            ), peaks AS (
+                SELECT prompt_id, max(x) AS peak FROM events GROUP BY prompt_id
+            ), scores AS (
+                SELECT e.prompt_id, k.peak + ln(sum(e.weight * power(2::float8, greatest(e.x - k.peak, %s)))) / ln(2)
+                       AS score
+                FROM events e JOIN peaks k USING (prompt_id)
+                GROUP BY e.prompt_id, k.peak
+            )
+            UPDATE {prompts} p SET trending_score = coalesce(s.score, 0)
+            FROM {prompts} q LEFT JOIN scores s ON s.prompt_id = q.id
+            WHERE p.id = q.id AND p.trending_score IS DISTINCT FROM coalesce(s.score, 0)
+            """,
+            [
+                WEIGHT_LIKE, EPOCH, half_life, Vote.VOTE_UP, now,
+                WEIGHT_STAR, EPOCH, half_life, now,
+                WEIGHT_COPY, EPOCH, half_life, UsageEvent.KIND_COPY, now, MIN_EXPONENT,
+            ],
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {checkpoints} (prompt_id, copy_count, like_count, rating_sum)
+            SELECT p.id, p.copy_count, p.like_count, coalesce(s.rating_sum, 0)
+            FROM {prompts} p LEFT JOIN {PromptRatingStats._meta.db_table} s ON s.prompt_id = p.id
+            ON CONFLICT (prompt_id) DO UPDATE SET
+                copy_count = EXCLUDED.copy_count,
+                like_count = EXCLUDED.like_count,
+                rating_sum = EXCLUDED.rating_sum
+            """
+        )
+        cursor.execute(f'SELECT count(*) FROM {prompts} WHERE trending_score <> 0')
+        return cursor.fetchone()[0]
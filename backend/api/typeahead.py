@@ -0,0 +1,319 @@
+"""
+In-process prefix index for search-as-you-type.
+
+Completions come from approved public prompt titles plus the category and
+task type labels, ranked by copy_count (summed over prompts for categories
+and task types). Keys live in one sorted list searched with bisect; a title
+is indexed under its full text and under each of its first few words, so
+"budget" also completes "Quarterly budget review".
+
+Short prefixes match a large slice of the list, so their top-k is computed
+once and cached; writes patch the cached lists in place instead of dropping
+them. The index is built lazily on first use and kept current from Prompt
+signals (see api/signals.py). Bulk writes from other processes (the import
+and purge commands) call request_rebuild(), which bumps a version in the
+shared ``catalog`` cache; each worker notices within RELOAD_CHECK_SECONDS and
+rebuilds its index on the next lookup.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from . import listing_cache
+from .models import CATEGORY_CHOICES, TASK_TYPE_CHOICES, Prompt
+
+KIND_PROMPT = 'prompt'
+KIND_CATEGORY = 'category'
+KIND_TASK_TYPE = 'task_type'
+
+VERSION_KEY = 'typeahead:version'
+RELOAD_CHECK_SECONDS = 5
+
+MAX_KEY_LENGTH = 48
+MAX_WORDS_PER_TITLE = 4
+# Prefix ranges larger than this are answered from the cached top-k lists.
+SCAN_LIMIT = 128
+CACHED_TOP_K = 20
+
+
+def normalize(text):
+    return ' '.join((text or '').casefold().split())
+
+
+def title_keys(title):
+    words = normalize(title).split(' ')
+    keys = {' '.join(words[i:])[:MAX_KEY_LENGTH] for i in range(min(len(words), MAX_WORDS_PER_TITLE))}
+    keys.discard('')
+    return tuple(keys)
+
+
+class Completion:
+    __slots__ = ('text', 'kind', 'value', 'score', 'keys', 'category', 'task_type')
+
+    def __init__(self, text, kind, value, score, keys, category=None, task_type=None):
+        self.text = text
+        self.kind = kind
+        self.value = value
+        self.score = score
+        self.keys = keys
+        self.category = category
+        self.task_type = task_type
+
+    def as_dict(self):
+        return {'text': self.text, 'kind': self.kind, 'value': self.value, 'score': self.score}
+
+
+class TypeaheadIndex:
+    def __init__(self, max_prompts):
+        self.max_prompts = max_prompts
+        self._lock = threading.RLock()
+        self._keys = []      # sorted (key, entry_id)
+        self._entries = {}   # entry_id -> Completion
+        self._top = {}       # prefix -> entry ids, best first, at most CACHED_TOP_K
+        # Prompts use their pk as entry id; facets get negative ids so every
+        # (key, entry_id) pair stays comparable.
+        self._facet_ids = {}
+        self._prompt_count = 0
+
+    # --- Lookup ---
+
+    def lookup(self, prefix, limit=8):
+        prefix = normalize(prefix)[:MAX_KEY_LENGTH]
+        if not prefix:
+            return []
+        with self._lock:
+            top = self._top.get(prefix)
+            if top is None:
+                lo, hi = self._range(prefix)
+                if hi - lo <= SCAN_LIMIT and limit <= CACHED_TOP_K:
+                    top = self._best(self._keys[lo:hi], limit)
+                else:
+                    top = self._best(self._keys[lo:hi], max(limit, CACHED_TOP_K))
+                    self._top[prefix] = top
+            return [self._entries[entry_id].as_dict() for entry_id in top[:limit]]
+
+    def _range(self, prefix, lo=0, hi=None):
+        hi = len(self._keys) if hi is None else hi
+        start = bisect_left(self._keys, (prefix,), lo, hi)
+        return start, bisect_left(self._keys, (prefix + '\uffff',), start, hi)
+
+    def _warm(self):
+        """Rank every prefix too broad to scan, so no keystroke has to."""
+        keys = self._keys
+        stack = [('', 0, len(keys))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            if prefix:
+                self._top[prefix] = self._best(keys[lo:hi], CACHED_TOP_K)
+            depth = len(prefix)
+            i = lo
+            while i < hi:
+                key = keys[i][0]
+                if len(key) <= depth:
+                    i += 1
+                    continue
+                child = key[:depth + 1]
+                start, end = self._range(child, i, hi)
+                if end - start > SCAN_LIMIT:
+                    stack.append((child, start, end))
+                i = end
+
+    def _best(self, pairs, limit):
+        ids = {entry_id for _, entry_id in pairs}
+        return heapq.nlargest(limit, ids, key=self._rank)
+
+    def _rank(self, entry_id):
+        entry = self._entries[entry_id]
+        return (entry.score, entry.text)
+
+    # --- Maintenance ---
+
+    def _add(self, entry_id, entry):
+        self._entries[entry_id] = entry
+        for key in entry.keys:
+            insort(self._keys, (key, entry_id))
+        self._touch(entry_id, entry)
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return None
+        for key in entry.keys:
+            i = bisect_left(self._keys, (key, entry_id))
+            if i < len(self._keys) and self._keys[i] == (key, entry_id):
+                del self._keys[i]
+            for prefix in self._cached_prefixes(key):
+                if entry_id in self._top[prefix]:
+                    # Whatever ranked just below it is unknown; rebuild lazily.
+                    del self._top[prefix]
+        return entry
+
+    def _cached_prefixes(self, key):
+        top = self._top
+        return [key[:i] for i in range(1, len(key) + 1) if key[:i] in top]
+
+    def _touch(self, entry_id, entry, score_dropped=False):
+        """Fold an added or re-scored entry into the cached top-k lists."""
+        rank = self._rank(entry_id)
+        for key in entry.keys:
+            for prefix in self._cached_prefixes(key):
+                top = self._top[prefix]
+                if entry_id in top:
+                    if score_dropped:
+                        del self._top[prefix]
+                        continue
+                    top.remove(entry_id)
+                elif len(top) >= CACHED_TOP_K and rank <= self._rank(top[-1]):
+                    continue
+                # Lists are short, so a linear insert is cheaper than bisect with a key.
+                i = 0
+                while i < len(top) and self._rank(top[i]) > rank:
+                    i += 1
+                top.insert(i, entry_id)
+                del top[CACHED_TOP_K:]
+
+    def _rescore(self, entry_id, delta):
+        entry = self._entries.get(entry_id)
+        if entry is None or not delta:
+            return
+        entry.score += delta
+        self._touch(entry_id, entry, score_dropped=delta < 0)
+
+    def _rescore_facets(self, category, task_type, delta):
+        for facet in ((KIND_CATEGORY, category), (KIND_TASK_TYPE, task_type)):
+            facet_id = self._facet_ids.get(facet)
+            if facet_id is not None:
+                self._rescore(facet_id, delta)
+
+    def load(self, prompts):
+        """Replace the index contents. ``prompts`` yields (id, title, category, task_type, copy_count)."""
+        with self._lock:
+            self._keys, self._entries, self._top, self._prompt_count = [], {}, {}, 0
+            self._facet_ids = {}
+            facets = {}
+            for kind, choices in ((KIND_CATEGORY, CATEGORY_CHOICES), (KIND_TASK_TYPE, TASK_TYPE_CHOICES)):
+                for value, label in choices:
+                    keys = tuple({normalize(label)[:MAX_KEY_LENGTH], normalize(value.replace('_', ' '))[:MAX_KEY_LENGTH]})
+                    facet_id = -(len(self._facet_ids) + 1)
+                    self._facet_ids[(kind, value)] = facet_id
+                    facets[facet_id] = Completion(label, kind, value, 0, keys)
+
+            top_prompts = heapq.nlargest(self.max_prompts, prompts, key=lambda row: (row[4], row[0]))
+            for pk, title, category, task_type, copy_count in top_prompts:
+                self._entries[pk] = Completion(
+                    title, KIND_PROMPT, pk, copy_count, title_keys(title), category, task_type,
+                )
+                for facet in ((KIND_CATEGORY, category), (KIND_TASK_TYPE, task_type)):
+                    if facet in self._facet_ids:
+                        facets[self._facet_ids[facet]].score += copy_count
+            self._prompt_count = len(top_prompts)
+            self._entries.update(facets)
+
+            self._keys = sorted(
+                (key, entry_id) for entry_id, entry in self._entries.items() for key in entry.keys
+            )
+            self._warm()
+
+    def upsert_prompt(self, pk, title, category, task_type, copy_count):
+        with self._lock:
+            old = self._entries.get(pk)
+            if old is not None and old.text == title and old.category == category and old.task_type == task_type:
+                delta = copy_count - old.score
+                self._rescore(pk, delta)
+                self._rescore_facets(category, task_type, delta)
+                return
+
+            self.remove_prompt(pk)
+            if self._prompt_count >= self.max_prompts and not self._evict_below(copy_count):
+                return
+            self._add(pk, Completion(title, KIND_PROMPT, pk, copy_count, title_keys(title), category, task_type))
+            self._prompt_count += 1
+            self._rescore_facets(category, task_type, copy_count)
+
+    def add_copies(self, pk, delta):
+        with self._lock:
+            entry = self._entries.get(pk)
+            if entry is None or entry.kind != KIND_PROMPT:
+                return
+            self._rescore(pk, delta)
+            self._rescore_facets(entry.category, entry.task_type, delta)
+
+    def remove_prompt(self, pk):
+        with self._lock:
+            entry = self._remove(pk)
+            if entry is None:
+                return
+            self._prompt_count -= 1
+            self._rescore_facets(entry.category, entry.task_type, -entry.score)
+
+    def _evict_below(self, score):
+        # Memory bound: at capacity a prompt only gets in by displacing the
+        # least-copied one. Linear, but only runs while the index is full.
+        prompts = (pk for pk, e in self._entries.items() if e.kind == KIND_PROMPT)
+        victim = min(prompts, key=self._rank, default=None)
+        if victim is None or self._entries[victim].score >= score:
+            return False
+        self.remove_prompt(victim)
+        return True
+
+
+# --- Process-wide instance ---
+
+_index = None
+_index_version = None
+_checked_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index, _index_version, _checked_at
+    if _index is not None and time.monotonic() - _checked_at < RELOAD_CHECK_SECONDS:
+        return _index
+    with _index_lock:
+        version = listing_cache.current_version(VERSION_KEY)
+        if _index is None or version != _index_version:
+            index = TypeaheadIndex(settings.TYPEAHEAD_MAX_PROMPTS)
+            index.load(
+                Prompt.objects.filter(is_public=True, status='approved')
+                .values_list('id', 'title', 'category', 'task_type', 'copy_count')
+                .iterator(chunk_size=5000)
+            )
+            _index, _index_version = index, version
+        _checked_at = time.monotonic()
+    return _index
+
+
+def loaded_index():
+    """The index if something has already built it, else None."""
+    return _index
+
+
+def sync_prompts(pks):
+    """Bring the prompts in ``pks`` up to date in this process's index, if it has one."""
+    index = loaded_index()
+    if index is None:
+        return
+    # Re-read rather than trust instances: counters are often F() expressions.
+    rows = {
+        pk: rest for pk, *rest in Prompt.objects.filter(pk__in=pks, is_public=True, status='approved')
+        .values_list('pk', 'title', 'category', 'task_type', 'copy_count')
+    }
+    for pk in pks:
+        if pk in rows:
+            index.upsert_prompt(pk, *rows[pk])
+        else:
+            index.remove_prompt(pk)
+
+
+def request_rebuild():
+    """Make every process rebuild its index, for writes that bypass the Prompt signals."""
+    listing_cache.bump_version(VERSION_KEY)
+
+
+def reset_index():
+    global _index
+    with _index_lock:
+        _index = None
@@ -4,10 +4,13 @@ from .views import (
     PromptViewSet,
     RegisterView,
     CategoryListView,
+    FacetsView,
     MicrosoftLoginView,
     PromoteAdminView,
     CurrentUserView,
+    UserOverlayView,
     BookmarkToggleView,
+    copy_event,
     save_copied_prompt,
     check_pending_feedback,
     submit_copy_feedback,
@@ -22,11 +25,15 @@ urlpatterns = [
     path('auth/promote-admin/', PromoteAdminView.as_view(), name='promote-admin'),
     path('sso-login/', MicrosoftLoginView.as_view(), name='company-sso'),
     path('auth/user/', CurrentUserView.as_view(), name='current-user'),
+    path('me/overlay/', UserOverlayView.as_view(), name='user-overlay'),
     path('categories/', CategoryListView.as_view(), name='category-list'),
+    path('facets/', FacetsView.as_view(), name='facets'),
     path('prompts/<int:pk>/upvote/', PromptViewSet.as_view({'post': 'upvote'}), name='prompt-upvote'),
     path('prompts/<int:pk>/downvote/', PromptViewSet.as_view({'post': 'downvote'}), name='prompt-downvote'),
     path('prompts/<int:pk>/bookmark/', BookmarkToggleView.as_view(), name='prompt-bookmark'),
     path('prompts/<int:pk>/history/', PromptViewSet.as_view({'get': 'history'}), name='prompt-history'),
+    path('prompts/<int:pk>/history/<int:version_id>/diff/', PromptViewSet.as_view({'get': 'history_diff'}), name='prompt-history-diff'),
+    path("copy/", copy_event, name="copy_event"),
     path("copy/save/", save_copied_prompt, name="save_copied_prompt"),
     path("copy/check/", check_pending_feedback, name="check_pending_feedback"),
     path("copy/submit/", submit_copy_feedback, name="submit_copy_feedback"),
@@ -0,0 +1,197 @@
+"""
+Append-only usage log and its daily rollup.
+
+Copies, votes, bookmarks and feedback append a UsageEvent each. Like copy
+counts (api/copybuffer.py) the events are buffered per process and written
+with multi-row INSERTs once USAGE_BUFFER_MAX_PENDING have piled up or
+USAGE_BUFFER_FLUSH_SECONDS have passed, and once more at exit.
+
+``manage.py rollup_usage`` aggregates the raw events into PromptDailyStats,
+one row per prompt and day, which is all /prompts/<id>/stats/ reads. A
+rollup recomputes whole days and overwrites them, so re-running it is
+harmless; by default it redoes every day from the day before the latest one
+already rolled up, which covers events flushed late. Raw events older than
+USAGE_EVENT_RETENTION_DAYS are pruned after each rollup.
+"""
+import atexit
+import logging
+import threading
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Prompt, PromptDailyStats, UsageEvent
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT statement.
+FLUSH_BATCH_SIZE = 1000
+PRUNE_CHUNK_SIZE = 10000
+
+_lock = threading.Lock()
+_pending = []
+_wakeup = threading.Event()
+_flusher = None
+
+
+def record(kind, prompt_id, user_id=None, value=0):
+    """Log one event, once the surrounding transaction (if any) commits."""
+    def append():
+        event = (kind, prompt_id, user_id, value, timezone.now())
+        if settings.USAGE_BUFFER_FLUSH_SECONDS <= 0:
+            _write([event])
+            return
+        with _lock:
+            _pending.append(event)
+            full = len(_pending) >= settings.USAGE_BUFFER_MAX_PENDING
+        _ensure_flusher()
+        if full:
+            _wakeup.set()
+    transaction.on_commit(append)
+
+
+def flush():
+    """Write every buffered event now. Returns the number written."""
+    global _pending
+    with _lock:
+        batch, _pending = _pending, []
+    if not batch:
+        return 0
+    try:
+        _write(batch)
+    except Exception:
+        # Put them back, in front of anything recorded meanwhile.
+        with _lock:
+            _pending[:0] = batch
+        raise
+    return len(batch)
+
+
+def _write(events):
+    table = UsageEvent._meta.db_table
+    with transaction.atomic():
+        for start in range(0, len(events), FLUSH_BATCH_SIZE):
+            chunk = events[start:start + FLUSH_BATCH_SIZE]
+            values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(chunk))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} (kind, prompt_id, user_id, value, occurred_at) VALUES {values}',
+                    [x for event in chunk for x in event],
+                )
+
+
+def _run_flusher():
+    while True:
+        _wakeup.wait(settings.USAGE_BUFFER_FLUSH_SECONDS)
+        _wakeup.clear()
+        close_old_connections()
+        try:
+            flush()
+        except Exception:
+            logger.exception('Usage event flush failed; will retry')
+        finally:
+            close_old_connections()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_run_flusher, name='usage-event-flusher', daemon=True)
+            _flusher.start()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Usage event flush at shutdown failed')
+
+
+# --- Rollup ---
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def default_since():
+    """The first day a rollup has to (re)compute."""
+    latest = PromptDailyStats.objects.aggregate(day=Max('day'))['day']
+    if latest is not None:
+        # The day before too: events recorded just before midnight may have
+        # been flushed after the last rollup.
+        return latest - timedelta(days=1)
+    first = UsageEvent.objects.aggregate(at=Min('occurred_at'))['at']
+    return timezone.localdate(first) if first else None
+
+
+def first_complete_day():
+    """The oldest day none of whose raw events can have been pruned yet."""
+    return timezone.localdate(timezone.now() - timedelta(days=settings.USAGE_EVENT_RETENTION_DAYS)) + timedelta(days=1)
+
+
+def rollup(since):
+    """
+    Recompute PromptDailyStats for every day from ``since`` (a date) on,
+    but not before first_complete_day(): older rollups are final. Days
+    after the last one rolled up are never skipped, though, so a rollup that
+    did not run for longer than the retention period catches up on them
+    before prune() deletes their events. Returns (first day recomputed,
+    number of (prompt, day) rows written).
+    """
+    floor = first_complete_day()
+    latest = PromptDailyStats.objects.aggregate(day=Max('day'))['day']
+    if latest is not None:
+        floor = min(floor, latest + timedelta(days=1))
+    since = max(since, floor)
+    start = _day_start(since)
+    stats = PromptDailyStats._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {stats} WHERE day >= %s', [since])
+        cursor.execute(
+            f"""
+            INSERT INTO {stats}
+                (prompt_id, day, copies, upvotes, downvotes, bookmarks, ratings, rating_sum)
+            SELECT e.prompt_id, (e.occurred_at AT TIME ZONE %s)::date,
+                   count(*) FILTER (WHERE e.kind = 'copy'),
+                   count(*) FILTER (WHERE e.kind = 'vote' AND e.value > 0),
+                   count(*) FILTER (WHERE e.kind = 'vote' AND e.value < 0),
+                   count(*) FILTER (WHERE e.kind = 'bookmark' AND e.value > 0),
+                   count(*) FILTER (WHERE e.kind = 'feedback' AND e.value > 0),
+                   coalesce(sum(e.value) FILTER (WHERE e.kind = 'feedback'), 0)
+            FROM {UsageEvent._meta.db_table} e
+            -- Events outlive their prompts; rollups do not.
+            JOIN {Prompt._meta.db_table} p ON p.id = e.prompt_id
+            WHERE e.occurred_at >= %s
+            GROUP BY 1, 2
+            """,
+            [settings.TIME_ZONE, start],
+        )
+        return since, cursor.rowcount
+
+
+def prune():
+    """
+    Delete raw events older than the retention period. Run it after a
+    rollup: those days are then final. Returns the number deleted.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.USAGE_EVENT_RETENTION_DAYS)
+    table = UsageEvent._meta.db_table
+    pruned = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN '
+                f'(SELECT id FROM {table} WHERE occurred_at < %s LIMIT %s)',
+                [cutoff, PRUNE_CHUNK_SIZE],
+            )
+            count = cursor.rowcount
+        pruned += count
+        if count < PRUNE_CHUNK_SIZE:
+            return pruned
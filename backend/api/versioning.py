@@ -0,0 +1,228 @@
+"""
+Delta-compressed storage for PromptVersion.
+
+The long text fields (description, prompt text, guidance) are not stored as
+columns. Each version keeps them in ``payload`` as zlib-compressed JSON:
+
+* a keyframe holds the full text of every field;
+* any other version holds a line diff against the version just before it
+  (same prompt, lower id), and only for the fields that changed.
+
+Every KEYFRAME_INTERVAL-th version is a keyframe, so rebuilding any version
+reads and replays at most that many rows, in one query. ``depth`` is the
+number of diffs since the last keyframe.
+
+A snapshot whose content hash equals the latest version's is skipped: saving
+a prompt without changing it no longer adds history.
+"""
+import difflib
+import hashlib
+import json
+import re
+import zlib
+from difflib import SequenceMatcher
+
+from django.db import transaction
+from django.db.models import Subquery
+
+from .models import Prompt, PromptVersion
+
+KEYFRAME_INTERVAL = 16
+TEXT_FIELDS = ('prompt_description', 'prompt_text', 'guidance')
+# Everything a version snapshots; the short fields stay plain columns.
+SNAPSHOT_FIELDS = ('title', 'task_type', 'output_format', 'category') + TEXT_FIELDS
+
+
+def snapshot_of(prompt):
+    return {field: getattr(prompt, field) for field in SNAPSHOT_FIELDS}
+
+
+def content_hash(snapshot):
+    raw = json.dumps([snapshot[field] for field in SNAPSHOT_FIELDS], separators=(',', ':'))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def pack(document):
+    return zlib.compress(json.dumps(document, separators=(',', ':')).encode(), 9)
+
+
+def unpack(payload):
+    return json.loads(zlib.decompress(bytes(payload)))
+
+
+def diff_text(old, new):
+    """Line ops turning ``old`` into ``new``: [i, j] copies old lines i:j, a string is inserted."""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(new_lines[j1:j2]))
+    return ops
+
+
+def patch_text(old, ops):
+    old_lines = old.splitlines(keepends=True)
+    return ''.join(op if isinstance(op, str) else ''.join(old_lines[op[0]:op[1]]) for op in ops)
+
+
+def encode_delta(base, texts):
+    """Per changed field: ["d", ops] for a line diff, ["s", value] to set it outright."""
+    delta = {}
+    for field in TEXT_FIELDS:
+        old, new = base[field], texts[field]
+        if old == new:
+            continue
+        if old is None or new is None:
+            delta[field] = ['s', new]
+            continue
+        ops = diff_text(old, new)
+        # A rewrite diffs worse than it stores.
+        if len(json.dumps(ops)) < len(new):
+            delta[field] = ['d', ops]
+        else:
+            delta[field] = ['s', new]
+    return delta
+
+
+def apply_delta(base, delta):
+    texts = dict(base)
+    for field, (kind, value) in delta.items():
+        texts[field] = patch_text(base[field], value) if kind == 'd' else value
+    return texts
+
+
+def replay(rows):
+    """Full texts for consecutive version rows (ascending id, starting at a keyframe)."""
+    texts = None
+    rebuilt = {}
+    for row in rows:
+        document = unpack(row.payload)
+        texts = document if row.is_keyframe else apply_delta(texts, document)
+        rebuilt[row.pk] = texts
+    return rebuilt
+
+
+def load_texts(versions):
+    """
+    Set prompt_description / prompt_text / guidance on each PromptVersion in
+    ``versions``. Costs one query per prompt involved.
+    """
+    by_prompt = {}
+    for version in versions:
+        by_prompt.setdefault(version.prompt_id, []).append(version)
+    for prompt_id, targets in by_prompt.items():
+        lowest = min(v.pk for v in targets)
+        first_keyframe = (
+            PromptVersion.objects.filter(prompt_id=prompt_id, pk__lte=lowest, is_keyframe=True)
+            .order_by('-pk').values('pk')[:1]
+        )
+        rows = (
+            PromptVersion.objects.filter(
+                prompt_id=prompt_id,
+                pk__gte=Subquery(first_keyframe),
+                pk__lte=max(v.pk for v in targets),
+            )
+            .only('pk', 'is_keyframe', 'payload')
+            .order_by('pk')
+        )
+        rebuilt = replay(rows)
+        for version in targets:
+            for field, value in rebuilt[version.pk].items():
+                setattr(version, field, value)
+    return versions
+
+
+def changed_fields(previous, snapshot):
+    if previous is None:
+        return list(SNAPSHOT_FIELDS)
+    return [field for field in SNAPSHOT_FIELDS if previous[field] != snapshot[field]]
+
+
+def build_version(prompt_id, snapshot, latest, latest_texts, **extra):
+    """
+    An unsaved PromptVersion for ``snapshot``, chained after ``latest`` (whose
+    full texts are ``latest_texts``), or None if nothing changed since it.
+    """
+    digest = content_hash(snapshot)
+    if latest is not None and latest.content_hash == digest:
+        return None
+    texts = {field: snapshot[field] for field in TEXT_FIELDS}
+    keyframe = latest is None or latest.depth + 1 >= KEYFRAME_INTERVAL
+    previous = None
+    if latest is not None:
+        previous = {field: getattr(latest, field) for field in SNAPSHOT_FIELDS if field not in TEXT_FIELDS}
+        previous.update(latest_texts)
+    return PromptVersion(
+        prompt_id=prompt_id,
+        title=snapshot['title'],
+        task_type=snapshot['task_type'],
+        output_format=snapshot['output_format'],
+        category=snapshot['category'],
+        content_hash=digest,
+        is_keyframe=keyframe,
+        depth=0 if keyframe else latest.depth + 1,
+        changed_fields=changed_fields(previous, snapshot),
+        payload=pack(texts if keyframe else encode_delta(latest_texts, texts)),
+        **extra,
+    )
+
+
+def record_version(prompt, edited_by=None):
+    """
+    Snapshot ``prompt``'s current content as a new version. Returns the
+    version, or None when it is identical to the latest one.
+    """
+    with transaction.atomic():
+        # Diffs chain off the newest version, so snapshots of one prompt
+        # must not interleave.
+        Prompt.objects.select_for_update().filter(pk=prompt.pk).values('pk').first()
+        latest = PromptVersion.objects.filter(prompt_id=prompt.pk).order_by('-pk').first()
+        latest_texts = None
+        if latest is not None:
+            load_texts([latest])
+            latest_texts = {field: getattr(latest, field) for field in TEXT_FIELDS}
+        version = build_version(prompt.pk, snapshot_of(prompt), latest, latest_texts, edited_by=edited_by)
+        if version is not None:
+            version.save()
+        return version
+
+
+# --- Diffs for people (the history UI), as opposed to storage deltas ---
+
+DIFF_MODES = ('unified', 'word')
+_WORD = re.compile(r'\s+|\w+|[^\w\s]')
+
+
+def unified_diff(old, new):
+    return '\n'.join(difflib.unified_diff(
+        (old or '').splitlines(), (new or '').splitlines(), 'before', 'after', lineterm='',
+    ))
+
+
+def word_diff(old, new):
+    """[op, text] runs with op one of '=', '-', '+'."""
+    old_words = _WORD.findall(old or '')
+    new_words = _WORD.findall(new or '')
+    runs = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_words, new_words, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            runs.append(['=', ''.join(old_words[i1:i2])])
+            continue
+        if i2 > i1:
+            runs.append(['-', ''.join(old_words[i1:i2])])
+        if j2 > j1:
+            runs.append(['+', ''.join(new_words[j1:j2])])
+    return runs
+
+
+def diff_snapshots(old, new, mode='unified'):
+    """Per changed field, the diff from ``old`` to ``new`` (both SNAPSHOT_FIELDS dicts)."""
+    render = unified_diff if mode == 'unified' else word_diff
+    return {
+        field: render(old.get(field), new[field])
+        for field in SNAPSHOT_FIELDS
+        if old.get(field) != new[field]
+    }
@@ -1,21 +1,60 @@
-from rest_framework import viewsets, permissions, generics, status, filters
+from rest_framework import viewsets, permissions, generics, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.contrib.auth.models import User
-from django.db.models import Q, F
+from django.db.models import Q, F, Exists, OuterRef, Subquery
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
-from django.http import Http404
-from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.conf import settings
 from rest_framework.permissions import IsAuthenticated
-from .models import Vote, Bookmark, PromptVersion, Prompt, CATEGORY_CHOICES, CopiedPromptFeedback
-from .serializers import PromptSerializer, PromptVersionSerializer, UserSerializer
-import os
+from .models import Vote, Bookmark, PromptVersion, Prompt, CopiedPromptFeedback, PromptDailyStats, UsageEvent
+from .serializers import (
+    CatalogPromptSerializer, PromptSerializer, PromptVersionSerializer, PromptVersionSummarySerializer, UserSerializer,
+)
+from .filters import PromptSearchFilter
+from .pagination import HistoryPagination, PromptPagination, catalog_ordering
+from . import similar as similar_index
+from . import snapshot as catalog_snapshot
+from . import copybuffer, exporter, facets, jwks, listing_cache, moderation, ratings, typeahead, usage, versioning
+from .authentication import tokens_for_user
+from .changes import collect_changes, format_watermark, parse_watermark
+from .feedback import feedback_answered, feedback_requested, pending_feedback
+from datetime import timedelta
+import gzip
+import hashlib
+import json
 import jwt
-import requests
-from jwt.algorithms import RSAAlgorithm
-from rest_framework.authtoken.models import Token
+import logging
+ 
+logger = logging.getLogger(__name__)
+ 
+def annotate_for_user(qs, user):
+    # Everything PromptSerializer renders comes from this one query: the
+    # author via select_related, the caller's vote/bookmark via correlated
+    # subqueries, and the counters from the denormalized Prompt columns.
+    qs = qs.select_related('user')
+    if not user or not user.is_authenticated:
+        return qs
+    return qs.annotate(
+        user_vote=Subquery(
+            Vote.objects.filter(user=user, prompt=OuterRef('pk')).values('value')[:1]
+        ),
+        is_bookmarked=Exists(
+            Bookmark.objects.filter(user=user, prompt=OuterRef('pk'))
+        ),
+    )
+ 
+def _accepts_encoding(header, coding):
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        if name.strip().lower() in (coding, '*'):
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
  
 class IsAdminOrOwner(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -33,18 +72,23 @@ class RegisterView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
     serializer_class = UserSerializer
  
-class CategoryListView(generics.ListAPIView):
+class FacetsView(APIView):
+    """Prompt counts per category, task type, output format and status (api/facets.py)."""
+    permission_classes = [permissions.IsAuthenticated]
+ 
+    def get(self, request, *args, **kwargs):
+        mine = request.query_params.get('mine') == '1'
+        return Response(facets.get_facets(request.user, mine=mine))
+ 
+class CategoryListView(APIView):
+    # Superseded by /facets/; kept for older clients. Predefined categories
+    # plus any custom ones on the caller's own prompts.
     permission_classes = [permissions.IsAuthenticated]
    
     def get(self, request, *args, **kwargs):
-        predefined_categories = [choice[0] for choice in CATEGORY_CHOICES]
-        user_categories = list(
-            request.user.prompts.all()
-            .values_list('category', flat=True)
-            .distinct()
-        )
-        all_categories = sorted(list(set(predefined_categories + user_categories)))
-        return Response(all_categories)
+        user = request.user
+        own = facets.count_facets(user.prompts.all()) if user.is_staff else facets.get_facets(user, mine=True)
+        return Response(sorted(item['value'] for item in own['category']))
  
 class MicrosoftLoginView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -55,13 +99,11 @@ class MicrosoftLoginView(APIView):
         if not auth_header:
             return Response({'error': 'No token provided'}, status=400)
  
-        # 2. Config (Move these to .env settings in real life!)
-        TENANT_ID = os.getenv('TENANT_ID'),
-        CLIENT_ID = os.getenv('CLIENT_ID'),
+        # 2. Config (SSO_* in settings, from the TENANT_ID / CLIENT_ID env vars)
+        jwks_url = settings.SSO_JWKS_URL
        
         # 3. Verify the Token with Microsoft
-        # We fetch Microsoft's public keys to validate the signature
-        jwks_url = f"https://login.microsoftonline.com/{TENANT_ID}/discovery/v2.0/keys"
+        # Microsoft's public keys come from the process-wide cache in api/jwks.py
        
         try:
             # Decode the token header to find which key was used
@@ -73,7 +115,7 @@ class MicrosoftLoginView(APIView):
                 auth_header,
                 rsa_key,
                 algorithms=["RS256"],
-                audience=CLIENT_ID # Ensures token is meant for YOUR app
+                audience=settings.SSO_CLIENT_ID # Ensures token is meant for YOUR app
                 # issuer=... (Optional: add issuer check for extra security)
             )
            
@@ -91,12 +133,14 @@ class MicrosoftLoginView(APIView):
                 'first_name': name
             })
  
-            # 6. Generate Django Token for the session
-            # If using DRF Token Auth:
-            token, _ = Token.objects.get_or_create(user=user)
+            # 6. Issue the same JWT pair as /api/token/ (JWTAuthentication is
+            # the only configured authentication class)
+            refresh = tokens_for_user(user)
            
             return Response({
-                'token': token.key,
+                'token': str(refresh.access_token),
+                'access': str(refresh.access_token),
+                'refresh': str(refresh),
                 'user_id': user.id,
                 'username': user.username,
                 'is_staff': user.is_staff
@@ -104,17 +148,16 @@ class MicrosoftLoginView(APIView):
  
         except jwt.ExpiredSignatureError:
             return Response({'error': 'Token expired'}, status=401)
+        except jwks.JWKSUnavailable as e:
+            logger.warning('SSO sign-in failed, signing keys unavailable: %s', e)
+            return Response({'error': 'Sign-in is temporarily unavailable'}, status=503)
         except Exception as e:
             print(f"SSO Error: {e}")
             return Response({'error': 'Invalid token'}, status=401)
  
     # Helper to find the right encryption key
     def get_rsa_key(self, jwks_url, kid):
-        jwks = requests.get(jwks_url).json()
-        for key in jwks['keys']:
-            if key['kid'] == kid:
-                return RSAAlgorithm.from_jwk(key)
-        raise Exception("Public key not found")
+        return jwks.get_jwks(jwks_url).get_key(kid)
    
  
 class PromoteAdminView(APIView):
@@ -128,6 +171,8 @@ class PromoteAdminView(APIView):
         if user_to_promote.is_staff:
             return Response({'message': f'User "{username}" is already an admin.'}, status=status.HTTP_400_BAD_REQUEST)
         user_to_promote.is_staff = True
+        # Saving bumps the user's token version (api/signals.py), so tokens
+        # that still say is_staff=false stop being trusted.
         user_to_promote.save()
         return Response({'message': f'Successfully promoted user "{username}" to admin.'})
  
@@ -141,15 +186,51 @@ class CurrentUserView(APIView):
             "username": user.username,
             "email": user.email,
             "is_staff": user.is_staff,
+            # Saves the client a separate /feedback/pending/ call at startup.
+            "pending_feedback": pending_feedback(user),
         })
  
+class UserOverlayView(APIView):
+    """
+    The caller's votes and bookmarks as sorted prompt id arrays, so clients
+    can lay them over the shared (user-agnostic) catalog payloads.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+ 
+    def get(self, request, *args, **kwargs):
+        user = request.user
+        # Both queries are range scans on the (user, prompt) unique indexes.
+        up, down = [], []
+        for prompt_id, value in Vote.objects.filter(user=user).order_by('prompt_id').values_list('prompt_id', 'value'):
+            (up if value == Vote.VOTE_UP else down).append(prompt_id)
+        bookmarks = list(
+            Bookmark.objects.filter(user=user).order_by('prompt_id').values_list('prompt_id', flat=True)
+        )
+        overlay = {'votes': {'up': up, 'down': down}, 'bookmarks': bookmarks}
+ 
+        digest = hashlib.sha256(json.dumps(overlay, separators=(',', ':')).encode()).hexdigest()[:32]
+        etag = f'"{user.pk}-{digest}"'
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = Response(overlay)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        response['Vary'] = 'Authorization'
+        return response
+ 
+# Prompt columns that change without a catalog cache bump (see _personalize).
+COUNTER_FIELDS = ('vote', 'like_count', 'dislike_count', 'copy_count', 'rating_count', 'rating_average')
+SIMILAR_MAX_LIMIT = 50
+ 
 class PromptViewSet(viewsets.ModelViewSet):
     serializer_class = PromptSerializer
     queryset = Prompt.objects.all()
     permission_classes = [permissions.IsAuthenticated, IsAdminOrOwner]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, PromptSearchFilter]
     filterset_fields = ['category', 'task_type', 'output_format']
     search_fields = ['title', 'prompt_description', 'prompt_text']
+    pagination_class = PromptPagination
  
     def get_queryset(self):
         user = self.request.user
@@ -173,25 +254,64 @@ class PromptViewSet(viewsets.ModelViewSet):
         if username:
             qs = qs.filter(user__username=username)
  
-        qs = qs.order_by('-copy_count', '-created_at')
- 
-        # --- Pagination (AFTER FILTERING) ---
-        limit = params.get("limit")
-        offset = params.get("offset")
- 
-        try:
-            offset_int = int(offset) if offset else 0
-        except:
-            offset_int = 0
- 
-        if limit:
-            try:
-                limit_int = int(limit)
-                return qs[offset_int : offset_int + limit_int]
-            except:
-                pass
+        # Pagination (cursor or limit/offset) runs in PromptPagination,
+        # after the filter backends.
+        return annotate_for_user(qs, user).order_by(*catalog_ordering(params))
  
-        return qs
+    def list(self, request, *args, **kwargs):
+        user = request.user
+        key = None
+        if not user.is_staff:
+            key = listing_cache.cache_key(request.query_params)
+        if key is None:
+            return super().list(request, *args, **kwargs)
+ 
+        # On a miss the normal, per-user query builds the page and the cache
+        # keeps a copy without the caller's fields; hits add them back below.
+        built = {}
+ 
+        def build():
+            built['data'] = super(PromptViewSet, self).list(request, *args, **kwargs).data
+            return self._shared_part(built['data'])
+ 
+        shared = listing_cache.get_or_build(key, build)
+        if 'data' in built:
+            return Response(built['data'])
+        return Response(self._personalize(shared, user))
+ 
+    def _shared_part(self, data):
+        def strip(item):
+            return {k: v for k, v in item.items() if k not in ('user_vote', 'is_bookmarked')}
+        if isinstance(data, dict):
+            return {**data, 'results': [strip(item) for item in data['results']]}
+        return [strip(item) for item in data]
+ 
+    def _personalize(self, data, user):
+        # One primary-key lookup adds the caller's vote and bookmark and
+        # refreshes the counters, which votes and ratings change without
+        # bumping the cache version.
+        results = data['results'] if isinstance(data, dict) else data
+        ids = [item['id'] for item in results]
+        rows = {
+            row['id']: row
+            for row in annotate_for_user(Prompt.objects.filter(pk__in=ids), user)
+            .values('id', *COUNTER_FIELDS, *(
+                ('user_vote', 'is_bookmarked') if user.is_authenticated else ()
+            ))
+        }
+        personalized = []
+        for item in results:
+            row = rows.get(item['id'], {})
+            item = dict(item)
+            for field in COUNTER_FIELDS:
+                item[field] = row.get(field, item.get(field))
+            item['vote_count'] = item['vote']
+            item['user_vote'] = row.get('user_vote') or 0
+            item['is_bookmarked'] = bool(row.get('is_bookmarked'))
+            personalized.append(item)
+        if isinstance(data, dict):
+            return {**data, 'results': personalized}
+        return personalized
  
     def _auto_approve_if_private(self, serializer):
         is_public = serializer.validated_data.get("is_public", True)
@@ -210,7 +330,7 @@ class PromptViewSet(viewsets.ModelViewSet):
             lookup = self.kwargs.get(lookup_field)
             Model = self.queryset.model
             try:
-                obj = Model.objects.get(pk=lookup)
+                obj = annotate_for_user(Model.objects.all(), self.request.user).get(pk=lookup)
             except Model.DoesNotExist:
                 raise Http404
  
@@ -223,37 +343,29 @@ class PromptViewSet(viewsets.ModelViewSet):
         self._auto_approve_if_private(serializer)
         prompt = serializer.save(user=self.request.user)
         if prompt.status == 'approved':
-            PromptVersion.objects.create(
-                prompt=prompt,
+            versioning.record_version(
+                prompt,
                 edited_by=self.request.user if self.request.user.is_authenticated else None,
-                title=prompt.title,
-                prompt_description=prompt.prompt_description,
-                prompt_text=prompt.prompt_text,
-                guidance=prompt.guidance,
-                task_type=prompt.task_type,
-                output_format=prompt.output_format,
-                category=prompt.category
             )
    
     def perform_update(self, serializer):
         prompt_before_edit = self.get_object()
         self._auto_approve_if_private(serializer)
         if prompt_before_edit.status == 'approved':
-            PromptVersion.objects.create(
-                prompt=prompt_before_edit,
-                edited_by=self.request.user,
-                title=prompt_before_edit.title,
-                prompt_description=prompt_before_edit.prompt_description,
-                prompt_text=prompt_before_edit.prompt_text,
-                guidance=prompt_before_edit.guidance,
-                task_type=prompt_before_edit.task_type,
-                output_format=prompt_before_edit.output_format,
-                category=prompt_before_edit.category
-            )
+            versioning.record_version(prompt_before_edit, edited_by=self.request.user)
         if not self.request.user.is_staff:
             serializer.save(status='pending')
         else:
             serializer.save()
+        self._catalog_changed()
+ 
+    def perform_destroy(self, instance):
+        instance.delete()
+        self._catalog_changed()
+ 
+    def _catalog_changed(self):
+        # Called by every write that can add, remove or alter a public prompt.
+        catalog_snapshot.schedule_rebuild()
  
     def create(self, request, *args, **kwargs):
         existing_id = request.data.get('id') or request.data.get('pk')
@@ -269,22 +381,13 @@ class PromptViewSet(viewsets.ModelViewSet):
  
             prompt_before_edit = prompt
             if prompt_before_edit.status == 'approved':
-                PromptVersion.objects.create(
-                    prompt=prompt_before_edit,
-                    edited_by=request.user,
-                    title=prompt_before_edit.title,
-                    prompt_description=prompt_before_edit.prompt_description,
-                    prompt_text=prompt_before_edit.prompt_text,
-                    guidance=prompt_before_edit.guidance,
-                    task_type=prompt_before_edit.task_type,
-                    output_format=prompt_before_edit.output_format,
-                    category=prompt_before_edit.category
-                )
+                versioning.record_version(prompt_before_edit, edited_by=request.user)
  
             if not request.user.is_staff:
                 serializer.save(status='pending')
             else:
                 serializer.save()
+            self._catalog_changed()
  
             return Response(serializer.data, status=status.HTTP_200_OK)
         return super().create(request, *args, **kwargs)
@@ -296,6 +399,7 @@ class PromptViewSet(viewsets.ModelViewSet):
             return Response({'detail': 'Prompt is already approved.'}, status=status.HTTP_400_BAD_REQUEST)
         prompt.status = 'approved'
         prompt.save()
+        self._catalog_changed()
         return Response(PromptSerializer(prompt).data)
  
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAdminUser])
@@ -303,38 +407,88 @@ class PromptViewSet(viewsets.ModelViewSet):
         prompt = self.get_object()
         if prompt.status == 'rejected':
             return Response({'detail': 'Prompt is already rejected.'}, status=status.HTTP_400_BAD_REQUEST)
+        if prompt.status == 'approved':
+            versioning.record_version(prompt, edited_by=request.user)
         prompt.status = 'rejected'
         prompt.save()
+        self._catalog_changed()
         return Response(PromptSerializer(prompt).data)
  
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def moderate(self, request):
+        """Bulk approve / reject: {"action": "approve" | "reject", "ids": [...]} (api/moderation.py)."""
+        action_name = request.data.get('action')
+        ids = request.data.get('ids')
+        if action_name not in moderation.ACTIONS:
+            return Response({'error': 'action must be approve or reject.'}, status=status.HTTP_400_BAD_REQUEST)
+        if (
+            not isinstance(ids, list) or not ids or len(ids) > moderation.MAX_BATCH
+            or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids)
+        ):
+            return Response(
+                {'error': f'ids must be a list of 1 to {moderation.MAX_BATCH} prompt ids.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        result = moderation.moderate(ids, action_name, moderator=request.user)
+        if result['updated']:
+            self._catalog_changed()
+        return Response(result)
+ 
     def _handle_vote(self, request, pk, value_to_set):
         prompt = self.get_object()
-        user = request.user
  
         with transaction.atomic():
-            existing = Vote.objects.filter(user=user, prompt=prompt).first()
+            new_value, counters = self._apply_vote(request.user, prompt.pk, value_to_set)
+            usage.record(UsageEvent.KIND_VOTE, prompt.pk, request.user.pk, new_value)
  
-            if existing is None:
-                Vote.objects.create(user=user, prompt=prompt, value=value_to_set)
-            else:
-                if existing.value == value_to_set:
-                    existing.delete()
-                else:
-                    existing.value = value_to_set
-                    existing.save()
-            prompt.refresh_from_db()
-           
-            likes = prompt.votes.filter(value=1).count()
-            dislikes = prompt.votes.filter(value=-1).count()
- 
-            prompt.like_count = likes
-            prompt.dislike_count = dislikes
-            prompt.vote = likes - dislikes
-           
-            prompt.save(update_fields=['like_count', 'dislike_count', 'vote'])
+        return Response({
+            'id': prompt.pk,
+            'user_vote': new_value,
+            'vote_count': counters['vote'],
+            'like_count': counters['like_count'],
+            'dislike_count': counters['dislike_count'],
+        }, status=status.HTTP_200_OK)
+ 
+    def _apply_vote(self, user, prompt_id, value_to_set):
+        # Row-locked upsert of the caller's vote: either inserts it, or locks
+        # the existing row (waiting out any concurrent click by the same user)
+        # and hands back its current value. xmax = 0 only on a fresh insert.
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Vote._meta.db_table} (user_id, prompt_id, value, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (user_id, prompt_id) DO UPDATE SET updated_at = EXCLUDED.updated_at
+                RETURNING value, (xmax = 0)
+                """,
+                [user.pk, prompt_id, value_to_set, now, now],
+            )
+            current, inserted = cursor.fetchone()
  
-        serializer = PromptSerializer(prompt, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if inserted:
+            old_value, new_value = 0, value_to_set
+        else:
+            old_value = current
+            new_value = 0 if old_value == value_to_set else value_to_set
+            votes = Vote.objects.filter(user=user, prompt_id=prompt_id)
+            if new_value == 0:
+                votes.delete()
+            elif new_value != old_value:
+                votes.update(value=new_value)
+ 
+        # The counters move by the delta of this one transition, so voters on
+        # the same prompt never overwrite each other's counts.
+        likes = (new_value == Vote.VOTE_UP) - (old_value == Vote.VOTE_UP)
+        dislikes = (new_value == Vote.VOTE_DOWN) - (old_value == Vote.VOTE_DOWN)
+        Prompt.objects.filter(pk=prompt_id).update(
+            like_count=F('like_count') + likes,
+            dislike_count=F('dislike_count') + dislikes,
+            vote=F('vote') + (new_value - old_value),
+        )
+        # Our UPDATE holds the row lock until commit, so this read is exact.
+        counters = Prompt.objects.filter(pk=prompt_id).values('like_count', 'dislike_count', 'vote').get()
+        return new_value, counters
  
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def upvote(self, request, pk=None):
@@ -346,26 +500,240 @@ class PromptViewSet(viewsets.ModelViewSet):
    
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def copy(self, request, pk=None):
+        # Counter-only variant of the /copy/ event, kept for older clients.
         prompt = self.get_object()
-       
-        prompt.copy_count = F('copy_count') + 1
-        prompt.save()
-       
-        prompt.refresh_from_db()
-       
-        return Response({'copy_count': prompt.copy_count}, status=status.HTTP_200_OK)
+        copy_count = record_copy_event(request.user, prompt, remember=False)
+        return Response({'copy_count': copy_count}, status=status.HTTP_200_OK)
+ 
+    @action(detail=False, methods=['get'])
+    def snapshot(self, request):
+        manifest = catalog_snapshot.get_manifest()
+        files = manifest['files']
+        accept = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if 'br' in files and _accepts_encoding(accept, 'br'):
+            encoding = 'br'
+        elif _accepts_encoding(accept, 'gzip'):
+            encoding = 'gzip'
+        else:
+            encoding = 'identity'
  
-    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
-    def history(self, request, pk=None):
+        # Strong validator: one tag per content hash and coding.
+        etag = f'"{manifest["etag"]}-{encoding}"'
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            response = HttpResponseNotModified()
+        else:
+            path = catalog_snapshot.snapshot_dir() / files.get(encoding, files['gzip'])
+            if encoding == 'identity':
+                with gzip.open(path, 'rb') as fh:
+                    response = HttpResponse(fh.read(), content_type='application/json')
+            else:
+                response = FileResponse(open(path, 'rb'), content_type='application/json')
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['X-Catalog-Version'] = str(manifest['version'])
+        response['Cache-Control'] = 'private, no-cache'
+        response['Vary'] = 'Accept-Encoding'
+        return response
+ 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream the prompts this list request would return, or their versions
+        or feedback (staff only), as ``?as=jsonl|csv|xlsx`` (api/exporter.py).
+        Takes the same filters as the list; pagination parameters are ignored.
+        """
+        name = request.query_params.get('dataset', 'prompts')
+        file_format = request.query_params.get('as', 'jsonl')
+        if name not in exporter.DATASETS or file_format not in exporter.ENCODERS:
+            return Response(
+                {'error': 'dataset must be prompts, versions or feedback; as must be jsonl, csv or xlsx.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if name != 'prompts' and not request.user.is_staff:
+            return Response({'detail': 'Only admins can export versions or feedback.'}, status=status.HTTP_403_FORBIDDEN)
+ 
+        prompts = self.filter_queryset(self.get_queryset())
+        # xlsx is a zip already.
+        compress = file_format != 'xlsx' and _accepts_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), 'gzip')
+        response = StreamingHttpResponse(
+            exporter.export(name, prompts, file_format, compress=compress),
+            content_type=exporter.CONTENT_TYPES[file_format],
+        )
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        response['Content-Disposition'] = f'attachment; filename="{name}-{timezone.now():%Y%m%d}.{file_format}"'
+        response['Cache-Control'] = 'private, no-store'
+        response['Vary'] = 'Accept-Encoding'
+        return response
+ 
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 8)), 1), typeahead.CACHED_TOP_K)
+        except ValueError:
+            limit = 8
+        return Response(typeahead.get_index().lookup(request.query_params.get('q', ''), limit))
+ 
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        try:
+            since = parse_watermark(request.query_params.get('since'))
+        except ValueError:
+            return Response({'error': 'A valid since watermark is required.'}, status=status.HTTP_400_BAD_REQUEST)
+ 
+        watermark, upserts, tombstones = collect_changes(since)
+        if upserts is None:
+            # Too far behind (or too much changed): refetch /prompts/snapshot/.
+            return Response({'reset': True, 'watermark': format_watermark(watermark)})
+        return Response({
+            'reset': False,
+            'watermark': format_watermark(watermark),
+            'upserts': CatalogPromptSerializer(upserts, many=True).data,
+            'tombstones': tombstones,
+        })
+ 
+    def _history_prompt(self, request):
         prompt = self.get_object()
         if not request.user.is_staff and prompt.user != request.user:
+            return None
+        return prompt
+ 
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        # Daily usage series, read from the rollup table only (api/usage.py);
+        # days without activity are filled in with zeros.
+        prompt = self.get_object()
+        dates = {}
+        for param in ('from', 'to'):
+            value = request.query_params.get(param)
+            try:
+                # None for a value that is not even shaped like a date.
+                dates[param] = parse_date(value) if value else None
+            except ValueError:
+                dates[param] = None
+            if value and dates[param] is None:
+                return Response({'error': 'from and to must be YYYY-MM-DD dates.'}, status=400)
+        end = dates['to'] or timezone.localdate()
+        start = dates['from'] or end - timedelta(days=29)
+        if start > end:
+            return Response({'error': 'from must not be after to.'}, status=400)
+        if (end - start).days >= settings.USAGE_STATS_MAX_DAYS:
+            return Response(
+                {'error': f'At most {settings.USAGE_STATS_MAX_DAYS} days per request.'}, status=400,
+            )
+ 
+        counters = ('copies', 'upvotes', 'downvotes', 'bookmarks', 'ratings', 'rating_sum')
+        rows = {
+            row['day']: row
+            for row in PromptDailyStats.objects.filter(prompt=prompt, day__range=(start, end))
+            .values('day', *counters)
+        }
+        days, totals = [], dict.fromkeys(counters, 0)
+        for offset in range((end - start).days + 1):
+            day = start + timedelta(days=offset)
+            row = rows.get(day) or dict.fromkeys(counters, 0)
+            days.append({'day': day.isoformat(), **{name: row[name] for name in counters}})
+            for name in counters:
+                totals[name] += row[name]
+        return Response({
+            'prompt': prompt.pk,
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'totals': totals,
+            'days': days,
+        })
+ 
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        # Nearest public prompts by TF-IDF cosine (api/similar.py), best first.
+        prompt = self.get_object()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), SIMILAR_MAX_LIMIT)
+        except ValueError:
+            limit = 10
+        index = similar_index.get_index()
+        if index is None:
+            return Response({'error': 'Similar prompts are not available yet.'}, status=503)
+        # A few spare matches stand in for prompts that left the catalog
+        # since the index was built.
+        matches = index.similar(prompt, limit + 5)
+        catalog = annotate_for_user(
+            Prompt.objects.filter(is_public=True, status='approved', pk__in=[pk for pk, _ in matches]),
+            request.user,
+        )
+        found = {item.pk: item for item in catalog}
+        matches = [(found[match_id], score) for match_id, score in matches if match_id in found][:limit]
+        results = PromptSerializer([item for item, _ in matches], many=True, context={'request': request}).data
+        for data, (_, score) in zip(results, matches):
+            data['similarity'] = round(score, 4)
+        return Response({'prompt': prompt.pk, 'results': results})
+ 
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def history(self, request, pk=None):
+        # Metadata only; texts come per version from history_diff.
+        prompt = self._history_prompt(request)
+        if prompt is None:
             return Response(
                 {'detail': 'You do not have permission to view this history.'},
                 status=status.HTTP_403_FORBIDDEN
             )
-        versions = prompt.versions.all()
-        serializer = PromptVersionSerializer(versions, many=True)
-        return Response(serializer.data)
+        paginator = HistoryPagination()
+        page = paginator.paginate_queryset(
+            prompt.versions.select_related('edited_by').defer('payload'), request
+        )
+        serializer = PromptVersionSummarySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+ 
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated],
+            url_path='history/(?P<version_id>\\d+)/diff')
+    def history_diff(self, request, pk=None, version_id=None):
+        """
+        What a version changed: ``?against=previous`` (default) diffs it with
+        the version before it, ``?against=current`` with the prompt as it is
+        now. ``?mode=unified`` (default) or ``word``.
+        """
+        prompt = self._history_prompt(request)
+        if prompt is None:
+            return Response(
+                {'detail': 'You do not have permission to view this history.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        against = request.query_params.get('against', 'previous')
+        mode = request.query_params.get('mode', 'unified')
+        if against not in ('previous', 'current') or mode not in versioning.DIFF_MODES:
+            return Response(
+                {'error': 'against must be previous or current; mode must be unified or word.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+ 
+        current = versioning.snapshot_of(prompt)
+        # Versions never change, so the key only has to pin the other side.
+        target = 'previous' if against == 'previous' else versioning.content_hash(current)
+        key = f'history:diff:{prompt.pk}:{version_id}:{target}:{mode}'
+        cache = listing_cache.get_cache()
+        payload = cache.get(key)
+        if payload is None:
+            version = get_object_or_404(
+                prompt.versions.select_related('edited_by'), pk=version_id
+            )
+            previous = None
+            if against == 'previous':
+                previous = prompt.versions.filter(pk__lt=version.pk).order_by('-pk').first()
+            versioning.load_texts([version] + ([previous] if previous else []))
+            snapshot = versioning.snapshot_of(version)
+            if against == 'previous':
+                before, after = (versioning.snapshot_of(previous) if previous else {}), snapshot
+            else:
+                before, after = snapshot, current
+            payload = {
+                'version': PromptVersionSerializer(version).data,
+                'against': against,
+                'against_version': previous.pk if previous else None,
+                'mode': mode,
+                'changes': versioning.diff_snapshots(before, after, mode),
+            }
+            cache.set(key, payload, timeout=settings.HISTORY_DIFF_CACHE_TIMEOUT)
+        return Response(payload)
    
     @action(detail=True, methods=['post'], permission_classes=[IsAdminOrOwner], url_path='revert/(?P<version_id>\\d+)')
     def revert(self, request, pk=None, version_id=None):
@@ -380,17 +748,8 @@ class PromptViewSet(viewsets.ModelViewSet):
             )
  
         if prompt.status == 'approved':
-            PromptVersion.objects.create(
-                prompt=prompt,
-                edited_by=request.user,
-                title=prompt.title,
-                prompt_description=prompt.prompt_description,
-                prompt_text=prompt.prompt_text,
-                guidance=prompt.guidance,
-                task_type=prompt.task_type,
-                output_format=prompt.output_format,
-                category=prompt.category
-            )
+            versioning.record_version(prompt, edited_by=request.user)
+        versioning.load_texts([version])
        
         prompt.title = version.title
         prompt.prompt_description = version.prompt_description
@@ -404,6 +763,7 @@ class PromptViewSet(viewsets.ModelViewSet):
             prompt.status = 'pending'
        
         prompt.save()
+        self._catalog_changed()
        
         serializer = self.get_serializer(prompt)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -420,30 +780,79 @@ class BookmarkToggleView(APIView):
             Bookmark.objects.create(user=user, prompt=prompt)
         else:
             existing.delete()
+        usage.record(UsageEvent.KIND_BOOKMARK, prompt.pk, user.pk, int(existing is None))
  
         serializer = PromptSerializer(prompt, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
  
+def copyable_prompts(user):
+    # Same visibility as PromptViewSet.get_object: the public catalog, plus
+    # the caller's own prompts, plus everything for staff.
+    qs = Prompt.objects.only('id', 'title', 'copy_count')
+    if user.is_staff:
+        return qs
+    return qs.filter(Q(is_public=True, status='approved') | Q(user=user))
+ 
+def save_pending_feedback(user, prompt_id):
+    # A user has at most one pending feedback row (partial unique constraint
+    # copy_feedback_one_pending_per_user), so a new copy re-points that row
+    # instead of deleting and re-inserting it.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {CopiedPromptFeedback._meta.db_table}
+                (user_id, prompt_id, status, rating, feedback_text, created_at)
+            VALUES (%s, %s, 'pending', 0, NULL, %s)
+            ON CONFLICT (user_id) WHERE status = 'pending' DO UPDATE
+            SET prompt_id = EXCLUDED.prompt_id, created_at = EXCLUDED.created_at
+            """,
+            [user.pk, prompt_id, timezone.now()],
+        )
+    feedback_requested(user.pk)
+ 
+def record_copy_event(user, prompt, count=True, remember=True):
+    """
+    Record one copy of ``prompt`` by ``user``: bump the copy counter and make
+    it the user's pending feedback prompt. Returns the approximate copy count.
+    """
+    copy_count = prompt.copy_count
+    with transaction.atomic():
+        if remember:
+            save_pending_feedback(user, prompt.pk)
+        # Last, so a failed upsert never leaves a counted copy behind.
+        if count:
+            copy_count += copybuffer.record_copy(prompt.pk)
+            usage.record(UsageEvent.KIND_COPY, prompt.pk, user.pk)
+    return copy_count
+ 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
-def save_copied_prompt(request):
+def copy_event(request):
     prompt_id = request.data.get("prompt_id")
  
     if not prompt_id:
         return Response({"error": "prompt_id is required"}, status=400)
  
-    prompt = get_object_or_404(Prompt, id=prompt_id)
+    prompt = get_object_or_404(copyable_prompts(request.user), id=prompt_id)
+    copy_count = record_copy_event(request.user, prompt)
  
-    CopiedPromptFeedback.objects.filter(
-        user=request.user,
-        status="pending"
-    ).delete()
+    return Response({
+        "prompt_id": prompt.id,
+        "copy_count": copy_count,
+        "pending_feedback": True,
+    })
  
-    CopiedPromptFeedback.objects.create(
-        user=request.user,
-        prompt=prompt,
-        status="pending"
-    )
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def save_copied_prompt(request):
+    # Feedback-only variant of the /copy/ event, kept for older clients.
+    prompt_id = request.data.get("prompt_id")
+ 
+    if not prompt_id:
+        return Response({"error": "prompt_id is required"}, status=400)
+ 
+    prompt = get_object_or_404(Prompt.objects.only('id', 'copy_count'), id=prompt_id)
+    record_copy_event(request.user, prompt, count=False)
  
     return Response({
         "message": "Pending copy feedback created",
@@ -453,19 +862,7 @@ def save_copied_prompt(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def check_pending_feedback(request):
-    pending = CopiedPromptFeedback.objects.filter(
-        user=request.user,
-        status="pending"
-    ).order_by("-created_at").first()
- 
-    if not pending:
-        return Response({"pending": False})
- 
-    return Response({
-        "pending": True,
-        "prompt_id": pending.prompt.id,
-        "prompt_title": pending.prompt.title
-    })
+    return Response(pending_feedback(request.user))
  
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
@@ -478,22 +875,37 @@ def submit_copy_feedback(request):
     if not prompt_id or not status_value:
         return Response({"error": "prompt_id and status required"}, status=400)
  
-    feedback = CopiedPromptFeedback.objects.filter(
-        user=request.user,
-        prompt_id=prompt_id,
-        status="pending"
-    ).first()
- 
-    if not feedback:
-        return Response({"error": "No pending feedback found"}, status=404)
- 
-    feedback.status = status_value
-   
-    # Only save rating if it was actually submitted (not skipped)
+    rating = None
     if status_value == "submitted" and rating_value:
-        feedback.rating = int(rating_value)
-   
-    feedback.feedback_text = feedback_text
-    feedback.save()
+        try:
+            rating = int(rating_value)
+        except (TypeError, ValueError):
+            rating = None
+        if not ratings.is_rating(rating):
+            return Response({"error": "rating must be between 1 and 5"}, status=400)
+ 
+    with transaction.atomic():
+        # Locked, so a double submit cannot count the same rating twice.
+        feedback = CopiedPromptFeedback.objects.select_for_update().filter(
+            user=request.user,
+            prompt_id=prompt_id,
+            status="pending"
+        ).first()
+ 
+        if not feedback:
+            return Response({"error": "No pending feedback found"}, status=404)
+ 
+        feedback.status = status_value
+ 
+        # Only save rating if it was actually submitted (not skipped)
+        if rating is not None:
+            feedback.rating = rating
+ 
+        feedback.feedback_text = feedback_text
+        feedback.save()
+        feedback_answered(request.user.pk)
+        usage.record(UsageEvent.KIND_FEEDBACK, feedback.prompt_id, request.user.pk, rating or 0)
+        if rating is not None:
+            ratings.record_rating(feedback.prompt_id, rating)
  
     return Response({"message": "Feedback saved"})
\ No newline at end of file
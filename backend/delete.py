@@ -6,34 +6,9 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'prompt_library.settings')
 django.setup()
 
-# ---------------- IMPORT MODELS ----------------
-from api.models import Prompt, PromptVersion, Vote, Bookmark, CopiedPromptFeedback
-
-def delete_all_prompts():
-    try:
-        print("⚠️ Starting deletion of ALL prompt-related data...")
-
-        # Delete dependent tables first
-        print("🧹 Deleting Feedback...")
-        CopiedPromptFeedback.objects.all().delete()
-
-        print("🧹 Deleting Versions...")
-        PromptVersion.objects.all().delete()
-
-        print("🧹 Deleting Votes...")
-        Vote.objects.all().delete()
-
-        print("🧹 Deleting Bookmarks...")
-        Bookmark.objects.all().delete()
-
-        # Finally delete prompts
-        print("🧹 Deleting Prompts...")
-        Prompt.objects.all().delete()
-
-        print("✅ All prompts and related data removed successfully!")
-
-    except Exception as e:
-        print(f"❌ CRITICAL ERROR: {e}")
+from django.core.management import call_command
 
+# Kept for muscle memory; `python manage.py purge_prompts` does the work and
+# also takes filters (--status, --category, --author, --older-than) and --dry-run.
 if __name__ == '__main__':
-    delete_all_prompts()
+    call_command('purge_prompts', all=True)
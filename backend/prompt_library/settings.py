@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'api',
@@ -69,13 +70,21 @@ DATABASES = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
 }
 
+SIMPLE_JWT = {
+    # Stamp user claims into issued tokens (api/authentication.py).
+    'TOKEN_OBTAIN_SERIALIZER': 'api.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'api.authentication.ClaimsTokenRefreshSerializer',
+}
+# How long a process trusts its cached copy of a user's token version.
+AUTH_TOKEN_VERSION_TTL = int(os.getenv("AUTH_TOKEN_VERSION_TTL", "30"))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -105,6 +114,74 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR/ "staticfiles"
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Prebuilt catalog snapshot served by /api/prompts/snapshot/ (see api/snapshot.py).
+# Must be a directory shared by every worker process.
+CATALOG_SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR", BASE_DIR / "var" / "catalog")
+CATALOG_SNAPSHOT_BACKGROUND = os.getenv("CATALOG_SNAPSHOT_BACKGROUND", "True") == "True"
+# TF-IDF index behind /api/prompts/<id>/similar/ (api/similar.py). Workers
+# memory-map it from this directory and look for a newer build every this
+# many seconds; refresh it with build_similar_index --incremental.
+SIMILAR_INDEX_DIR = os.getenv("SIMILAR_INDEX_DIR", BASE_DIR / "var" / "similar")
+SIMILAR_INDEX_RELOAD_SECONDS = float(os.getenv("SIMILAR_INDEX_RELOAD_SECONDS", "60"))
+
+# Upper bound on prompt titles held by the in-process autocomplete index (api/typeahead.py).
+TYPEAHEAD_MAX_PROMPTS = int(os.getenv("TYPEAHEAD_MAX_PROMPTS", "200000"))
+
+# Write-behind copy counter (api/copybuffer.py): flush after this many clicks
+# or this many seconds, whichever comes first. 0 seconds writes through.
+COPY_BUFFER_MAX_PENDING = int(os.getenv("COPY_BUFFER_MAX_PENDING", "500"))
+COPY_BUFFER_FLUSH_SECONDS = float(os.getenv("COPY_BUFFER_FLUSH_SECONDS", "5"))
+# Usage event log (api/usage.py): buffered the same way as copy counts. Raw
+# events are kept this many days; the daily rollups are kept for good.
+USAGE_BUFFER_MAX_PENDING = int(os.getenv("USAGE_BUFFER_MAX_PENDING", "500"))
+USAGE_BUFFER_FLUSH_SECONDS = float(os.getenv("USAGE_BUFFER_FLUSH_SECONDS", "5"))
+USAGE_EVENT_RETENTION_DAYS = int(os.getenv("USAGE_EVENT_RETENTION_DAYS", "90"))
+# Longest span /prompts/<id>/stats/ serves in one response.
+USAGE_STATS_MAX_DAYS = int(os.getenv("USAGE_STATS_MAX_DAYS", "366"))
+
+# Shared cache for public catalog listings (api/listing_cache.py). "locmem" is
+# per process; use "file" (LOCATION is a directory) or "redis" (LOCATION is a
+# redis:// URL) when several workers serve the API.
+_CATALOG_CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+}
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "catalog": {
+        "BACKEND": _CATALOG_CACHE_BACKENDS[os.getenv("CATALOG_CACHE_BACKEND", "locmem")],
+        "LOCATION": os.getenv("CATALOG_CACHE_LOCATION", "catalog"),
+    },
+}
+CATALOG_LIST_CACHE_TIMEOUT = int(os.getenv("CATALOG_LIST_CACHE_TIMEOUT", "300"))
+# Version diffs (PromptViewSet.history_diff) never change once computed.
+HISTORY_DIFF_CACHE_TIMEOUT = int(os.getenv("HISTORY_DIFF_CACHE_TIMEOUT", "86400"))
+# Per-user "nothing pending" flag for the copy feedback check (api/feedback.py);
+# bounds how long a change made in another process can go unseen.
+PENDING_FEEDBACK_CACHE_TIMEOUT = int(os.getenv("PENDING_FEEDBACK_CACHE_TIMEOUT", "600"))
+# Activity counts half as much for ?ordering=trending every this many hours
+# (api/trending.py). Run update_trending --rebuild after changing it.
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "72"))
+
+# Microsoft SSO (MicrosoftLoginView). Signing keys are cached per process by
+# api/jwks.py; timeouts are (connect, read) seconds.
+SSO_TENANT_ID = os.getenv("TENANT_ID")
+SSO_CLIENT_ID = os.getenv("CLIENT_ID")
+SSO_JWKS_URL = os.getenv(
+    "SSO_JWKS_URL", f"https://login.microsoftonline.com/{SSO_TENANT_ID}/discovery/v2.0/keys"
+)
+JWKS_CACHE_TTL = int(os.getenv("JWKS_CACHE_TTL", "3600"))
+JWKS_MAX_STALE = int(os.getenv("JWKS_MAX_STALE", "86400"))
+JWKS_MIN_REFRESH_INTERVAL = int(os.getenv("JWKS_MIN_REFRESH_INTERVAL", "60"))
+JWKS_TIMEOUT = (
+    float(os.getenv("JWKS_CONNECT_TIMEOUT", "3")),
+    float(os.getenv("JWKS_READ_TIMEOUT", "5")),
+)
+
 CORS_ALLOW_ALL_ORIGINS = True  
 
 CSRF_TRUSTED_ORIGINS = ['http://50.17.86.95']
@@ -59,29 +59,20 @@ const CopyPromptButton = ({
       setCopied(true);
       setTimeout(() => setCopied(false), 1500);
  
-      // ✅ 2. Update copy count
+      // ✅ 2. Record the copy: bumps the count and queues the feedback prompt
       if (promptId) {
         try {
-          const res = await api.post(`/prompts/${promptId}/copy/`);
+          const res = await api.post("/copy/", { prompt_id: promptId });
           if (res?.data?.copy_count !== undefined) {
             setCopyCount(res.data.copy_count);
           }
-        } catch (err) {
-          console.error("Copy count failed:", err);
-        }
-      }
- 
-      // ✅ 3. Create feedback entry (HYBRID SYSTEM)
-      if (promptId) {
-        try {
-          await api.post("/copy/save/", { prompt_id: promptId });
  
           setTimeout(() => {
             window.dispatchEvent(new Event("prompt-copied"));
           }, 2000);
  
         } catch (err) {
-          console.error("Feedback save failed:", err);
+          console.error("Copy event failed:", err);
         }
       }
  
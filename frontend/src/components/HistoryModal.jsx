@@ -1,11 +1,34 @@
 // components/HistoryModal.jsx
 import React, { useState, useEffect } from 'react';
 import api from '../api/axios';
-import { X, User, Clock, Tag, Type, LayoutGrid, Layers, RotateCcw, AlertCircle } from 'lucide-react';
+import { X, User, Clock, Tag, Type, LayoutGrid, Layers, RotateCcw, AlertCircle, FileDiff } from 'lucide-react';
 import { toast } from 'react-toastify';
  
+const FIELD_LABELS = {
+  title: 'Title',
+  prompt_description: 'Description',
+  prompt_text: 'Prompt Text',
+  guidance: 'Guidance',
+  category: 'Category',
+  task_type: 'Task Type',
+  output_format: 'Output Format',
+};
+
+// One line of a unified diff from /history/<id>/diff/.
+const diffLineClass = (line) => {
+  if (line.startsWith('+++') || line.startsWith('---')) return 'text-gray-400';
+  if (line.startsWith('@@')) return 'text-teal-700';
+  if (line.startsWith('+')) return 'bg-green-50 text-green-800';
+  if (line.startsWith('-')) return 'bg-red-50 text-red-800';
+  return 'text-gray-700';
+};
+
 export default function HistoryModal({ promptId, onClose }) {
   const [versions, setVersions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // version id -> diff payload, or 'loading' / 'error'
+  const [diffs, setDiffs] = useState({});
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [reverting, setReverting] = useState(false);
@@ -24,7 +47,9 @@ export default function HistoryModal({ promptId, onClose }) {
       setError(null);
       try {
         const res = await api.get(`/prompts/${promptId}/history/`);
-        setVersions(res.data || []);
+        setVersions(res.data?.results || []);
+        setNextCursor(res.data?.next || null);
+        setDiffs({});
       } catch (err) {
         console.error("Error fetching prompt history:", err);
         const errorMsg = err.response?.data?.detail
@@ -40,6 +65,39 @@ export default function HistoryModal({ promptId, onClose }) {
     fetchHistory();
   }, [promptId]);
  
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const res = await api.get(`/prompts/${promptId}/history/`, { params: { cursor: nextCursor } });
+      setVersions((prev) => [...prev, ...(res.data?.results || [])]);
+      setNextCursor(res.data?.next || null);
+    } catch (err) {
+      console.error("Error fetching more history:", err);
+      toast.error("Failed to load older versions.");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const toggleDiff = async (versionId) => {
+    if (diffs[versionId] && diffs[versionId] !== 'error') {
+      setDiffs((prev) => {
+        const { [versionId]: _, ...rest } = prev;
+        return rest;
+      });
+      return;
+    }
+    setDiffs((prev) => ({ ...prev, [versionId]: 'loading' }));
+    try {
+      const res = await api.get(`/prompts/${promptId}/history/${versionId}/diff/`);
+      setDiffs((prev) => ({ ...prev, [versionId]: res.data }));
+    } catch (err) {
+      console.error("Error fetching version diff:", err);
+      setDiffs((prev) => ({ ...prev, [versionId]: 'error' }));
+    }
+  };
+
   const handleRevertClick = (versionId) => {
     setSelectedVersionId(versionId);
     setShowConfirmModal(true);
@@ -160,7 +218,7 @@ export default function HistoryModal({ promptId, onClose }) {
                   <div className="p-4 bg-gradient-to-r from-gray-50/90 to-teal-50/30 border-b border-gray-200/50 flex flex-col sm:flex-row justify-between sm:items-center gap-3">
                     <div className="flex items-center gap-3">
                       <div className="bg-teal-100 text-teal-700 rounded-full w-8 h-8 flex items-center justify-center font-bold text-sm">
-                        {versions.length - index}
+                        {index + 1}
                       </div>
                       <div className="flex items-center gap-2">
                         <User className="text-teal-600" size={16} />
@@ -185,31 +243,46 @@ export default function HistoryModal({ promptId, onClose }) {
                   <div className="p-6 space-y-4">
                     <div>
                       <h4 className="text-lg font-bold text-gray-900 mb-2">{version.title}</h4>
-                      {version.prompt_description && (
-                        <p className="text-sm text-gray-600">{version.prompt_description}</p>
+                      {version.changed_fields?.length > 0 && (
+                        <div className="flex flex-wrap gap-2">
+                          {version.changed_fields.map((field) => (
+                            <span
+                              key={field}
+                              className="text-xs font-medium px-2 py-0.5 rounded-full bg-teal-50 text-teal-700 border border-teal-100"
+                            >
+                              {FIELD_LABELS[field] || field}
+                            </span>
+                          ))}
+                        </div>
                       )}
                     </div>
  
-                    <div className="p-4 bg-teal-50/50 backdrop-blur-sm rounded-lg border border-teal-100/80">
-                      <label className="text-xs font-bold text-teal-800 uppercase tracking-wide flex items-center gap-2 mb-2">
-                        <Type size={14} />
-                        Prompt Text
-                      </label>
-                      <p className="text-sm text-gray-800 whitespace-pre-wrap font-mono leading-relaxed">
-                        {version.prompt_text}
-                      </p>
-                    </div>
-                    {version.guidance && (
-                      <div className="p-4 bg-gray-50/80 backdrop-blur-sm rounded-lg border border-gray-200/80">
-                        <label className="text-xs font-bold text-gray-700 uppercase tracking-wide flex items-center gap-2 mb-2">
-                          <LayoutGrid size={14} />
-                          Guidance
-                        </label>
-                        <p className="text-sm text-gray-800 whitespace-pre-wrap leading-relaxed">
-                          {version.guidance}
-                        </p>
-                      </div>
-                    )}
+                    {diffs[version.id] === 'loading' ? (
+                      <p className="text-sm text-gray-500">Loading changes...</p>
+                    ) : diffs[version.id] === 'error' ? (
+                      <p className="text-sm text-red-600">Failed to load changes for this version.</p>
+                    ) : diffs[version.id] ? (
+                      Object.keys(diffs[version.id].changes).length === 0 ? (
+                        <p className="text-sm text-gray-500">No changes from the previous version.</p>
+                      ) : (
+                        Object.entries(diffs[version.id].changes).map(([field, diff]) => (
+                          <div
+                            key={field}
+                            className="p-4 bg-gray-50/80 backdrop-blur-sm rounded-lg border border-gray-200/80"
+                          >
+                            <label className="text-xs font-bold text-gray-700 uppercase tracking-wide flex items-center gap-2 mb-2">
+                              <FileDiff size={14} />
+                              {FIELD_LABELS[field] || field}
+                            </label>
+                            <pre className="text-xs font-mono leading-relaxed whitespace-pre-wrap">
+                              {diff.split('\n').map((line, i) => (
+                                <div key={i} className={diffLineClass(line)}>{line || ' '}</div>
+                              ))}
+                            </pre>
+                          </div>
+                        ))
+                      )
+                    ) : null}
                     <div className="grid grid-cols-1 sm:grid-cols-3 gap-3 pt-3 border-t border-gray-200/50">
                       <DetailItem
                         icon={<Tag />}
@@ -227,7 +300,14 @@ export default function HistoryModal({ promptId, onClose }) {
                         value={version.output_format_label || version.output_format}
                       />
                     </div>
-                    <div className="pt-4 border-t border-gray-200/50">
+                    <div className="pt-4 border-t border-gray-200/50 flex flex-wrap gap-3">
+                      <button
+                        onClick={() => toggleDiff(version.id)}
+                        className="flex items-center gap-2 px-5 py-2.5 cursor-pointer bg-white text-teal-700 border border-teal-200 rounded-lg hover:bg-teal-50 transition-all duration-200 text-sm font-medium"
+                      >
+                        <FileDiff size={16} />
+                        {diffs[version.id] && diffs[version.id] !== 'error' ? "Hide Changes" : "Show Changes"}
+                      </button>
                       <button
                         onClick={() => handleRevertClick(version.id)}
                         disabled={reverting}
@@ -241,11 +321,22 @@ export default function HistoryModal({ promptId, onClose }) {
                 </div>
               ))
             )}
+            {!loading && !error && nextCursor && (
+              <div className="text-center">
+                <button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="px-5 py-2.5 cursor-pointer bg-gray-100 text-gray-700 rounded-lg hover:bg-gray-200 disabled:opacity-50 disabled:cursor-not-allowed transition-colors text-sm font-medium"
+                >
+                  {loadingMore ? "Loading..." : "Load Older Versions"}
+                </button>
+              </div>
+            )}
           </div>
           {!loading && !error && versions.length > 0 && (
             <div className="p-4 border-t border-gray-200/50 bg-white/90 backdrop-blur-sm rounded-b-2xl text-center">
               <p className="text-xs text-gray-500">
-                Showing {versions.length} version{versions.length !== 1 ? 's' : ''} •
+                Showing {versions.length}{nextCursor ? '+' : ''} version{versions.length !== 1 ? 's' : ''} •
                 Only approved edits are tracked
               </p>
             </div>
@@ -107,7 +107,8 @@ export default function PromptCard({
  
       setUserVote(Number(backend.user_vote ?? 0));
       setCount(Number(backend.vote_count ?? 0));
-      if (onVote) onVote(backend);
+      // The vote endpoints return only the counters; merge them into the prompt
+      if (onVote) onVote({ ...(prompt.raw || prompt), ...backend });
     } catch (err) {
       setUserVote(prevUserVote);
       setCount(prevCount);
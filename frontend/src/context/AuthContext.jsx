@@ -15,6 +15,14 @@ export const AuthProvider = ({ children }) => {
   const [pendingPromptId, setPendingPromptId] = useState(null);
   const [pendingPromptTitle, setPendingPromptTitle] = useState("");
 
+  const showPendingFeedback = (pending) => {
+    if (pending?.pending) {
+      setPendingPromptId(pending.prompt_id);
+      setPendingPromptTitle(pending.prompt_title || "");
+      setShowFeedbackPopup(true);
+    }
+  };
+
   const checkFeedback = async () => {
     if (!isLoggedIn) return;
 
@@ -24,11 +32,7 @@ export const AuthProvider = ({ children }) => {
 
       console.log("✅ API RESPONSE:", res);
 
-      if (res?.data?.pending) {
-        setPendingPromptId(res.data.prompt_id);
-        setPendingPromptTitle(res.data.prompt_title || "");
-        setShowFeedbackPopup(true);
-      }
+      showPendingFeedback(res?.data);
     } catch (err) {
       console.error("❌ Pending feedback check failed:", err);
     }
@@ -47,10 +51,12 @@ export const AuthProvider = ({ children }) => {
 
     try {
       const res = await api.get("/auth/user/");
-      setUser(res.data);
+      const { pending_feedback: pendingFeedback, ...currentUser } = res.data;
+      setUser(currentUser);
       setIsLoggedIn(true);
 
-      checkFeedback();
+      // /auth/user/ carries the pending-feedback answer; no second request.
+      showPendingFeedback(pendingFeedback);
     } catch (err) {
       console.error("Failed to fetch current user:", err);
       if (err.response && err.response.status === 401) {
@@ -22,6 +22,8 @@ export default function Dashboard() {
   const [selectedPrompt, setSelectedPrompt] = useState(null);
   const [activeTab, setActiveTab] = useState("pending");
  
+  const [bulkBusy, setBulkBusy] = useState(false);
+ 
   const [historyModalOpen, setHistoryModalOpen] = useState(false);
   const [selectedPromptId, setSelectedPromptId] = useState(null);
  
@@ -35,31 +37,32 @@ export default function Dashboard() {
   const fetchInitialPrompts = async (id) => {
     try {
       setLoading(true);
-      const url = `/prompts/?status=${activeTab}&limit=60&offset=0`;
+      const url = `/prompts/?status=${activeTab}&limit=60&cursor=`;
       const res = await api.get(url);
       const dataArray = Array.isArray(res.data) ? res.data : res.data?.results || [];
       safeSetPrompts(id, () => dataArray);
+      return res.data?.next || null;
     } catch (err) {
-      if (reqIdRef.current !== id) return;
+      if (reqIdRef.current !== id) return null;
       console.error("Error fetching initial prompts:", err);
+      return null;
     } finally {
       if (reqIdRef.current === id) setLoading(false);
     }
   };
  
-  const fetchRemainingPrompts = async (id) => {
+  const fetchRemainingPrompts = async (id, cursor) => {
     try {
       setLoadingBackground(true);
  
-      let offset = 60;
       const LIMIT = 500;
       const MAX_PAGES = 20;
       let pages = 0;
  
-      while (pages < MAX_PAGES) {
+      while (cursor && pages < MAX_PAGES) {
         if (reqIdRef.current !== id) break;
  
-        const url = `/prompts/?status=${activeTab}&limit=${LIMIT}&offset=${offset}`;
+        const url = `/prompts/?status=${activeTab}&limit=${LIMIT}&cursor=${encodeURIComponent(cursor)}`;
         const res = await api.get(url);
         const dataArray = Array.isArray(res.data) ? res.data : res.data?.results || [];
  
@@ -73,7 +76,7 @@ export default function Dashboard() {
           });
         } else break;
  
-        offset += LIMIT;
+        cursor = res.data?.next || null;
         pages += 1;
       }
     } catch (err) {
@@ -92,8 +95,8 @@ export default function Dashboard() {
     setLoadingBackground(false);
  
     (async () => {
-      await fetchInitialPrompts(myReqId);
-      if (reqIdRef.current === myReqId) fetchRemainingPrompts(myReqId);
+      const next = await fetchInitialPrompts(myReqId);
+      if (reqIdRef.current === myReqId) fetchRemainingPrompts(myReqId, next);
     })();
  
     return () => {
@@ -101,19 +104,35 @@ export default function Dashboard() {
     };
   }, [activeTab]);
  
+  // POST /prompts/moderate/ takes up to 500 ids per call.
+  const MODERATE_BATCH = 500;
+ 
+  const moderate = async (ids, action) => {
+    const updated = [];
+    for (let i = 0; i < ids.length; i += MODERATE_BATCH) {
+      const res = await api.post("/prompts/moderate/", {
+        action,
+        ids: ids.slice(i, i + MODERATE_BATCH),
+      });
+      updated.push(...res.data.updated, ...res.data.unchanged);
+    }
+    return new Set(updated);
+  };
+ 
+  const applyModeration = (done, newStatus) => {
+    if (activeTab === "pending" || newStatus === "rejected") {
+      setPrompts((prev) => prev.filter((p) => !done.has(p.id)));
+    } else {
+      setPrompts((prev) =>
+        prev.map((p) => (done.has(p.id) ? { ...p, status: newStatus } : p))
+      );
+    }
+    setSelectedPrompt(null);
+  };
+ 
   const handleApprove = async (id) => {
     try {
-      await api.post(`/prompts/${id}/approve/`);
- 
-      if (activeTab === "pending") {
-        setPrompts((prev) => prev.filter((p) => p.id !== id));
-      } else {
-        setPrompts((prev) =>
-          prev.map((p) => (p.id === id ? { ...p, status: "approved" } : p))
-        );
-      }
-      setSelectedPrompt(null);
- 
+      applyModeration(await moderate([id], "approve"), "approved");
       toast.success("Prompt approved successfully!"); // ✅ ADDED
     } catch (err) {
       console.error("Backend sync failed:", err);
@@ -123,10 +142,7 @@ export default function Dashboard() {
  
   const handleReject = async (id) => {
     try {
-      await api.post(`/prompts/${id}/reject/`);
- 
-      setPrompts((prev) => prev.filter((p) => p.id !== id));
-      setSelectedPrompt(null);
+      applyModeration(await moderate([id], "reject"), "rejected");
  
       toast("Prompt rejected.", {
         icon: "⚠️",
@@ -138,6 +154,24 @@ export default function Dashboard() {
     }
   };
  
+  const handleBulk = async (action) => {
+    const ids = prompts.map((p) => p.id);
+    if (!ids.length) return;
+    const verb = action === "approve" ? "Approve" : "Reject";
+    if (!window.confirm(`${verb} all ${ids.length} loaded prompts?`)) return;
+    setBulkBusy(true);
+    try {
+      const done = await moderate(ids, action);
+      applyModeration(done, action === "approve" ? "approved" : "rejected");
+      toast.success(`${verb}d ${done.size} prompt${done.size !== 1 ? "s" : ""}.`);
+    } catch (err) {
+      console.error("Bulk moderation failed:", err);
+      toast.error(`Failed to ${action} prompts.`);
+    } finally {
+      setBulkBusy(false);
+    }
+  };
+ 
   const handleOpenHistory = (id) => {
     setSelectedPromptId(id);
     setHistoryModalOpen(true);
@@ -173,6 +207,25 @@ export default function Dashboard() {
           </button>
         </div>
  
+        {activeTab === "pending" && prompts.length > 0 && (
+          <div className="flex items-center gap-2 mb-6">
+            <button
+              onClick={() => handleBulk("approve")}
+              disabled={bulkBusy || loadingBackground}
+              className="px-4 py-2 rounded-full text-sm font-medium bg-teal-500 text-white cursor-pointer hover:bg-teal-600 disabled:opacity-50 disabled:cursor-not-allowed"
+            >
+              Approve all ({prompts.length})
+            </button>
+            <button
+              onClick={() => handleBulk("reject")}
+              disabled={bulkBusy || loadingBackground}
+              className="px-4 py-2 rounded-full text-sm font-medium bg-red-100 text-red-700 cursor-pointer hover:bg-red-200 disabled:opacity-50 disabled:cursor-not-allowed"
+            >
+              Reject all
+            </button>
+          </div>
+        )}
+ 
         {loading && <PromptSkeleton count={12} />}
  
         {!loading && prompts.length === 0 && (
@@ -168,12 +168,12 @@ export default function HomePage() {
       setLoading(true);
       setError(null);
 
-      let url = "/prompts/?limit=60&offset=0";
+      let url = "/prompts/?limit=60&cursor=";
       if (activeTab === "my" && user?.username) url += "&mine=1";
 
       const res = await api.get(url);
 
-      const backendPrompts = res.data || [];
+      const backendPrompts = res.data?.results || [];
       const mapped = backendPrompts.map(mapBackendPromptToFrontend);
       setAllPrompts(mapped);
 
@@ -183,40 +183,42 @@ export default function HomePage() {
         .map((p) => p.id);
 
       setBookmarks(bkIds);
+      return res.data?.next || null;
     } catch (err) {
       console.error(err);
       setError("Failed to load prompts");
+      return null;
     } finally {
       setLoading(false);
     }
   };
 
-  const fetchRemainingPrompts = async () => {
+  const fetchRemainingPrompts = async (cursor) => {
     try {
       setLoadingBackground(true);
 
-      let offset = 60;
       const LIMIT = 500; // chunk size
 
-      while (true) {
-        let url = `/prompts/?limit=${LIMIT}&offset=${offset}`;
+      // Follow the keyset cursor until the server stops returning one
+      while (cursor) {
+        let url = `/prompts/?limit=${LIMIT}&cursor=${encodeURIComponent(cursor)}`;
         if (activeTab === "my" && user?.username) url += "&mine=1";
 
         const res = await api.get(url);
-        if (!res.data.length) break; // done
+        const page = res.data?.results || [];
 
-        const mapped = res.data.map(mapBackendPromptToFrontend);
+        const mapped = page.map(mapBackendPromptToFrontend);
 
         setAllPrompts((prev) => [...prev, ...mapped]);
 
         // bookmarks merge
-        const newBK = res.data
+        const newBK = page
           .filter((p) => p.is_bookmarked || p.raw?.is_bookmarked)
           .map((p) => p.id);
 
         setBookmarks((prev) => Array.from(new Set([...prev, ...newBK])));
 
-        offset += LIMIT;
+        cursor = res.data?.next || null;
       }
     } catch (err) {
       console.error("Background load failed:", err);
@@ -227,8 +229,8 @@ export default function HomePage() {
 
 
   useEffect(() => {
-  fetchInitialPrompts().then(() => {
-    fetchRemainingPrompts(); // background load
+  fetchInitialPrompts().then((next) => {
+    fetchRemainingPrompts(next); // background load
   });
 }, [activeTab, user]);
 
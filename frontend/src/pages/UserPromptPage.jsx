@@ -34,7 +34,7 @@ export default function UserPromptsPage() {
       setLoading(true);
       setError("");
  
-      let url = `/prompts/?limit=60&offset=0`;
+      let url = `/prompts/?limit=60&cursor=`;
       if (username) url += `&username=${username}`;
  
       const res = await api.get(url);
@@ -51,23 +51,24 @@ export default function UserPromptsPage() {
         .map((p) => p.id);
  
       setBookmarks(bookmarkIds);
+      return res.data?.next || null;
     } catch (err) {
       console.error("❌ Initial load error:", err);
       setError("Failed to load prompts.");
+      return null;
     } finally {
       setLoading(false);
     }
   };
  
-  const fetchRemainingPrompts = async () => {
+  const fetchRemainingPrompts = async (cursor) => {
     try {
       setLoadingBackground(true);
  
-      let offset = 60;
       const LIMIT = 500;
  
-      while (true) {
-        let url = `/prompts/?limit=${LIMIT}&offset=${offset}`;
+      while (cursor) {
+        let url = `/prompts/?limit=${LIMIT}&cursor=${encodeURIComponent(cursor)}`;
         if (username) url += `&username=${username}`;
  
         const res = await api.get(url);
@@ -90,7 +91,7 @@ export default function UserPromptsPage() {
           Array.from(new Set([...prev, ...newBK]))
         );
  
-        offset += LIMIT;
+        cursor = res.data?.next || null;
       }
     } catch (err) {
       console.error("❌ Background load failed:", err);
@@ -101,7 +102,7 @@ export default function UserPromptsPage() {
  
   useEffect(() => {
     if (!username) return;
-    fetchInitialPrompts().then(() => fetchRemainingPrompts());
+    fetchInitialPrompts().then((next) => fetchRemainingPrompts(next));
   }, [username]);
  
   const handleBookmark = (promptObj) => {